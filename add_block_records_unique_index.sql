@@ -0,0 +1,4 @@
+-- 為 block_records 建立 (blocker_id, blocked_id) 唯一索引
+-- /viewblocklist、/unblock、/createvc 皆以 blocker_id 查詢，複合索引的前綴即可使用
+-- 若已有重複封鎖資料，需先清除才能建立唯一索引；CONCURRENTLY 不可包在交易區塊內執行
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_block ON block_records (blocker_id, blocked_id);
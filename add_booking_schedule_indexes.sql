@@ -0,0 +1,8 @@
+-- 預約輪詢（每 30 秒）以 Schedule."startTime" 的時間窗口篩選，並限定 Booking.status = 'CONFIRMED'
+-- 建立索引後可走 Index Range Scan，延遲不再隨歷史時段數量增長
+-- CONCURRENTLY 不鎖表；注意不可包在交易區塊內執行
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "Schedule_startTime_idx" ON "Schedule" ("startTime");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "Booking_status_idx" ON "Booking" (status);
+-- 尚未建立頻道的已確認預約只佔少數，部分索引讓 JOIN Schedule 前的篩選只掃描這些列
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "Booking_confirmed_pending_channel_idx" ON "Booking" ("scheduleId")
+    WHERE status = 'CONFIRMED' AND "discordVoiceChannelId" IS NULL;
@@ -0,0 +1,4 @@
+-- 補齊 Booking 表缺少的欄位（可重複執行，單一語句一次完成）
+ALTER TABLE "Booking"
+    ADD COLUMN IF NOT EXISTS "isInstantBooking" BOOLEAN DEFAULT false,
+    ADD COLUMN IF NOT EXISTS "tenMinuteReminderShown" BOOLEAN DEFAULT false;
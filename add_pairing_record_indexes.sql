@@ -0,0 +1,6 @@
+-- 為 PairingRecord 的用戶欄位建立索引（/mystats、/stats 的 user1Id OR user2Id 查詢可用 BitmapOr）
+-- CONCURRENTLY 不鎖表；注意不可包在交易區塊內執行
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "PairingRecord_user1Id_idx" ON "PairingRecord" ("user1Id");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "PairingRecord_user2Id_idx" ON "PairingRecord" ("user2Id");
+-- 建立群組頻道前以 bookingId 檢查配對記錄是否已存在
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "PairingRecord_bookingId_idx" ON "PairingRecord" ("bookingId");
@@ -0,0 +1,6 @@
+-- 配對記錄保存進行中頻道的狀態，bot 重啟後可恢復倒數計時（可重複執行）
+-- 選用：bot 啟動時會檢查欄位是否存在，未執行時只是不保存/恢復倒數，其餘配對功能不受影響
+ALTER TABLE "PairingRecord"
+    ADD COLUMN IF NOT EXISTS "endTime" TIMESTAMP(3),
+    ADD COLUMN IF NOT EXISTS "voiceChannelId" TEXT,
+    ADD COLUMN IF NOT EXISTS "textChannelId" TEXT;
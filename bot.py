@@ -1,4 +1,6 @@
 import os 
+import re
+import hashlib
 import asyncio
 import random
 import time
@@ -8,16 +10,36 @@ from discord.ext import commands, tasks
 from discord import app_commands
 from discord.ui import View, Button, Modal, TextInput
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean, Float, text
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean, Float, UniqueConstraint, Table, MetaData, text, func, or_, select, update, delete
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship, joinedload
 from datetime import datetime, timedelta, timezone
 from flask import Flask, request, jsonify
+from waitress import serve
 import threading
+import functools
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 import io
+import logging
+import logging.handlers
+import queue
+import atexit
 import requests
 
 # --- 環境與資料庫設定 ---
 load_dotenv()
+# 逐筆預約、逐次查找的調試訊息以 logger.debug 輸出（延遲格式化），正式環境預設 INFO 不輸出
+# 日誌先放進佇列，由 QueueListener 背景線程寫到 stdout，事件循環上的協程不會被 I/O 卡住
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+logging.getLogger().setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logging.getLogger().addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener.start()
+atexit.register(log_listener.stop)  # 結束前把佇列中剩餘的日誌寫完
+logger = logging.getLogger("peiplay.bot")
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID", "0"))
 POSTGRES_CONN = os.getenv("POSTGRES_CONN")
@@ -38,7 +60,28 @@ if not POSTGRES_CONN:
     print("請在 .env 檔案中設定資料庫連線字串")
     exit(1)
 CHANNEL_CREATION_CHANNEL_ID = int(os.getenv("CHANNEL_CREATION_CHANNEL_ID", "1410318589348810923"))  # 創建頻道通知頻道
+BOOKING_NOTIFICATION_CHANNEL_ID = int(os.getenv("BOOKING_NOTIFICATION_CHANNEL_ID", "1419585779432423546"))  # 新預約通知頻道
 CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", "30"))  # 檢查間隔（秒）
+GUILD_OBJ = discord.Object(id=GUILD_ID)  # 斜線指令註冊與同步共用的伺服器物件
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "3"))  # 常駐連接數（Supabase 免費方案連接數有限）
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))  # 尖峰時可額外開啟的連接數
+TW_TZ = timezone(timedelta(hours=8))  # 台灣時間（頻道名稱、訊息顯示與 /createvc 開始時間）
+
+# Discord 標註格式 <@123456789> 或 <@!123456789>（模組載入時預先編譯）
+MENTION_RE = re.compile(r'<@!?(\d+)>')
+# 24 小時制 HH:MM（/createvc、/createvc-now 的開始時間）
+TIME_RE = re.compile(r'([01]?\d|2[0-3]):([0-5]\d)')
+
+def parse_tw_start_time(start_time):
+    """解析台灣時間 HH:MM，返回下一次到達該時間的 UTC datetime；格式錯誤返回 None"""
+    match = TIME_RE.fullmatch(start_time.strip())
+    if not match:
+        return None
+    now = datetime.now(TW_TZ)
+    start_dt = now.replace(hour=int(match[1]), minute=int(match[2]), second=0, microsecond=0)
+    if start_dt < now:
+        start_dt += timedelta(days=1)
+    return start_dt.astimezone(timezone.utc)
 
 # --- 標準化 Discord 用戶名的函數（去除尾隨空格、下劃線和點號）---
 def normalize_discord_username(username: str) -> str:
@@ -54,10 +97,11 @@ Base = declarative_base()
 def create_db_engine():
     """創建資料庫引擎，使用適合 Supabase 的連接池配置"""
     return create_engine(
-    POSTGRES_CONN,
-        pool_size=3,           # 減少連接數，避免 Supabase 連接限制
-        max_overflow=5,        # 減少溢出連接
+        POSTGRES_CONN,
+        pool_size=DB_POOL_SIZE,          # 預設保持小連接池，避免 Supabase 連接限制
+        max_overflow=DB_MAX_OVERFLOW,    # 可透過環境變數依方案調整
         pool_pre_ping=True,    # 自動重連，在每次使用前檢查連接
+        pool_use_lifo=True,    # 優先重用最近歸還的連接，讓多餘的閒置連接能被回收
         pool_recycle=300,      # 5分鐘後回收連接（Supabase 通常會在10分鐘後關閉閒置連接）
         pool_timeout=20,       # 連接超時20秒
         connect_args={
@@ -67,25 +111,30 @@ def create_db_engine():
             "keepalives_interval": 10,  # 每10秒發送一次 keepalive
             "keepalives_count": 3,  # 最多3次 keepalive 失敗後關閉連接
         },
-    echo=False
-)
+        query_cache_size=1200,  # 輪詢任務的固定查詢較多，加大 SQL 編譯快取
+        executemany_mode='values_plus_batch',  # psycopg2 批次模式：多筆參數的 INSERT/UPDATE 合併成少數幾次往返
+        executemany_batch_page_size=500,   # 每批 UPDATE/DELETE 的參數組數
+        insertmanyvalues_page_size=1000,   # 每個多列 INSERT ... VALUES 的列數
+        echo=False
+    )
 
 # 初始化資料庫連接
 engine = create_db_engine()
-Session = sessionmaker(bind=engine)
-session = Session()
+# 不再保留模組層級的共用 session：Session 物件不是 coroutine-safe，
+# 每個操作都以 `with Session() as s:` 取得獨立的 session（由連接池提供連線）
+# expire_on_commit=False：commit 後讀取剛寫入的屬性不會再觸發 SELECT（session 都是短命的，不需要跨交易刷新）
+Session = sessionmaker(bind=engine, expire_on_commit=False)
 
 def reconnect_database():
     """重新建立資料庫連接"""
-    global engine, Session, session, db_connection_error_reported
+    global engine, Session, db_connection_error_reported
     try:
         # 關閉舊連接
         if engine:
             engine.dispose()
         # 重新創建引擎和 Session
         engine = create_db_engine()
-        Session = sessionmaker(bind=engine)
-        session = Session()
+        Session = sessionmaker(bind=engine, expire_on_commit=False)
         # 🔥 連接成功時重置錯誤報告標誌
         db_connection_error_reported = False
         return True
@@ -93,6 +142,23 @@ def reconnect_database():
         # 🔥 連接失敗時不輸出錯誤（由調用者處理）
         return False
 
+booking_columns = None  # "Booking" 表的欄位名稱；執行期間結構不會改變，第一次使用時查詢一次後快取
+
+def booking_has_columns(s, *names):
+    """檢查 Booking 表是否有指定欄位（information_schema 只查詢一次）"""
+    global booking_columns
+    columns = booking_columns
+    if columns is None:
+        columns = frozenset(s.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'Booking'
+        """)).scalars())
+        # 查不到欄位（權限或連線異常）時不快取，下次再查，避免整個執行期間都當成沒有欄位
+        if columns:
+            booking_columns = columns
+    return all(name in columns for name in names)
+
 # --- 統一的資料庫連線管理 ---
 def is_db_connection_error(error):
     """
@@ -143,6 +209,11 @@ def safe_db_execute(operation_func, *args, **kwargs):
     return None
 
 # --- 資料庫模型（對應 Prisma schema）---
+def utc_now_sql():
+    """資料庫端的目前 UTC 時間（naive）。Prisma 欄位為無時區的 timestamp(3)，
+    直接用 now() 會依連線的 TimeZone 設定轉換，不保證存成 UTC"""
+    return func.timezone('UTC', func.now())
+
 class User(Base):
     __tablename__ = 'User'
     id = Column(String, primary_key=True)
@@ -176,7 +247,7 @@ class Schedule(Base):
     id = Column(String, primary_key=True)
     partnerId = Column(String, ForeignKey('Partner.id'))
     date = Column(DateTime)
-    startTime = Column(DateTime)
+    startTime = Column(DateTime, index=True)  # 預約輪詢以 startTime 時間窗口查詢
     endTime = Column(DateTime)
     isAvailable = Column(Boolean, default=True)
     partner = relationship("Partner")
@@ -188,11 +259,11 @@ class Booking(Base):
     id = Column(String, primary_key=True)
     customerId = Column(String, ForeignKey('Customer.id'))
     scheduleId = Column(String, ForeignKey('Schedule.id'))
-    status = Column(String)  # BookingStatus
+    status = Column(String, index=True)  # BookingStatus
     orderNumber = Column(String, nullable=True)  # 可選欄位
     paymentInfo = Column(String, nullable=True)  # JSON string
-    createdAt = Column(DateTime, default=datetime.utcnow)
-    updatedAt = Column(DateTime, default=datetime.utcnow)
+    createdAt = Column(DateTime, default=utc_now_sql())
+    updatedAt = Column(DateTime, default=utc_now_sql())
     finalAmount = Column(Float, nullable=True)
     # 新增欄位
     isInstantBooking = Column(Boolean, default=False)
@@ -212,17 +283,17 @@ class Booking(Base):
 class PairingRecord(Base):
     __tablename__ = 'PairingRecord'
     id = Column(String, primary_key=True)  # 改為 String 類型，對應 Prisma 的 cuid
-    user1Id = Column('user1Id', String)
-    user2Id = Column('user2Id', String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    user1Id = Column('user1Id', String, index=True)  # /mystats、/stats 以 user1Id OR user2Id 查詢
+    user2Id = Column('user2Id', String, index=True)
+    timestamp = Column(DateTime, default=utc_now_sql())
     extendedTimes = Column('extendedTimes', Integer, default=0)
     duration = Column(Integer, default=0)
     rating = Column(Integer, nullable=True)
     comment = Column(String, nullable=True)
     animalName = Column('animalName', String)
-    bookingId = Column('bookingId', String, nullable=True)  # 關聯到預約ID
-    createdAt = Column('createdAt', DateTime, default=datetime.utcnow)
-    updatedAt = Column('updatedAt', DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    bookingId = Column('bookingId', String, nullable=True, index=True)  # 關聯到預約ID（建立頻道前以此檢查是否已有記錄）
+    createdAt = Column('createdAt', DateTime, default=utc_now_sql())
+    updatedAt = Column('updatedAt', DateTime, default=utc_now_sql(), onupdate=utc_now_sql())
 
 class GroupBooking(Base):
     __tablename__ = "GroupBooking"
@@ -239,8 +310,8 @@ class GroupBooking(Base):
     pricePerPerson = Column(Float)
     totalPrice = Column(Float)
     status = Column(String, default='ACTIVE')  # ACTIVE, COMPLETED, CANCELLED, FULL
-    createdAt = Column(DateTime, default=datetime.utcnow)
-    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    createdAt = Column(DateTime, default=utc_now_sql())
+    updatedAt = Column(DateTime, default=utc_now_sql(), onupdate=utc_now_sql())
     initiatorId = Column(String)
     initiatorType = Column(String)  # USER, PARTNER
 
@@ -252,7 +323,7 @@ class GroupBookingParticipant(Base):
     customerId = Column(String)
     partnerId = Column(String)
     status = Column(String, default='ACTIVE')  # ACTIVE, CANCELLED, COMPLETED
-    joinedAt = Column(DateTime, default=datetime.utcnow)
+    joinedAt = Column(DateTime, default=utc_now_sql())
 
 class GroupBookingReview(Base):
     __tablename__ = "GroupBookingReview"
@@ -262,46 +333,341 @@ class GroupBookingReview(Base):
     reviewerId = Column(String)
     rating = Column(Integer)
     comment = Column(String)
-    createdAt = Column(DateTime, default=datetime.utcnow)
+    createdAt = Column(DateTime, default=utc_now_sql())
     isApproved = Column(Boolean, default=False)
 
 class BlockRecord(Base):
     __tablename__ = 'block_records'
+    # (blocker_id, blocked_id) 唯一索引：防止重複封鎖，也涵蓋只以 blocker_id 查詢的情況
+    __table_args__ = (UniqueConstraint('blocker_id', 'blocked_id', name='uq_block'),)
     id = Column(Integer, primary_key=True)
     blocker_id = Column(String)
     blocked_id = Column(String)
 
+# 進行中配對頻道的狀態欄位（add_pairing_record_session_columns.sql 新增，不屬於 Prisma schema）
+# 刻意不放進 PairingRecord mapper：ORM INSERT 會列出所有映射欄位，未執行 migration 時所有配對記錄都會寫入失敗
+pairing_session_table = Table(
+    'PairingRecord', MetaData(),
+    Column('id', String, primary_key=True),
+    Column('extendedTimes', Integer),
+    Column('endTime', DateTime),  # 預計結束時間（UTC），重啟後恢復倒數用
+    Column('voiceChannelId', String),  # 倒數結束後清空
+    Column('textChannelId', String),
+)
+
 # 不自動創建表，因為我們使用的是現有的 Prisma 資料庫
-# Base.metadata.create_all(engine)
+# 僅在明確設定 INIT_DB=1 時（例如本地空資料庫）執行一次建表，正式環境啟動時不做反射查詢
+if os.getenv("INIT_DB") == "1":
+    Base.metadata.create_all(engine)
+
+TRACKED_ID_LIMIT = 10000  # 每個追蹤集合最多保留的 ID 數（長時間運行時記憶體不會持續增長）
 
-intents = discord.Intents.default()
-intents.message_content = True
+class BoundedSet:
+    """只保留最近加入的 maxlen 個元素的集合；超過上限時丟棄最早加入的元素"""
+    __slots__ = ("_items", "maxlen")
+
+    def __init__(self, maxlen=TRACKED_ID_LIMIT):
+        self._items = OrderedDict()
+        self.maxlen = maxlen
+
+    def add(self, item):
+        self._items[item] = None
+        self._items.move_to_end(item)
+        if len(self._items) > self.maxlen:
+            self._items.popitem(last=False)
+
+    def discard(self, item):
+        self._items.pop(item, None)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+# 只開啟實際用到的 intents：所有指令都是斜線指令，不需要接收訊息事件與訊息內容
+# （讀取 bot 自己發送的訊息內容不需要 message_content）
+intents = discord.Intents.none()
 intents.guilds = True
 intents.members = True
 intents.voice_states = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+# 沒有前綴指令；前綴用 when_mentioned，沒有 message_content 也不會有讀不到的 "!" 前綴
+bot = commands.Bot(command_prefix=commands.when_mentioned, intents=intents)
+
 active_voice_channels = {}
-evaluated_records = set()
 pending_ratings = {}
-processed_bookings = set()  # 記錄已處理的預約
-processed_text_channels = set()  # 記錄已創建文字頻道的預約
-rating_sent_bookings = set()  # 追蹤已發送評價系統的預約
+rating_sent_bookings = BoundedSet()  # 追蹤已發送評價系統的預約
 rating_submitted_users = {}  # 追蹤每個記錄的已提交評價用戶 {record_id: set(user_ids)}
-active_countdown_tasks = set()  # 追蹤已啟動的倒數計時任務 {booking_id}
-active_voice_channel_tasks = set()  # 追蹤已啟動的語音頻道創建任務 {booking_id}
+active_countdown_tasks = BoundedSet()  # 追蹤已啟動的倒數計時任務 {booking_id}
+active_voice_channel_tasks = BoundedSet()  # 追蹤已啟動的語音頻道創建任務 {booking_id}
 rating_text_channels = {}  # 追蹤每個記錄的文字頻道 {record_id: text_channel}
 rating_channel_created_time = {}  # 追蹤每個記錄的文字頻道創建時間 {record_id: timestamp}
 group_rating_text_channels = {}  # 追蹤群組預約評價的文字頻道 {group_booking_id: text_channel}
 group_rating_channel_created_time = {}  # 追蹤群組預約評價的文字頻道創建時間 {group_booking_id: timestamp}
 db_connection_error_reported = False  # 追蹤是否已報告資料庫連接錯誤（避免重複輸出）
-sent_reminders = set()  # 追蹤已發送的提醒，防止重複發送 {(booking_id, reminder_type)}
+sent_reminders = BoundedSet()  # 追蹤已發送的提醒，防止重複發送 {(booking_id, reminder_type)}
+one_minute_warnings = BoundedSet()  # 已發送「剩餘 1 分鐘」的配對頻道 {(vc_id, 截止時間)}；延長後截止時間改變會再提醒一次
+background_tasks = set()  # 保存背景任務的強引用（事件循環只保留弱引用，避免任務被回收）
+scheduled_vc_timers = {}  # /createvc 排程中的開啟計時器 {interaction_id: TimerHandle}，由 CancelScheduledVCView 取消
+group_countdown_timers = {}  # 群組預約/多人陪玩的倒數提醒與結束計時器 {group_booking_id: [TimerHandle, ...]}
+
+cached_admin_channel = None  # 管理員頻道（on_ready 時解析一次）
+cached_main_guild = None  # 主要伺服器（on_ready 時解析一次）
+cached_notification_channel = None  # 新預約通知頻道（on_ready 時解析一次）
+cached_channel_creation_channel = None  # 創建頻道通知頻道（on_ready 時解析一次）
+
+def create_background_task(coro):
+    """在目前事件循環啟動背景任務（只能在事件循環中呼叫；Flask 線程請用 run_on_bot_loop）"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def get_or_fetch_user(user_id):
+    """先從快取取得用戶，快取沒有時才呼叫 REST API"""
+    user_id = int(user_id)
+    return bot.get_user(user_id) or await bot.fetch_user(user_id)
+
+def get_main_guild():
+    """取得主要伺服器；on_ready 時已快取，尚未快取時才查詢"""
+    global cached_main_guild
+    if cached_main_guild is None:
+        cached_main_guild = bot.get_guild(GUILD_ID)
+    return cached_main_guild
+
+def get_admin_channel():
+    """取得管理員頻道；on_ready 時已快取，尚未快取時才查詢"""
+    global cached_admin_channel
+    if cached_admin_channel is None and ADMIN_CHANNEL_ID:
+        cached_admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+    return cached_admin_channel
+
+def get_notification_channel():
+    """取得新預約通知頻道；on_ready 時已快取，尚未快取時才查詢"""
+    global cached_notification_channel
+    if cached_notification_channel is None:
+        cached_notification_channel = bot.get_channel(BOOKING_NOTIFICATION_CHANNEL_ID)
+    return cached_notification_channel
+
+def get_channel_creation_channel():
+    """取得創建頻道通知頻道；on_ready 時已快取，尚未快取時才查詢"""
+    global cached_channel_creation_channel
+    if cached_channel_creation_channel is None:
+        cached_channel_creation_channel = bot.get_channel(CHANNEL_CREATION_CHANNEL_ID)
+    return cached_channel_creation_channel
+
+VOICE_CATEGORY_NAMES = ("Voice Channels", "語音頻道", "語音")  # 依序嘗試的語音分類名稱
+TEXT_CATEGORY_NAMES = ("Text Channels", "文字頻道", "文字")  # 依序嘗試的文字分類名稱
+category_id_cache = {}  # 已解析的分類 {(guild_id, 分類名稱候選): category_id}
+
+def find_category(guild, names, fallback_first=True):
+    """依名稱順序尋找分類並快取其 ID；快取的分類被刪除或改名時才重新掃描 guild.categories"""
+    key = (guild.id, names)
+    category = guild.get_channel(category_id_cache.get(key, 0))
+    if isinstance(category, discord.CategoryChannel) and category.name in names:
+        return category
+    for name in names:
+        category = discord.utils.get(guild.categories, name=name)
+        if category:
+            category_id_cache[key] = category.id
+            return category
+    # 都找不到時使用第一個分類（不快取，之後建立了指定名稱的分類仍能找到）
+    return guild.categories[0] if fallback_first and guild.categories else None
+
+ADMIN_BATCH_INTERVAL = 1  # 管理員通知合併的等待秒數
+ADMIN_BATCH_SIZE = 10  # 每批最多合併的通知數（Discord 每則訊息最多 10 個 embed）
+ADMIN_EMBED_CHAR_LIMIT = 6000  # Discord 單則訊息所有 embed 的文字總長上限，超過整則訊息會被拒絕（400）
+ADMIN_QUEUE_MAXSIZE = 1000  # 佇列上限，管理員頻道長時間無法發送時不會無限累積
+ADMIN_SEND_RETRIES = 3  # 單則訊息發送失敗時的嘗試次數（指數退避）
+admin_notification_queue = None  # 管理員通知佇列（setup_hook 時建立）
+
+def notify_admin(content=None, embed=None):
+    """把管理員通知放進佇列，由 admin_notification_worker 合併後發送"""
+    if admin_notification_queue is None:
+        print("⚠️ 管理員通知佇列尚未建立，略過通知")
+        return
+    try:
+        admin_notification_queue.put_nowait((content, embed))
+    except asyncio.QueueFull:
+        print("⚠️ 管理員通知佇列已滿，略過通知")
+
+async def send_admin_message(admin_channel, content, embeds):
+    """發送一則管理員訊息；429 或伺服器錯誤時以指數退避重試（discord.py 已先處理一般的速率限制）
+    
+    訊息大小由 admin_notification_worker 事先切好；其他 4xx 錯誤重試也不會成功，記錄被丟棄的內容後放棄
+    """
+    for attempt in range(ADMIN_SEND_RETRIES):
+        try:
+            await admin_channel.send(content, embeds=embeds)
+            return
+        except discord.HTTPException as e:
+            if attempt == ADMIN_SEND_RETRIES - 1 or (e.status != 429 and e.status < 500):
+                print(f"❌ 發送管理員通知失敗，已丟棄（{len(content or '')} 字、{len(embeds)} 個 embed）: {e}")
+                return
+            await asyncio.sleep(2 ** attempt)
+
+async def admin_notification_worker():
+    """合併短時間內的管理員通知，減少對管理員頻道的 API 呼叫（避免觸發頻道速率限制）"""
+    while True:
+        batch = [await admin_notification_queue.get()]
+        await asyncio.sleep(ADMIN_BATCH_INTERVAL)
+        while len(batch) < ADMIN_BATCH_SIZE and not admin_notification_queue.empty():
+            batch.append(admin_notification_queue.get_nowait())
+        
+        admin_channel = get_admin_channel()
+        if not admin_channel:
+            print(f"❌ 找不到管理員頻道 (ID: {ADMIN_CHANNEL_ID})，丟棄 {len(batch)} 則通知")
+            continue
+        
+        embeds = [embed for _, embed in batch if embed]
+        # 文字通知盡量併成一則訊息（Discord 單則訊息上限 2000 字）；單則超過上限的通知先切段，送出前就符合大小限制
+        messages = []
+        for content, _ in batch:
+            if not content:
+                continue
+            for start in range(0, len(content), 2000):
+                piece = content[start:start + 2000]
+                if messages and len(messages[-1]) + len(piece) + 2 <= 2000:
+                    messages[-1] += "\n\n" + piece
+                else:
+                    messages.append(piece)
+        
+        # embed 另外打包成獨立訊息：每則最多 10 個、文字總長不超過上限，
+        # 評價留言較長時不會讓整批 embed 連同文字通知一起被拒絕
+        embed_groups = []
+        embed_chars = 0
+        for embed in embeds:
+            if embed_groups and len(embed_groups[-1]) < 10 and embed_chars + len(embed) <= ADMIN_EMBED_CHAR_LIMIT:
+                embed_groups[-1].append(embed)
+                embed_chars += len(embed)
+            else:
+                embed_groups.append([embed])
+                embed_chars = len(embed)
+        
+        # 某則失敗不影響同批的其他訊息
+        payloads = [(message, []) for message in messages] + [(None, group) for group in embed_groups]
+        for content, payload_embeds in payloads:
+            try:
+                await send_admin_message(admin_channel, content, payload_embeds)
+            except Exception as e:
+                print(f"❌ 發送管理員通知失敗: {e}")
+
+MOVE_CONCURRENCY = 4  # 同時進行的成員移動上限（Discord 對移動成員有伺服器層級的速率限制）
+voice_move_semaphore = None  # 成員移動的並行上限（setup_hook 時建立）
+
+async def move_member(member, vc, retries=2):
+    """移動成員到語音頻道；限制整個 bot 同時移動的數量，遇到 429 時加上隨機抖動後重試"""
+    async with voice_move_semaphore:
+        for attempt in range(retries + 1):
+            try:
+                return await member.move_to(vc)
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == retries:
+                    raise
+                # 持有名額等待，讓其他移動請求一起退讓
+                await asyncio.sleep((getattr(e, 'retry_after', None) or 1) + random.random())
 
 # 可愛的動物和物品列表
-CUTE_ITEMS = ["🦊 狐狸", "🐱 貓咪", "🐶 小狗", "🐻 熊熊", "🐼 貓熊", "🐯 老虎", "🦁 獅子", "🐸 青蛙", "🐵 猴子", "🐰 兔子", "🦄 獨角獸", "🐙 章魚", "🦋 蝴蝶", "🌸 櫻花", "⭐ 星星", "🌈 彩虹", "🍀 幸運草", "🎀 蝴蝶結", "🍭 棒棒糖", "🎈 氣球"]
-TW_TZ = timezone(timedelta(hours=8))
+CUTE_ITEMS = ("🦊 狐狸", "🐱 貓咪", "🐶 小狗", "🐻 熊熊", "🐼 貓熊", "🐯 老虎", "🦁 獅子", "🐸 青蛙", "🐵 猴子", "🐰 兔子", "🦄 獨角獸", "🐙 章魚", "🦋 蝴蝶", "🌸 櫻花", "⭐ 星星", "🌈 彩虹", "🍀 幸運草", "🎀 蝴蝶結", "🍭 棒棒糖", "🎈 氣球")
+
+CUTE_CHANNEL_NAMES = tuple(f"{item}頻道" for item in CUTE_ITEMS)  # 預先組好的語音頻道名稱
+
+cute_index_cycle = deque()  # 洗牌後輪流使用的物品索引，相鄰的頻道不會撞名
+
+def pick_cute_channel():
+    """依洗牌順序挑選可愛物品（用完一輪才重新洗牌），返回 (物品, 頻道名稱)"""
+    if not cute_index_cycle:
+        indices = list(range(len(CUTE_ITEMS)))
+        random.shuffle(indices)
+        cute_index_cycle.extend(indices)
+    idx = cute_index_cycle.popleft()
+    return CUTE_ITEMS[idx], CUTE_CHANNEL_NAMES[idx]
+
+def cute_item_for(key: str) -> str:
+    """依預約 ID 固定挑選可愛物品（同一預約的文字/語音頻道使用相同 emoji）"""
+    return CUTE_ITEMS[int(hashlib.md5(key.encode()).hexdigest()[:2], 16) % len(CUTE_ITEMS)]
+
+@functools.lru_cache(maxsize=256)
+def localize_booking_range(start_time, end_time):
+    """把預約起訖時間轉成台灣時間（沒有時區資訊時視為 UTC）
+    
+    返回 (台灣開始時間, 台灣結束時間, 日期 MMDD, 開始 HH:MM, 結束 HH:MM)；同一預約會被多處使用，結果快取
+    """
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=timezone.utc)
+    if end_time.tzinfo is None:
+        end_time = end_time.replace(tzinfo=timezone.utc)
+    tw_start_time = start_time.astimezone(TW_TZ)
+    tw_end_time = end_time.astimezone(TW_TZ)
+    return tw_start_time, tw_end_time, tw_start_time.strftime("%m%d"), tw_start_time.strftime("%H:%M"), tw_end_time.strftime("%H:%M")
 
 # --- 成員搜尋函數 ---
+# 每個伺服器一份「小寫名稱 / 顯示名稱 → 成員」索引，精確匹配不再逐一掃描 guild.members
+member_name_index = {}  # guild_id -> {lowercase name: member}
+member_clean_name_index = {}  # guild_id -> {去除 _ . - 的小寫名稱: member}
+CLEAN_NAME_TABLE = str.maketrans('', '', '_.-')
+# Discord ID（snowflake）一律是 17~20 位純數字；其餘字串都當作名稱處理
+SNOWFLAKE_RE = re.compile(r'\d{17,20}')
+
+def clean_member_name(name):
+    """小寫並移除下劃線、點號與連字號（處理如 "Louis0088" 對應 "louis0088_" 的情況）"""
+    return name.lower().translate(CLEAN_NAME_TABLE)
+
+def member_index_keys(member):
+    """成員在索引中的鍵：小寫的使用者名稱與顯示名稱"""
+    keys = [member.name.lower()]
+    if member.display_name and member.display_name.lower() != keys[0]:
+        keys.append(member.display_name.lower())
+    return keys
+
+def member_clean_keys(member):
+    """成員在清理後名稱索引中的鍵"""
+    return {clean_member_name(key) for key in member_index_keys(member)}
+
+def build_member_index(guild):
+    """依 guild.members 重建兩個索引；同名時保留先出現的成員（與逐一掃描的結果一致）"""
+    index = {}
+    clean_index = {}
+    for member in guild.members:
+        for key in member_index_keys(member):
+            index.setdefault(key, member)
+        for key in member_clean_keys(member):
+            clean_index.setdefault(key, member)
+    member_name_index[guild.id] = index
+    member_clean_name_index[guild.id] = clean_index
+    return index
+
+def index_member(member):
+    index = member_name_index.get(member.guild.id)
+    if index is None:
+        return
+    for key in member_index_keys(member):
+        index.setdefault(key, member)
+    clean_index = member_clean_name_index[member.guild.id]
+    for key in member_clean_keys(member):
+        clean_index.setdefault(key, member)
+
+def unindex_member(member, guild=None):
+    """從索引移除成員的舊名稱；傳入 guild 時 member 可以是 discord.User（on_user_update 的 before）
+
+    被移除的鍵若還有其他同名成員，改由 guild.members 中第一個符合的成員接手（與逐一掃描的結果一致）；
+    事件觸發時成員快取已更新，掃描到的是離開/改名後的狀態
+    """
+    guild = guild or member.guild
+    index = member_name_index.get(guild.id)
+    if index is None:
+        return
+    for target, keys_of in ((index, member_index_keys), (member_clean_name_index[guild.id], member_clean_keys)):
+        for key in keys_of(member):
+            indexed = target.get(key)
+            if indexed is not None and indexed.id == member.id:
+                replacement = next((m for m in guild.members if key in keys_of(m)), None)
+                if replacement is None:
+                    del target[key]
+                else:
+                    target[key] = replacement
+
 def find_member_by_discord_name(guild, discord_name):
     """根據 Discord 名稱搜尋成員（支持多種匹配方式）"""
     if not discord_name:
@@ -316,34 +682,36 @@ def find_member_by_discord_name(guild, discord_name):
         print(f"❌ 錯誤：Discord ID 類型錯誤，必須為 str 或 int，收到: {type(discord_name).__name__} = {discord_name}")
         return None
     
-    # 🔥 改進：支持多種匹配方式
-    discord_name_lower = discord_name.lower().strip() if isinstance(discord_name, str) else str(discord_name).lower().strip()
-    
-    # 1. 先嘗試精確匹配（名稱或顯示名稱，大小寫不敏感）
-    for member in guild.members:
-        if member.name.lower() == discord_name_lower or (member.display_name and member.display_name.lower() == discord_name_lower):
+    # 0. 是 Discord ID（SNOWFLAKE_RE：17~20 位純數字）時直接查成員快取（O(1)），不必做任何名稱比對
+    discord_id_clean = str(discord_name)
+    if SNOWFLAKE_RE.fullmatch(discord_id_clean):
+        member = guild.get_member(int(discord_id_clean))
+        if member:
             return member
     
-    # 1.5. 嘗試精確匹配（原始大小寫，處理特殊情況如 "0.08377"）
-    for member in guild.members:
-        if member.name == discord_name or (member.display_name and member.display_name == discord_name):
-            return member
+    # 🔥 改進：支持多種匹配方式（名稱比對僅作為舊資料的備用路徑）
+    discord_name_lower = discord_name.lower().strip() if isinstance(discord_name, str) else str(discord_name).lower().strip()
     
-    # 1.6. 🔥 新增：移除下劃線和點號後匹配（處理如 "Louis0088" 匹配 "louis0088_" 的情況）
-    discord_name_clean = discord_name_lower.replace('_', '').replace('.', '').replace('-', '')
-    for member in guild.members:
-        member_name_clean = member.name.lower().replace('_', '').replace('.', '').replace('-', '')
-        member_display_clean = (member.display_name.lower() if member.display_name else "").replace('_', '').replace('.', '').replace('-', '')
-        if (member_name_clean == discord_name_clean or member_display_clean == discord_name_clean):
-            print(f"✅ 通過清理特殊字符匹配找到成員: {member.name} (查詢: {discord_name})")
-            return member
+    # 1. 先嘗試精確匹配（名稱或顯示名稱，大小寫不敏感）：查索引，不掃描成員列表
+    index = member_name_index.get(guild.id)
+    if index is None:
+        index = build_member_index(guild)
+    member = index.get(discord_name_lower)
+    if member is not None:
+        return member
+    
+    # 1.6. 🔥 新增：移除下劃線和點號後匹配（處理如 "Louis0088" 匹配 "louis0088_" 的情況）：同樣查索引
+    discord_name_clean = clean_member_name(discord_name_lower)
+    member = member_clean_name_index[guild.id].get(discord_name_clean)
+    if member is not None:
+        return member
     
     # 2. 🔥 優先匹配前綴（處理 Discord 名稱後綴，如 louis0099._03864 匹配 Louis0099）
     # 提取查詢名稱的字母數字部分（去除特殊字符，但保留小數點和數字）
     # 🔥 對於包含小數點的用戶名（如 "0.08377"），不要移除小數點，直接使用原始名稱匹配
     discord_name_alphanumeric = ''.join(c for c in discord_name_lower if c.isalnum())
-    # 🔥 如果原始名稱包含小數點且看起來像用戶名（不是 ID），也嘗試直接匹配
-    if '.' in discord_name and len(discord_name.replace('.', '').replace('-', '')) < 17:
+    # 🔥 如果原始名稱包含小數點（不會是符合 SNOWFLAKE_RE 的 ID），也嘗試直接匹配
+    if '.' in str(discord_name):
         # 這是包含小數點的用戶名（如 "0.08377"），嘗試直接匹配
         for member in guild.members:
             if member.name == discord_name or (member.display_name and member.display_name == discord_name):
@@ -368,7 +736,6 @@ def find_member_by_discord_name(guild, discord_name):
                 member_display_alphanumeric == discord_name_alphanumeric or
                 discord_name_alphanumeric in member_name_alphanumeric or
                 discord_name_alphanumeric in member_display_alphanumeric):
-                print(f"✅ 通過前綴匹配找到成員: {member.name} (查詢: {discord_name})")
                 return member
     
     # 2.5. 🔥 新增：使用清理後的名稱進行前綴匹配（處理下劃線和點號）
@@ -384,7 +751,6 @@ def find_member_by_discord_name(guild, discord_name):
                 discord_name_clean.startswith(member_display_clean) or
                 member_name_clean == discord_name_clean or
                 member_display_clean == discord_name_clean):
-                print(f"✅ 通過清理後前綴匹配找到成員: {member.name} (查詢: {discord_name})")
                 return member
     
     # 3. 嘗試部分匹配（名稱或顯示名稱包含）
@@ -392,18 +758,6 @@ def find_member_by_discord_name(guild, discord_name):
         if discord_name_lower in member.name.lower() or (member.display_name and discord_name_lower in member.display_name.lower()):
             return member
     
-    # 4. 嘗試匹配 Discord ID（如果 discord_name 是數字或包含小數點）
-    # 🔥 注意：如果 discord_name 包含小數點但看起來像用戶名（如 "0.08377"），不應該當作 ID 處理
-    # 只有在看起來像真正的 Discord ID（18-19 位數字）時才嘗試 ID 匹配
-    try:
-        # 純數字 ID（18-19 位數字，Discord ID 的標準長度）
-        if discord_name.replace('-', '').isdigit() and len(discord_name.replace('-', '')) >= 17:
-            member = guild.get_member(int(discord_name.replace('-', '')))
-            if member:
-                return member
-    except (ValueError, TypeError, AttributeError):
-        pass
-    
     # 5. 嘗試只匹配字母和數字（移除特殊字符，更寬鬆的匹配）
     if discord_name_alphanumeric and len(discord_name_alphanumeric) >= 3:  # 至少3個字符才進行匹配
         for member in guild.members:
@@ -417,13 +771,8 @@ def find_member_by_discord_name(guild, discord_name):
                 member_display_alphanumeric in discord_name_alphanumeric):
                 return member
     
-    # 6. 如果都找不到，記錄詳細日誌
+    # 6. 如果都找不到，記錄日誌
     print(f"❌ 找不到 Discord 成員: {discord_name}")
-    # 列出前10個成員作為調試信息
-    member_list = [f"{m.name} (ID: {m.id})" for m in list(guild.members)[:10]]
-    if member_list:
-        print(f"   調試：伺服器中的部分成員: {', '.join(member_list)}")
-    
     return None
 
 # --- 429 安全創建文字頻道（僅替換創建文字頻道，不影響其他 Discord API）---
@@ -453,13 +802,119 @@ async def safe_create_text_channel(guild, name, **kwargs):
                 raise
     return None  # unreachable
 
+async def create_channels_together(*coros):
+    """同時創建多個頻道；任一失敗時刪除其他已創建的頻道（避免留下沒人追蹤的孤兒頻道），再拋出第一個錯誤"""
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        for channel in results:
+            if channel and not isinstance(channel, BaseException):
+                try:
+                    await channel.delete()
+                except Exception:
+                    pass
+        raise errors[0]
+    return results
+
+# --- 安全規範 embed 模板 ---
+# 內容固定，模組載入時建一次；發送時 .copy() 再設定 timestamp，避免每筆預約重建 embed 與欄位
+SAFETY_EMBED_TEMPLATE = discord.Embed(
+    title="🎙️ 聊天頻道使用規範與警告",
+    description="為了您的安全，請務必遵守以下規範：",
+    color=0xff6b6b
+)
+SAFETY_EMBED_TEMPLATE.add_field(
+    name="📌 頻道性質",
+    value="此語音頻道為【單純聊天用途】。\n僅限輕鬆互動、日常話題、遊戲閒聊使用。\n禁止任何涉及交易、暗示、或其他非聊天用途的行為。",
+    inline=False
+)
+SAFETY_EMBED_TEMPLATE.add_field(
+    name="⚠️ 使用規範（請務必遵守）",
+    value="• 禁止挑釁、辱罵、騷擾他人，保持禮貌尊重\n"
+          "• 禁止使用色情、暴力、血腥、歧視等不當言語或內容\n"
+          "• 不得進行金錢交易、索取或提供個資（例如 LINE、IG、電話）\n"
+          "• 不得錄音、偷拍或截圖他人對話，除非經雙方同意\n"
+          "• 禁止語音假裝、惡意模仿或干擾他人聊天\n"
+          "• 禁止使用變聲器或播放音效干擾頻道秩序",
+    inline=False
+)
+SAFETY_EMBED_TEMPLATE.add_field(
+    name="🚨 警告事項",
+    value="• 系統將隨機錄取部分語音內容以進行安全稽核\n"
+          "• 如被舉報違規，管理員可立即封鎖或禁言，不另行通知\n"
+          "• 為了您的安全，禁止隨意透漏個人資訊，包括(身分證、住家地址、等等......)\n"
+          "• 若你無法接受以上規範，請勿加入頻道",
+    inline=False
+)
+
+def build_safety_embed(title, channel_nature):
+    """建立群組/多人陪玩/即時/一般預約頻道共用格式的安全規範 embed（不含時間戳，於模組載入時各建一次）"""
+    safety_embed = discord.Embed(
+        title=title,
+        description="為了您的安全，請務必遵守以下規範：",
+        color=0xff6b6b
+    )
+    safety_embed.add_field(
+        name="📌 頻道性質",
+        value=channel_nature,
+        inline=False
+    )
+    safety_embed.add_field(
+        name="⚠️ 使用規範（請務必遵守）",
+        value="• 禁止挑釁、辱罵、騷擾他人，保持禮貌尊重\n"
+              "• 禁止使用色情、暴力、血腥、歧視等不當言語或內容\n"
+              "• 不得進行金錢交易、索取或提供個資（例如 LINE、IG、電話）\n"
+              "• 不得錄音、偷拍或截圖他人對話，除非經雙方同意\n"
+              "• 禁止惡意模仿或干擾他人聊天\n"
+              "• 禁止使用變聲器或播放音效干擾頻道秩序",
+        inline=False
+    )
+    safety_embed.add_field(
+        name="🚨 警告事項",
+        value="• 系統將隨機錄取部分聊天內容以進行安全稽核\n"
+              "• 如被舉報違規，管理員可立即封鎖或禁言，不另行通知\n"
+              "• 為了您的安全，禁止隨意透漏個人資訊，包括(身分證、住家地址、等等......)\n"
+              "• 若你無法接受以上規範，請勿加入頻道",
+        inline=False
+    )
+    return safety_embed
+
+# 依 is_multiplayer 取用
+GROUP_SAFETY_EMBED_TEMPLATES = {
+    False: build_safety_embed(
+        "🎙️ 群組預約聊天頻道使用規範與警告",
+        "此聊天頻道為【群組預約用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。"
+    ),
+    True: build_safety_embed(
+        "🎙️ 多人陪玩聊天頻道使用規範與警告",
+        "此聊天頻道為【多人陪玩用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。"
+    ),
+}
+
+# 即時預約依 is_chat_only 取用
+INSTANT_SAFETY_EMBED_TEMPLATES = {
+    False: build_safety_embed(
+        "🎙️ 即時預約聊天頻道使用規範與警告",
+        "此聊天頻道為【即時預約用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。"
+    ),
+    True: build_safety_embed(
+        "🎙️ 純聊天預約聊天頻道使用規範與警告",
+        "此聊天頻道為【純聊天預約用途】。\n僅限輕鬆互動、日常話題、遊戲閒聊使用。\n禁止任何涉及交易、暗示、或其他非聊天用途的行為。"
+    ),
+}
+
+REGULAR_SAFETY_EMBED_TEMPLATE = build_safety_embed(
+    "🎙️ 一般預約聊天頻道使用規範與警告",
+    "此聊天頻道為【一般預約用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。"
+)
+
 # --- 創建預約文字頻道函數 ---
 async def create_booking_text_channel(booking_id, customer_discord, partner_discord, start_time, end_time):
     """為預約創建文字頻道"""
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
-            print("❌ 找不到 Discord 伺服器")
+            logger.error("❌ 找不到 Discord 伺服器")
             return None
         
         # 查找 Discord 成員
@@ -469,9 +924,9 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
         # 處理顧客 Discord ID
         if customer_discord:
             try:
-                if customer_discord.replace('.', '').replace('-', '').isdigit():
+                if SNOWFLAKE_RE.fullmatch(customer_discord):
                     # 如果是數字格式的 ID
-                    customer_member = guild.get_member(int(float(customer_discord)))
+                    customer_member = guild.get_member(int(customer_discord))
                 else:
                     # 如果是名稱格式
                     customer_member = find_member_by_discord_name(guild, customer_discord)
@@ -482,9 +937,9 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
         # 處理夥伴 Discord ID
         if partner_discord:
             try:
-                if partner_discord.replace('.', '').replace('-', '').isdigit():
+                if SNOWFLAKE_RE.fullmatch(partner_discord):
                     # 如果是數字格式的 ID
-                    partner_member = guild.get_member(int(float(partner_discord)))
+                    partner_member = guild.get_member(int(partner_discord))
                 else:
                     # 如果是名稱格式
                     partner_member = find_member_by_discord_name(guild, partner_discord)
@@ -493,38 +948,20 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
                 partner_member = None
         
         if not customer_member or not partner_member:
-            print(f"❌ 找不到 Discord 成員: 顧客={customer_discord}, 夥伴={partner_discord}")
+            logger.error("❌ 找不到 Discord 成員: 顧客=%s, 夥伴=%s", customer_discord, partner_discord)
             return None
         
         # 計算頻道持續時間
         duration_minutes = int((end_time - start_time).total_seconds() / 60)
         
-        # 創建頻道名稱 - 使用日期和時間
-        # 確保時間有時區資訊，並轉換為台灣時間
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        
-        # 轉換為台灣時間
-        tw_start_time = start_time.astimezone(TW_TZ)
-        tw_end_time = end_time.astimezone(TW_TZ)
-        
-        # 格式化日期和時間
-        date_str = tw_start_time.strftime("%m%d")  # 改為 1016 格式
-        start_time_str = tw_start_time.strftime("%H:%M")
-        end_time_str = tw_end_time.strftime("%H:%M")
-        
-        # 調試日誌
+        # 創建頻道名稱 - 使用日期和時間（台灣時間，頻道名稱與歡迎訊息共用同一次換算）
+        tw_start_time, tw_end_time, date_str, start_hm, end_hm = localize_booking_range(start_time, end_time)
         
         # 🔥 創建統一的頻道名稱 - 使用 booking ID 來生成一致的 emoji（與語音頻道相同）
-        import hashlib
-        hash_obj = hashlib.md5(str(booking_id).encode())
-        hash_hex = hash_obj.hexdigest()
-        cute_item_full = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+        cute_item_full = cute_item_for(str(booking_id))
         # 只提取 emoji 部分（去掉後面的文字）
         cute_item = cute_item_full.split()[0] if cute_item_full else "🎀"
-        channel_name = f"📅{date_str} {start_time_str}-{end_time_str} {cute_item}"
+        channel_name = f"📅{date_str} {start_hm}-{end_hm} {cute_item}"
         
         # 設定權限
         overwrites = {
@@ -534,17 +971,10 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
         }
         
         # 找到分類
-        category = discord.utils.get(guild.categories, name="Text Channels")
-        if not category:
-            category = discord.utils.get(guild.categories, name="文字頻道")
+        category = find_category(guild, TEXT_CATEGORY_NAMES)
         if not category:
-            category = discord.utils.get(guild.categories, name="文字")
-        if not category:
-            if guild.categories:
-                category = guild.categories[0]
-            else:
-                print("❌ 找不到任何分類")
-                return None
+            logger.error("❌ 找不到任何分類")
+            return None
         
         # 創建文字頻道（429 安全）
         text_channel = await safe_create_text_channel(
@@ -555,18 +985,8 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
         )
         
         # 發送歡迎訊息 - 修正時區顯示
-        # 確保時間有時區資訊，並轉換為台灣時間
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        
-        # 轉換為台灣時間
-        tw_start_time = start_time.astimezone(TW_TZ)
-        tw_end_time = end_time.astimezone(TW_TZ)
-        
         start_time_str = tw_start_time.strftime("%Y/%m/%d %H:%M")
-        end_time_str = tw_end_time.strftime("%H:%M")
+        end_time_str = end_hm
         
         embed = discord.Embed(
             title=f"🎮 預約頻道",
@@ -580,46 +1000,12 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
             color=0x00ff00
         )
         
-        await text_channel.send(embed=embed)
-        
-        # 發送安全規範
-        safety_embed = discord.Embed(
-            title="🎙️ 聊天頻道使用規範與警告",
-            description="為了您的安全，請務必遵守以下規範：",
-            color=0xff6b6b,
-            timestamp=datetime.now(timezone.utc)
-        )
-        
-        safety_embed.add_field(
-            name="📌 頻道性質",
-            value="此語音頻道為【單純聊天用途】。\n僅限輕鬆互動、日常話題、遊戲閒聊使用。\n禁止任何涉及交易、暗示、或其他非聊天用途的行為。",
-            inline=False
-        )
-        
-        safety_embed.add_field(
-            name="⚠️ 使用規範（請務必遵守）",
-            value="• 禁止挑釁、辱罵、騷擾他人，保持禮貌尊重\n"
-                  "• 禁止使用色情、暴力、血腥、歧視等不當言語或內容\n"
-                  "• 不得進行金錢交易、索取或提供個資（例如 LINE、IG、電話）\n"
-                  "• 不得錄音、偷拍或截圖他人對話，除非經雙方同意\n"
-                  "• 禁止語音假裝、惡意模仿或干擾他人聊天\n"
-                  "• 禁止使用變聲器或播放音效干擾頻道秩序",
-            inline=False
-        )
-        
-        safety_embed.add_field(
-            name="🚨 警告事項",
-            value="• 系統將隨機錄取部分語音內容以進行安全稽核\n"
-                  "• 如被舉報違規，管理員可立即封鎖或禁言，不另行通知\n"
-                  "• 為了您的安全，禁止隨意透漏個人資訊，包括(身分證、住家地址、等等......)\n"
-                  "• 若你無法接受以上規範，請勿加入頻道",
-            inline=False
-        )
-        
-        await text_channel.send(embed=safety_embed)
+        # 發送安全規範（固定內容，複製模組層級模板後只補上時間戳）
+        safety_embed = SAFETY_EMBED_TEMPLATE.copy()
+        safety_embed.timestamp = datetime.now(timezone.utc)
         
         # 發送預約通知到指定頻道
-        notification_channel = bot.get_channel(1419585779432423546)
+        notification_channel = get_notification_channel()
         if notification_channel:
             notification_embed = discord.Embed(
                 title="🎉 新預約通知",
@@ -662,59 +1048,65 @@ async def create_booking_text_channel(booking_id, customer_discord, partner_disc
                 inline=True
             )
             
-            await notification_channel.send(embed=notification_embed)
-            # 已發送預約通知，減少日誌輸出
-            
         
         # 保存頻道 ID 到資料庫
-        try:
+        def save_text_channel_id():
             with Session() as s:
-                # 先檢查欄位是否存在
-                check_column = s.execute(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'Booking' 
-                    AND column_name = 'discordTextChannelId'
-                """)).fetchone()
-                
-                if check_column:
-                    # 更新預約記錄，保存 Discord 頻道 ID
-                    result = s.execute(
-                        text("UPDATE \"Booking\" SET \"discordTextChannelId\" = :channel_id WHERE id = :booking_id"),
-                        {"channel_id": str(text_channel.id), "booking_id": booking_id}
-                    )
-                    s.commit()
-                    # 已保存文字頻道ID，減少日誌輸出
-                else:
-                    print(f"⚠️ Discord 欄位尚未創建，跳過保存頻道 ID")
-        except Exception as db_error:
-            print(f"❌ 保存頻道 ID 到資料庫失敗: {db_error}")
-            # 即使保存失敗，頻道仍然可以使用
+                # 先檢查欄位是否存在（欄位清單已快取，不會每次查詢 information_schema）
+                if not booking_has_columns(s, 'discordTextChannelId'):
+                    return False
+                # 更新預約記錄，保存 Discord 頻道 ID
+                s.execute(
+                    text("UPDATE \"Booking\" SET \"discordTextChannelId\" = :channel_id WHERE id = :booking_id"),
+                    {"channel_id": str(text_channel.id), "booking_id": booking_id}
+                )
+                s.commit()
+                return True
+        
+        async def save_channel_id():
+            try:
+                if not await asyncio.to_thread(save_text_channel_id):
+                    logger.warning("⚠️ Discord 欄位尚未創建，跳過保存頻道 ID")
+            except Exception as db_error:
+                logger.error("❌ 保存頻道 ID 到資料庫失敗: %s", db_error)
+                # 即使保存失敗，頻道仍然可以使用
+        
+        async def send_channel_intro():
+            # 歡迎訊息必須在安全規範之前，兩則依序發送
+            await text_channel.send(embed=embed)
+            await text_channel.send(embed=safety_embed)
         
+        # 頻道內訊息、通知頻道、資料庫寫入互不相依，同時進行；單一步驟失敗不影響其他步驟
+        pending = [send_channel_intro(), save_channel_id()]
+        if notification_channel:
+            pending.append(notification_channel.send(embed=notification_embed))
         # 通知創建頻道頻道
-        channel_creation_channel = bot.get_channel(CHANNEL_CREATION_CHANNEL_ID)
+        channel_creation_channel = get_channel_creation_channel()
         if channel_creation_channel:
-            await channel_creation_channel.send(
+            pending.append(channel_creation_channel.send(
                 f"📝 預約文字頻道已創建：\n"
                 f"📋 預約ID: {booking_id}\n"
                 f"👤 顧客: {customer_member.mention} ({customer_discord})\n"
                 f"👥 夥伴: {partner_member.mention} ({partner_discord})\n"
                 f"⏰ 時間: {start_time_str} - {end_time_str}\n"
                 f"💬 頻道: {text_channel.mention}"
-            )
+            ))
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning("⚠️ 預約文字頻道 %s 的訊息發送失敗: %s", booking_id, result)
         
         # 頻道創建成功，減少日誌輸出
         return text_channel
         
     except Exception as e:
-        print(f"❌ 創建預約文字頻道時發生錯誤: {e}")
+        logger.error("❌ 創建預約文字頻道時發生錯誤: %s", e)
         return None
 
 # --- 創建預約語音頻道函數 ---
 async def create_group_booking_voice_channel(group_booking_id, customer_discord, partner_discords, start_time, end_time, is_multiplayer=False):
     """為群組預約或多人陪玩創建語音頻道"""
-    try:
-        # ✅ 統一判斷依據：根據 is_multiplayer 檢查對應的資料表
+    # ✅ 統一判斷依據：根據 is_multiplayer 使用對應的資料表
+    def query_voice_channel_id():
         with Session() as s:
             if is_multiplayer:
                 # ✅ 多人陪玩：檢查 MultiPlayerBooking 表
@@ -730,16 +1122,37 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
                     FROM "GroupBooking" 
                     WHERE id = :group_id
                 """), {'group_id': group_booking_id}).fetchone()
-            
-            if existing and existing[0]:
-                # 檢查頻道是否真的存在
-                guild = bot.get_guild(GUILD_ID)
-                if guild:
-                    existing_channel = guild.get_channel(int(existing[0]))
-                    if existing_channel:
-                        return existing_channel
+            return existing[0] if existing else None
+    
+    def save_voice_channel_id(channel_id):
+        with Session() as s:
+            if is_multiplayer:
+                # ✅ 多人陪玩：更新 MultiPlayerBooking 表
+                s.execute(text("""
+                    UPDATE "MultiPlayerBooking"
+                    SET "discordVoiceChannelId" = :channel_id
+                    WHERE id = :booking_id
+                """), {'channel_id': str(channel_id), 'booking_id': group_booking_id})
+            else:
+                # 群組預約：更新 GroupBooking 表
+                s.execute(text("""
+                    UPDATE "GroupBooking"
+                    SET "discordVoiceChannelId" = :channel_id
+                    WHERE id = :group_id
+                """), {'channel_id': str(channel_id), 'group_id': group_booking_id})
+            s.commit()
+    
+    try:
+        existing_channel_id = await asyncio.to_thread(query_voice_channel_id)
+        if existing_channel_id:
+            # 檢查頻道是否真的存在
+            guild = get_main_guild()
+            if guild:
+                existing_channel = guild.get_channel(int(existing_channel_id))
+                if existing_channel:
+                    return existing_channel
         
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return None
@@ -759,26 +1172,9 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
         # 🔥 如果找不到成員，先檢查是否已經有頻道存在（使用一開始創建的頻道）
         if not customer_member or not partner_members:
             # 計算頻道名稱以查找已存在的頻道
-            if start_time.tzinfo is None:
-                start_time_temp = start_time.replace(tzinfo=timezone.utc)
-            else:
-                start_time_temp = start_time
-            if end_time.tzinfo is None:
-                end_time_temp = end_time.replace(tzinfo=timezone.utc)
-            else:
-                end_time_temp = end_time
-            
-            tw_start_time_temp = start_time_temp.astimezone(TW_TZ)
-            tw_end_time_temp = end_time_temp.astimezone(TW_TZ)
-            
-            date_str_temp = tw_start_time_temp.strftime("%m%d")
-            start_time_str_temp = tw_start_time_temp.strftime("%H:%M")
-            end_time_str_temp = tw_end_time_temp.strftime("%H:%M")
+            _, _, date_str_temp, start_time_str_temp, end_time_str_temp = localize_booking_range(start_time, end_time)
             
-            import hashlib
-            hash_obj = hashlib.md5(str(group_booking_id).encode())
-            hash_hex = hash_obj.hexdigest()
-            cute_item_temp = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+            cute_item_temp = cute_item_for(str(group_booking_id))
             
             if is_multiplayer:
                 channel_name_temp = f"👥多人陪玩{date_str_temp} {start_time_str_temp}-{end_time_str_temp} {cute_item_temp}"
@@ -801,23 +1197,10 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
         duration_minutes = int((end_time - start_time).total_seconds() / 60)
         
         # 創建頻道名稱
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        
-        tw_start_time = start_time.astimezone(TW_TZ)
-        tw_end_time = end_time.astimezone(TW_TZ)
-        
-        date_str = tw_start_time.strftime("%m%d")
-        start_time_str = tw_start_time.strftime("%H:%M")
-        end_time_str = tw_end_time.strftime("%H:%M")
+        tw_start_time, tw_end_time, date_str, start_time_str, end_time_str = localize_booking_range(start_time, end_time)
         
         # 🔥 使用 group_booking_id 的 hash 來確定性地選擇動物，確保文字和語音頻道使用相同的動物
-        import hashlib
-        hash_obj = hashlib.md5(str(group_booking_id).encode())
-        hash_hex = hash_obj.hexdigest()
-        cute_item = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+        cute_item = cute_item_for(str(group_booking_id))
         # ✅ 頻道命名修正：多人陪玩使用「多人陪玩」，群組預約使用「群組預約」
         if is_multiplayer:
             channel_name = f"👥多人陪玩{date_str} {start_time_str}-{end_time_str} {cute_item}"
@@ -825,27 +1208,11 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
             channel_name = f"👥群組預約{date_str} {start_time_str}-{end_time_str} {cute_item}"
         
         # ✅ 再次檢查資料庫（防止在檢查和創建之間有其他進程創建了頻道）
-        with Session() as s:
-            if is_multiplayer:
-                # ✅ 多人陪玩：檢查 MultiPlayerBooking 表
-                existing_check = s.execute(text("""
-                    SELECT "discordVoiceChannelId" 
-                    FROM "MultiPlayerBooking" 
-                    WHERE id = :booking_id
-                """), {'booking_id': group_booking_id}).fetchone()
-            else:
-                # 群組預約：檢查 GroupBooking 表
-                existing_check = s.execute(text("""
-                    SELECT "discordVoiceChannelId" 
-                    FROM "GroupBooking" 
-                    WHERE id = :group_id
-                """), {'group_id': group_booking_id}).fetchone()
-            
-            if existing_check and existing_check[0]:
-                existing_channel = guild.get_channel(int(existing_check[0]))
-                if existing_channel:
-                    # 只在第一次檢查時打印，避免重複日誌
-                    return existing_channel
+        existing_channel_id = await asyncio.to_thread(query_voice_channel_id)
+        if existing_channel_id:
+            existing_channel = guild.get_channel(int(existing_channel_id))
+            if existing_channel:
+                return existing_channel
         
         # ✅ 檢查是否已存在相同名稱的語音頻道（防止重複創建）
         existing_channels = [ch for ch in guild.voice_channels if ch.name == channel_name]
@@ -853,22 +1220,7 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
             # 如果找到相同名稱的頻道，更新資料庫
             channel_type = "多人陪玩" if is_multiplayer else "群組預約"
             print(f"⚠️ 已存在相同名稱的{channel_type}語音頻道: {channel_name}，更新資料庫並返回現有頻道")
-            with Session() as s:
-                if is_multiplayer:
-                    # ✅ 多人陪玩：更新 MultiPlayerBooking 表
-                    s.execute(text("""
-                        UPDATE "MultiPlayerBooking"
-                        SET "discordVoiceChannelId" = :channel_id
-                        WHERE id = :booking_id
-                    """), {'channel_id': str(existing_channels[0].id), 'booking_id': group_booking_id})
-                else:
-                    # 群組預約：更新 GroupBooking 表
-                    s.execute(text("""
-                        UPDATE "GroupBooking"
-                        SET "discordVoiceChannelId" = :channel_id
-                        WHERE id = :group_id
-                    """), {'channel_id': str(existing_channels[0].id), 'group_id': group_booking_id})
-                s.commit()
+            await asyncio.to_thread(save_voice_channel_id, existing_channels[0].id)
             return existing_channels[0]
         
         # 設置權限 - 包含顧客和所有夥伴
@@ -880,13 +1232,7 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
         for partner_member in partner_members:
             overwrites[partner_member] = discord.PermissionOverwrite(view_channel=True, connect=True, speak=True)
         
-        category = discord.utils.get(guild.categories, name="Voice Channels")
-        if not category:
-            category = discord.utils.get(guild.categories, name="語音頻道")
-        if not category:
-            category = discord.utils.get(guild.categories, name="語音")
-        if not category:
-            category = guild.categories[0] if guild.categories else None
+        category = find_category(guild, VOICE_CATEGORY_NAMES)
         
         # 創建語音頻道
         vc = await guild.create_voice_channel(
@@ -901,43 +1247,40 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
         # ✅ 多人陪玩：使用第一個夥伴作為 user2_id（用於配對記錄）
         user2_id = str(partner_members[0].id) if partner_members else None
         
+        def create_pairing_record():
+            with Session() as s:
+                # 🔥 先檢查是否已經有配對記錄
+                existing_record = s.execute(text("""
+                    SELECT id 
+                    FROM "PairingRecord" 
+                    WHERE "bookingId" = :booking_id
+                """), {'booking_id': group_booking_id}).fetchone()
+                
+                if existing_record:
+                    print(f"⚠️ 配對記錄已存在: {existing_record[0]}，跳過創建")
+                    return existing_record[0]
+                new_record_id = f"group_{uuid.uuid4().hex[:12]}"
+                # ✅ 多人陪玩使用「多人陪玩」作為 animalName，群組預約使用「群組預約」
+                animal_name = "多人陪玩" if is_multiplayer else "群組預約"
+                s.add(PairingRecord(
+                    id=new_record_id,
+                    user1Id=user1_id,
+                    user2Id=user2_id,
+                    duration=duration_minutes * 60,
+                    animalName=animal_name,
+                    bookingId=group_booking_id
+                ))
+                s.commit()
+                print(f"✅ 創建配對記錄: {new_record_id} ({animal_name})")
+                return new_record_id
+        
         record_id = None
         if user2_id:
-            with Session() as s:
-                try:
-                    # 🔥 先檢查是否已經有配對記錄
-                    existing_record = s.execute(text("""
-                        SELECT id 
-                        FROM "PairingRecord" 
-                        WHERE "bookingId" = :booking_id
-                    """), {'booking_id': group_booking_id}).fetchone()
-                    
-                    if existing_record:
-                        record_id = existing_record[0]
-                        print(f"⚠️ 配對記錄已存在: {record_id}，跳過創建")
-                    else:
-                        import uuid
-                        record_id = f"group_{uuid.uuid4().hex[:12]}"
-                        # ✅ 多人陪玩使用「多人陪玩」作為 animalName，群組預約使用「群組預約」
-                        animal_name = "多人陪玩" if is_multiplayer else "群組預約"
-                        record = PairingRecord(
-                            id=record_id,
-                            user1Id=user1_id,
-                            user2Id=user2_id,
-                            duration=duration_minutes * 60,
-                            animalName=animal_name,
-                            bookingId=group_booking_id
-                        )
-                        s.add(record)
-                        s.commit()
-                        created_at = record.createdAt
-                        print(f"✅ 創建配對記錄: {record_id} ({animal_name})")
-                except Exception as e:
-                    print(f"❌ 創建配對記錄失敗: {e}")
-                    try:
-                        record_id = "temp_" + str(int(time.time()))
-                    except:
-                        record_id = None
+            try:
+                record_id = await asyncio.to_thread(create_pairing_record)
+            except Exception as e:
+                print(f"❌ 創建配對記錄失敗: {e}")
+                record_id = "temp_" + str(int(time.time()))
         
         # 記錄活躍語音頻道
         active_voice_channels[vc.id] = {
@@ -953,7 +1296,7 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
         }
         
         # 發送通知
-        channel_creation_channel = bot.get_channel(CHANNEL_CREATION_CHANNEL_ID)
+        channel_creation_channel = get_channel_creation_channel()
         if channel_creation_channel:
             group_embed = discord.Embed(
                 title="👥 多人陪玩語音頻道已創建" if is_multiplayer else "👥 群組預約語音頻道已創建",
@@ -1007,33 +1350,11 @@ async def create_group_booking_voice_channel(group_booking_id, customer_discord,
             await channel_creation_channel.send(embed=group_embed)
         
         # ✅ 更新資料庫中的語音頻道ID（根據 is_multiplayer 更新對應的資料表）
-        with Session() as s:
-            try:
-                if is_multiplayer:
-                    # ✅ 多人陪玩：更新 MultiPlayerBooking 表
-                    s.execute(text("""
-                        UPDATE "MultiPlayerBooking" 
-                        SET "discordVoiceChannelId" = :channel_id
-                        WHERE id = :booking_id
-                    """), {
-                        'channel_id': str(vc.id),
-                        'booking_id': group_booking_id
-                    })
-                else:
-                    # 群組預約：更新 GroupBooking 表
-                    s.execute(text("""
-                        UPDATE "GroupBooking" 
-                        SET "discordVoiceChannelId" = :channel_id
-                        WHERE id = :group_id
-                    """), {
-                        'channel_id': str(vc.id),
-                        'group_id': group_booking_id
-                    })
-                s.commit()
-            except Exception as e:
-                channel_type = "多人陪玩" if is_multiplayer else "群組預約"
-                print(f"⚠️ 更新{channel_type}語音頻道ID失敗: {e}")
-                s.rollback()
+        try:
+            await asyncio.to_thread(save_voice_channel_id, vc.id)
+        except Exception as e:
+            channel_type = "多人陪玩" if is_multiplayer else "群組預約"
+            print(f"⚠️ 更新{channel_type}語音頻道ID失敗: {e}")
         
         return vc
         
@@ -1052,8 +1373,8 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
         end_time: 結束時間
         is_multiplayer: 是否為多人陪玩（用於區分命名和資料表）
     """
-    try:
-        # ✅ 統一判斷依據：根據 is_multiplayer 檢查對應的資料表
+    # ✅ 統一判斷依據：根據 is_multiplayer 檢查對應的資料表
+    def query_text_channel_id():
         with Session() as s:
             if is_multiplayer:
                 # ✅ 多人陪玩：檢查 MultiPlayerBooking 表
@@ -1069,27 +1390,27 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
                     FROM "GroupBooking" 
                     WHERE id = :group_id
                 """), {'group_id': group_booking_id}).fetchone()
-            
-            if existing and existing[0]:
-                # 檢查頻道是否真的存在
-                guild = bot.get_guild(GUILD_ID)
-                if guild:
-                    existing_channel = guild.get_channel(int(existing[0]))
-                    if existing_channel:
-                        channel_type = "多人陪玩" if is_multiplayer else "群組預約"
-                        print(f"⚠️ {channel_type}文字頻道已存在: {existing_channel.name} (ID: {existing_channel.id})，跳過創建")
-                        return existing_channel
+            return existing[0] if existing else None
+    
+    try:
+        existing_channel_id = await asyncio.to_thread(query_text_channel_id)
+        if existing_channel_id:
+            # 檢查頻道是否真的存在
+            guild = get_main_guild()
+            if guild:
+                existing_channel = guild.get_channel(int(existing_channel_id))
+                if existing_channel:
+                    channel_type = "多人陪玩" if is_multiplayer else "群組預約"
+                    print(f"⚠️ {channel_type}文字頻道已存在: {existing_channel.name} (ID: {existing_channel.id})，跳過創建")
+                    return existing_channel
         
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return None
         
         # 🔥 使用 group_booking_id 的 hash 來確定性地選擇動物，確保文字和語音頻道使用相同的動物
-        import hashlib
-        hash_obj = hashlib.md5(str(group_booking_id).encode())
-        hash_hex = hash_obj.hexdigest()
-        animal = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+        animal = cute_item_for(str(group_booking_id))
         # ✅ 頻道命名修正：多人陪玩使用「多人陪玩聊天」，群組預約使用「群組預約聊天」
         if is_multiplayer:
             channel_name = f"👥{animal}多人陪玩聊天"
@@ -1169,17 +1490,10 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
         tw_end_time = end_dt.astimezone(TW_TZ)
         
         # 創建分類
-        category = discord.utils.get(guild.categories, name="Voice Channels")
-        if not category:
-            category = discord.utils.get(guild.categories, name="語音頻道")
-        if not category:
-            category = discord.utils.get(guild.categories, name="語音")
+        category = find_category(guild, VOICE_CATEGORY_NAMES)
         if not category:
-            if guild.categories:
-                category = guild.categories[0]
-            else:
-                print("❌ 找不到任何分類")
-                return None
+            print("❌ 找不到任何分類")
+            return None
         
         # 設定權限
         overwrites = {
@@ -1250,46 +1564,13 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
         
         await text_channel.send(embed=welcome_embed)
         
-        # 發送安全規範（根據類型切換文案）
-        safety_title = "🎙️ 多人陪玩聊天頻道使用規範與警告" if is_multiplayer else "🎙️ 群組預約聊天頻道使用規範與警告"
-        safety_channel_nature = (
-            "此聊天頻道為【多人陪玩用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。"
-            if is_multiplayer
-            else "此聊天頻道為【群組預約用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。"
-        )
-        safety_embed = discord.Embed(
-            title=safety_title,
-            description="為了您的安全，請務必遵守以下規範：",
-            color=0xff6b6b,
-            timestamp=datetime.now(timezone.utc)
-        )
-        safety_embed.add_field(
-            name="📌 頻道性質",
-            value=safety_channel_nature,
-            inline=False
-        )
-        safety_embed.add_field(
-            name="⚠️ 使用規範（請務必遵守）",
-            value="• 禁止挑釁、辱罵、騷擾他人，保持禮貌尊重\n"
-                  "• 禁止使用色情、暴力、血腥、歧視等不當言語或內容\n"
-                  "• 不得進行金錢交易、索取或提供個資（例如 LINE、IG、電話）\n"
-                  "• 不得錄音、偷拍或截圖他人對話，除非經雙方同意\n"
-                  "• 禁止惡意模仿或干擾他人聊天\n"
-                  "• 禁止使用變聲器或播放音效干擾頻道秩序",
-            inline=False
-        )
-        safety_embed.add_field(
-            name="🚨 警告事項",
-            value="• 系統將隨機錄取部分聊天內容以進行安全稽核\n"
-                  "• 如被舉報違規，管理員可立即封鎖或禁言，不另行通知\n"
-                  "• 為了您的安全，禁止隨意透漏個人資訊，包括(身分證、住家地址、等等......)\n"
-                  "• 若你無法接受以上規範，請勿加入頻道",
-            inline=False
-        )
+        # 發送安全規範（根據類型取用預先建好的模板，只補上時間戳）
+        safety_embed = GROUP_SAFETY_EMBED_TEMPLATES[bool(is_multiplayer)].copy()
+        safety_embed.timestamp = datetime.now(timezone.utc)
         await text_channel.send(embed=safety_embed)
         
         # 🔥 更新資料庫，保存文字頻道 ID
-        try:
+        def save_text_channel_id():
             with Session() as s:
                 if is_multiplayer:
                     s.execute(
@@ -1302,15 +1583,15 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
                         {"channel_id": str(text_channel.id), "group_id": group_booking_id}
                     )
                 s.commit()
-                channel_type = "多人陪玩" if is_multiplayer else "群組預約"
-                # 更新資料庫成功，終端輸出略過以減少雜訊
-                # print(f"✅ 已更新{channel_type}文字頻道 ID 到資料庫: {text_channel.id}")
+        
+        try:
+            await asyncio.to_thread(save_text_channel_id)
         except Exception as db_err:
             channel_type = "多人陪玩" if is_multiplayer else "群組預約"
             print(f"❌ 更新{channel_type}文字頻道 ID 到資料庫失敗: {db_err}")
         
         # 🔥 發送預約通知到「創建通知」頻道（與一般預約邏輯一致）
-        notification_channel = bot.get_channel(1419585779432423546)
+        notification_channel = get_notification_channel()
         if notification_channel:
             try:
                 # 計算時長（分鐘）- 使用已轉換的台灣時間
@@ -1362,7 +1643,7 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
             except Exception as e:
                 print(f"⚠️ 發送群組預約通知失敗: {e}")
         else:
-            print(f"⚠️ 找不到創建通知頻道 (ID: 1419585779432423546)")
+            print(f"⚠️ 找不到創建通知頻道 (ID: {BOOKING_NOTIFICATION_CHANNEL_ID})")
         
         return text_channel
         
@@ -1370,6 +1651,99 @@ async def create_group_booking_text_channel(group_booking_id, customer_discords,
         print(f"❌ 創建群組預約文字頻道失敗: {e}")
         return None
 
+def get_group_booking_participants(booking_id, is_mp):
+    """取得群組預約/多人陪玩的參與者 Discord 名稱列表（同步，需經 asyncio.to_thread 呼叫）"""
+    with Session() as s:
+        if is_mp:
+            # 多人陪玩：從 Booking 表獲取參與者
+            result = s.execute(text("""
+                SELECT DISTINCT cu.discord as customer_discord, pu.discord as partner_discord
+                FROM "MultiPlayerBooking" mpb
+                JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
+                JOIN "Customer" c ON c.id = b."customerId"
+                JOIN "User" cu ON cu.id = c."userId"
+                JOIN "Schedule" s ON s.id = b."scheduleId"
+                JOIN "Partner" p ON p.id = s."partnerId"
+                JOIN "User" pu ON pu.id = p."userId"
+                WHERE mpb.id = :booking_id
+                AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')
+            """), {"booking_id": booking_id}).fetchall()
+        else:
+            # 群組預約：從 GroupBooking 和 GroupBookingParticipant 獲取參與者
+            result = s.execute(text("""
+                SELECT DISTINCT cu.discord as customer_discord, pu.discord as partner_discord
+                FROM "GroupBooking" gb
+                LEFT JOIN "Booking" b ON b."groupBookingId" = gb.id
+                LEFT JOIN "Customer" c ON c.id = b."customerId"
+                LEFT JOIN "User" cu ON cu.id = c."userId"
+                LEFT JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
+                LEFT JOIN "Partner" p ON p.id = gbp."partnerId"
+                LEFT JOIN "User" pu ON pu.id = p."userId"
+                WHERE gb.id = :booking_id
+            """), {"booking_id": booking_id}).fetchall()
+        
+        members = []
+        for row in result:
+            if row.customer_discord:
+                members.append(row.customer_discord)
+            if row.partner_discord:
+                members.append(row.partner_discord)
+        return list(set(members))
+
+async def send_group_countdown_reminder(text_channel, booking_type, minutes_left):
+    """發送群組預約/多人陪玩的結束前倒數提醒"""
+    try:
+        if minutes_left == 1:
+            await text_channel.send(f"⏰ {booking_type}還有 1 分鐘結束！")
+            return
+        embed = discord.Embed(
+            title=f"⏰ {booking_type}提醒",
+            description=f"{booking_type}還有 {minutes_left} 分鐘結束，請準備結束遊戲。",
+            color=0xff9900
+        )
+        await text_channel.send(embed=embed)
+    except Exception as e:
+        print(f"❌ 發送{booking_type}倒數提醒失敗: {e}")
+
+async def finish_group_countdown(text_channel, group_booking_id, is_multiplayer=False):
+    """群組預約或多人陪玩時間結束：顯示評價系統，5 分鐘後刪除文字頻道"""
+    booking_type = "多人陪玩" if is_multiplayer else "群組預約"
+    try:
+        # 🔥 檢查是否已經發送過評價系統（防止重複發送）
+        if group_booking_id not in rating_sent_bookings:
+            participants = await asyncio.to_thread(get_group_booking_participants, group_booking_id, is_multiplayer)
+            
+            # 🔥 使用 show_group_rating_system 顯示評價系統（支持多人陪玩和群組預約）
+            await show_group_rating_system(text_channel, group_booking_id, participants, is_multiplayer=is_multiplayer)
+            rating_sent_bookings.add(group_booking_id)
+        else:
+            print(f"⚠️ {booking_type} {group_booking_id} 已發送過評價系統，跳過")
+        
+        # 等待5分鐘讓用戶填寫評價，然後刪除文字頻道
+        await asyncio.sleep(300)  # 5分鐘 = 300秒
+        
+        # 刪除文字頻道
+        try:
+            if text_channel:
+                # 🔥 使用 try-except 來檢查頻道是否已刪除，而不是檢查 deleted 屬性
+                try:
+                    # 嘗試訪問頻道屬性來檢查是否還存在
+                    _ = text_channel.name
+                    await text_channel.delete()
+                except (discord.errors.NotFound, AttributeError):
+                    # 頻道已經被刪除，靜默處理
+                    pass
+        except Exception as e:
+            print(f"❌ 刪除群組預約文字頻道失敗: {e}")
+        finally:
+            # 不論刪除成功與否都清理追蹤
+            group_rating_text_channels.pop(group_booking_id, None)
+            group_rating_channel_created_time.pop(group_booking_id, None)
+    except Exception as e:
+        print(f"❌ {booking_type}結束處理錯誤: {e}")
+        import traceback
+        traceback.print_exc()
+
 async def countdown_with_group_rating(vc_id, channel_name, text_channel, vc, members, record_id, group_booking_id, is_multiplayer=False):
     """群組預約或多人陪玩的倒數計時函數，包含評價系統
     
@@ -1385,7 +1759,7 @@ async def countdown_with_group_rating(vc_id, channel_name, text_channel, vc, mem
     """
     try:
         # 獲取 guild 對象
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print(f"❌ 找不到 Guild ID: {GUILD_ID}")
             return
@@ -1395,31 +1769,32 @@ async def countdown_with_group_rating(vc_id, channel_name, text_channel, vc, mem
         
         # 🔥 根據類型從對應的資料表獲取預約開始和結束時間
         booking_type = "多人陪玩" if is_multiplayer else "群組預約"
-        with Session() as s:
-            if is_multiplayer:
-                # 多人陪玩：從 MultiPlayerBooking 表查詢
-                result = s.execute(text("""
-                    SELECT mpb."startTime", mpb."endTime"
-                    FROM "MultiPlayerBooking" mpb
-                    WHERE mpb.id = :booking_id
-                """), {"booking_id": group_booking_id}).fetchone()
-            else:
+        def query_booking_times():
+            with Session() as s:
+                if is_multiplayer:
+                    # 多人陪玩：從 MultiPlayerBooking 表查詢
+                    return s.execute(text("""
+                        SELECT mpb."startTime", mpb."endTime"
+                        FROM "MultiPlayerBooking" mpb
+                        WHERE mpb.id = :booking_id
+                    """), {"booking_id": group_booking_id}).fetchone()
                 # 群組預約：從 GroupBooking 表查詢
-                result = s.execute(text("""
+                return s.execute(text("""
                     SELECT gb."startTime", gb."endTime", gb."currentParticipants", gb."maxParticipants"
                     FROM "GroupBooking" gb
                     WHERE gb.id = :group_booking_id
                 """), {"group_booking_id": group_booking_id}).fetchone()
-            
-            if not result:
-                print(f"❌ 找不到{booking_type}記錄: {group_booking_id}")
-                return
-            
-            start_time = result[0]
-            end_time = result[1]
-            # 群組預約才有參與者數量
-            current_participants = result[2] if not is_multiplayer else None
-            max_participants = result[3] if not is_multiplayer else None
+        
+        result = await asyncio.to_thread(query_booking_times)
+        if not result:
+            print(f"❌ 找不到{booking_type}記錄: {group_booking_id}")
+            return
+        
+        start_time = result[0]
+        end_time = result[1]
+        # 群組預約才有參與者數量
+        current_participants = result[2] if not is_multiplayer else None
+        max_participants = result[3] if not is_multiplayer else None
         
         # 處理時區：確保時間有時區信息
         # 如果從資料庫獲取的是 naive datetime，需要轉換為 aware datetime
@@ -1440,211 +1815,33 @@ async def countdown_with_group_rating(vc_id, channel_name, text_channel, vc, mem
         remaining_seconds = int((end_time - now).total_seconds())
         
         
+        booking_type = "多人陪玩" if is_multiplayer else "群組預約"
         if remaining_seconds <= 0:
-            booking_type = "多人陪玩" if is_multiplayer else "群組預約"
             print(f"⏰ {booking_type} {group_booking_id} 已結束")
-            
-            # 🔥 檢查是否已經發送過評價系統（防止重複發送）
-            if group_booking_id not in rating_sent_bookings:
-                # 🔥 獲取參與者列表
-                def get_participants(booking_id, is_mp):
-                    with Session() as s:
-                        if is_mp:
-                            # 多人陪玩：從 Booking 表獲取參與者
-                            result = s.execute(text("""
-                                SELECT DISTINCT cu.discord as customer_discord, pu.discord as partner_discord
-                                FROM "MultiPlayerBooking" mpb
-                                JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
-                                JOIN "Customer" c ON c.id = b."customerId"
-                                JOIN "User" cu ON cu.id = c."userId"
-                                JOIN "Schedule" s ON s.id = b."scheduleId"
-                                JOIN "Partner" p ON p.id = s."partnerId"
-                                JOIN "User" pu ON pu.id = p."userId"
-                                WHERE mpb.id = :booking_id
-                                AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')
-                            """), {"booking_id": booking_id}).fetchall()
-                        else:
-                            # 群組預約：從 GroupBooking 和 GroupBookingParticipant 獲取參與者
-                            result = s.execute(text("""
-                                SELECT DISTINCT cu.discord as customer_discord, pu.discord as partner_discord
-                                FROM "GroupBooking" gb
-                                LEFT JOIN "Booking" b ON b."groupBookingId" = gb.id
-                                LEFT JOIN "Customer" c ON c.id = b."customerId"
-                                LEFT JOIN "User" cu ON cu.id = c."userId"
-                                LEFT JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
-                                LEFT JOIN "Partner" p ON p.id = gbp."partnerId"
-                                LEFT JOIN "User" pu ON pu.id = p."userId"
-                                WHERE gb.id = :booking_id
-                            """), {"booking_id": booking_id}).fetchall()
-                        
-                        members = []
-                        for row in result:
-                            if row.customer_discord:
-                                members.append(row.customer_discord)
-                            if row.partner_discord:
-                                members.append(row.partner_discord)
-                        return list(set(members))
-                
-                participants = await asyncio.to_thread(get_participants, group_booking_id, is_multiplayer)
-                
-                # 🔥 使用 show_group_rating_system 顯示評價系統（支持多人陪玩和群組預約）
-                await show_group_rating_system(text_channel, group_booking_id, participants, is_multiplayer=is_multiplayer)
-                rating_sent_bookings.add(group_booking_id)
-            else:
-                print(f"⚠️ {booking_type} {group_booking_id} 已發送過評價系統，跳過")
-            
-            # 等待5分鐘讓用戶填寫評價，然後刪除文字頻道
-            await asyncio.sleep(300)  # 5分鐘 = 300秒
-            
-            # 刪除文字頻道
-            try:
-                if text_channel:
-                    # 🔥 使用 try-except 來檢查頻道是否已刪除，而不是檢查 deleted 屬性
-                    try:
-                        # 嘗試訪問頻道屬性來檢查是否還存在
-                        _ = text_channel.name
-                        await text_channel.delete()
-                        # 清理追蹤
-                        group_rating_text_channels.pop(group_booking_id, None)
-                        group_rating_channel_created_time.pop(group_booking_id, None)
-                    except (discord.errors.NotFound, AttributeError):
-                        # 頻道已經被刪除，靜默處理
-                        group_rating_text_channels.pop(group_booking_id, None)
-                        group_rating_channel_created_time.pop(group_booking_id, None)
-                        pass
-            except Exception as e:
-                print(f"❌ 刪除群組預約文字頻道失敗: {e}")
-                # 即使刪除失敗，也清理追蹤
-                group_rating_text_channels.pop(group_booking_id, None)
-                group_rating_channel_created_time.pop(group_booking_id, None)
+            await finish_group_countdown(text_channel, group_booking_id, is_multiplayer)
             return
         
-        # 發送倒數提醒（只有在預約總時長超過提醒時長時才發送）
-        # 10分鐘提醒：只有在總時長超過10分鐘，且剩餘時間超過10分鐘時才發送
-        if total_duration_seconds > 600 and remaining_seconds > 600:  # 總時長和剩餘時間都超過10分鐘
-            # 等待到結束前10分鐘
-            await asyncio.sleep(remaining_seconds - 600)
-            
-            # 發送10分鐘提醒
-            booking_type = "多人陪玩" if is_multiplayer else "群組預約"
-            embed = discord.Embed(
-                title=f"⏰ {booking_type}提醒",
-                description=f"{booking_type}還有 10 分鐘結束，請準備結束遊戲。",
-                color=0xff9900
-            )
-            await text_channel.send(embed=embed)
-            
-            # 等待剩餘的10分鐘
-            remaining_seconds = 600
-        
-        # 5分鐘提醒：只有在總時長超過5分鐘，且剩餘時間超過5分鐘時才發送
-        if total_duration_seconds > 300 and remaining_seconds > 300:  # 總時長和剩餘時間都超過5分鐘
-            # 等待到結束前5分鐘
-            await asyncio.sleep(remaining_seconds - 300)
-            
-            # 發送5分鐘提醒
-            booking_type = "多人陪玩" if is_multiplayer else "群組預約"
-            embed = discord.Embed(
-                title=f"⏰ {booking_type}提醒",
-                description=f"{booking_type}還有 5 分鐘結束，請準備結束遊戲。",
-                color=0xff9900
-            )
-            await text_channel.send(embed=embed)
-            
-            # 等待剩餘的5分鐘
-            remaining_seconds = 300
-        
-        # 1分鐘提醒：只有在總時長超過1分鐘，且剩餘時間超過1分鐘時才發送
-        if total_duration_seconds > 60 and remaining_seconds > 60:  # 總時長和剩餘時間都超過1分鐘
-            # 等待到結束前1分鐘
-            await asyncio.sleep(remaining_seconds - 60)
-            
-            # 發送1分鐘提醒
-            booking_type = "多人陪玩" if is_multiplayer else "群組預約"
-            await text_channel.send(f"⏰ {booking_type}還有 1 分鐘結束！")
-            
-            # 等待剩餘的1分鐘
-            remaining_seconds = 60
-        
-        # 等待到結束時間
-        if remaining_seconds > 0:
-            await asyncio.sleep(remaining_seconds)
+        # 倒數提醒與結束處理交給事件循環計時器（與 /createvc、/schedule_booking 相同），
+        # 不佔用長時間睡眠的協程；每個時間點都由結束時間直接換算，不會因發送訊息的延遲而累積誤差
+        for handle in group_countdown_timers.pop(group_booking_id, []):
+            handle.cancel()
+        loop = asyncio.get_running_loop()
         
-        # 時間結束，顯示評價系統
-        # 🔥 檢查是否已經發送過評價系統（防止重複發送）
-        booking_type = "多人陪玩" if is_multiplayer else "群組預約"
-        if group_booking_id not in rating_sent_bookings:
-            # 🔥 獲取參與者列表
-            def get_participants(booking_id, is_mp):
-                with Session() as s:
-                    if is_mp:
-                        # 多人陪玩：從 Booking 表獲取參與者
-                        result = s.execute(text("""
-                            SELECT DISTINCT cu.discord as customer_discord, pu.discord as partner_discord
-                            FROM "MultiPlayerBooking" mpb
-                            JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
-                            JOIN "Customer" c ON c.id = b."customerId"
-                            JOIN "User" cu ON cu.id = c."userId"
-                            JOIN "Schedule" s ON s.id = b."scheduleId"
-                            JOIN "Partner" p ON p.id = s."partnerId"
-                            JOIN "User" pu ON pu.id = p."userId"
-                            WHERE mpb.id = :booking_id
-                            AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')
-                        """), {"booking_id": booking_id}).fetchall()
-                    else:
-                        # 群組預約：從 GroupBooking 和 GroupBookingParticipant 獲取參與者
-                        result = s.execute(text("""
-                            SELECT DISTINCT cu.discord as customer_discord, pu.discord as partner_discord
-                            FROM "GroupBooking" gb
-                            LEFT JOIN "Booking" b ON b."groupBookingId" = gb.id
-                            LEFT JOIN "Customer" c ON c.id = b."customerId"
-                            LEFT JOIN "User" cu ON cu.id = c."userId"
-                            LEFT JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
-                            LEFT JOIN "Partner" p ON p.id = gbp."partnerId"
-                            LEFT JOIN "User" pu ON pu.id = p."userId"
-                            WHERE gb.id = :booking_id
-                        """), {"booking_id": booking_id}).fetchall()
-                    
-                    members = []
-                    for row in result:
-                        if row.customer_discord:
-                            members.append(row.customer_discord)
-                        if row.partner_discord:
-                            members.append(row.partner_discord)
-                    return list(set(members))
-            
-            participants = await asyncio.to_thread(get_participants, group_booking_id, is_multiplayer)
-            
-            # 🔥 使用 show_group_rating_system 顯示評價系統（支持多人陪玩和群組預約）
-            await show_group_rating_system(text_channel, group_booking_id, participants, is_multiplayer=is_multiplayer)
-            rating_sent_bookings.add(group_booking_id)
-        else:
-            print(f"⚠️ {booking_type} {group_booking_id} 已發送過評價系統，跳過")
+        def on_reminder(minutes_left):
+            create_background_task(send_group_countdown_reminder(text_channel, booking_type, minutes_left))
         
-        # 等待5分鐘讓用戶填寫評價，然後刪除文字頻道
-        await asyncio.sleep(300)  # 5分鐘 = 300秒
+        def on_end():
+            group_countdown_timers.pop(group_booking_id, None)
+            create_background_task(finish_group_countdown(text_channel, group_booking_id, is_multiplayer))
         
-        # 刪除文字頻道
-        try:
-            if text_channel:
-                # 🔥 使用 try-except 來檢查頻道是否已刪除，而不是檢查 deleted 屬性
-                try:
-                    # 嘗試訪問頻道屬性來檢查是否還存在
-                    _ = text_channel.name
-                    await text_channel.delete()
-                    # 清理追蹤
-                    group_rating_text_channels.pop(group_booking_id, None)
-                    group_rating_channel_created_time.pop(group_booking_id, None)
-                except (discord.errors.NotFound, AttributeError):
-                    # 頻道已經被刪除，靜默處理
-                    group_rating_text_channels.pop(group_booking_id, None)
-                    group_rating_channel_created_time.pop(group_booking_id, None)
-                    pass
-        except Exception as e:
-            print(f"❌ 刪除群組預約文字頻道失敗: {e}")
-            # 即使刪除失敗，也清理追蹤
-            group_rating_text_channels.pop(group_booking_id, None)
-            group_rating_channel_created_time.pop(group_booking_id, None)
+        handles = []
+        # 10 / 5 / 1 分鐘提醒：只有在總時長和剩餘時間都超過提醒時長時才發送
+        for minutes_left in (10, 5, 1):
+            lead_seconds = minutes_left * 60
+            if total_duration_seconds > lead_seconds and remaining_seconds > lead_seconds:
+                handles.append(loop.call_later(remaining_seconds - lead_seconds, on_reminder, minutes_left))
+        handles.append(loop.call_later(remaining_seconds, on_end))
+        group_countdown_timers[group_booking_id] = handles
         
     except Exception as e:
         print(f"❌ 群組預約倒數計時錯誤: {e}")
@@ -1787,185 +1984,188 @@ class GroupRatingModal(Modal):
             rating = self.rating
             
             # 保存評價到資料庫
-            with Session() as s:
-                # ✅ 修正用戶查找：使用 normalize_discord_username 標準化 Discord 用戶名（去除尾隨空格、下劃線、點）
-                normalized_discord_name = normalize_discord_username(interaction.user.name)
-                discord_id_str = str(interaction.user.id)
-                
-                # 🔥 只允許顧客提交評價（因為 GroupBookingReview.reviewerId 必須是 Customer.id）
-                # ✅ 改進：使用多種方式匹配 Discord 用戶（顯示名稱、標準化名稱、Discord ID）
-                # 注意：Discord 的 interaction.user.name 可能是顯示名稱（display name），而不是用戶名（username）
-                # Discord 用戶可能有多個名稱：display_name (try1) 和 username (qaz789456)
-                # 所以需要同時檢查多種變體
-                customer_result = s.execute(text("""
-                    SELECT c.id FROM "Customer" c
-                    JOIN "User" u ON u.id = c."userId"
-                    WHERE u.discord = :discord_name 
-                       OR u.discord = :normalized_name 
-                       OR u.discord = :discord_id
-                       OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:discord_name))
-                       OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:normalized_name))
-                """), {
-                    "discord_name": interaction.user.name,
-                    "normalized_name": normalized_discord_name,
-                    "discord_id": discord_id_str
-                }).fetchone()
-                
-                # ✅ 如果第一次查詢失敗，嘗試使用 Discord global_name 或用戶名（如果存在）
-                if not customer_result:
-                    # 嘗試使用 global_name（Discord 顯示名稱）
-                    global_name = getattr(interaction.user, 'global_name', None)
-                    if global_name:
-                        customer_result = s.execute(text("""
-                            SELECT c.id FROM "Customer" c
-                            JOIN "User" u ON u.id = c."userId"
-                            WHERE u.discord = :global_name 
-                               OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:global_name))
-                        """), {
-                            "global_name": global_name
-                        }).fetchone()
-                    
-                    # 如果還是找不到，嘗試模糊匹配（包含關係）
-                    if not customer_result:
-                        # 使用 LIKE 進行模糊匹配（嘗試匹配部分名稱）
-                        customer_result = s.execute(text("""
-                            SELECT c.id FROM "Customer" c
-                            JOIN "User" u ON u.id = c."userId"
-                            WHERE u.discord LIKE :discord_name_pattern
-                               OR u.discord LIKE :normalized_name_pattern
-                               OR :discord_name LIKE '%' || u.discord || '%'
-                               OR :normalized_name LIKE '%' || u.discord || '%'
-                        """), {
-                            "discord_name_pattern": f"%{interaction.user.name}%",
-                            "normalized_name_pattern": f"%{normalized_discord_name}%",
-                            "discord_name": interaction.user.name,
-                            "normalized_name": normalized_discord_name
-                        }).fetchone()
-                
-                # 如果找不到顧客記錄，嘗試使用 Discord ID 查找
-                if not customer_result:
-                    user_result = s.execute(text("""
-                        SELECT id FROM "User"
-                        WHERE discord = :discord_name OR discord = :normalized_name OR discord = :discord_id
+            def save_group_review():
+                with Session() as s:
+                    # ✅ 修正用戶查找：使用 normalize_discord_username 標準化 Discord 用戶名（去除尾隨空格、下劃線、點）
+                    normalized_discord_name = normalize_discord_username(interaction.user.name)
+                    discord_id_str = str(interaction.user.id)
+                
+                    # 🔥 只允許顧客提交評價（因為 GroupBookingReview.reviewerId 必須是 Customer.id）
+                    # ✅ 改進：使用多種方式匹配 Discord 用戶（顯示名稱、標準化名稱、Discord ID）
+                    # 注意：Discord 的 interaction.user.name 可能是顯示名稱（display name），而不是用戶名（username）
+                    # Discord 用戶可能有多個名稱：display_name (try1) 和 username (qaz789456)
+                    # 所以需要同時檢查多種變體
+                    customer_result = s.execute(text("""
+                        SELECT c.id FROM "Customer" c
+                        JOIN "User" u ON u.id = c."userId"
+                        WHERE u.discord = :discord_name 
+                           OR u.discord = :normalized_name 
+                           OR u.discord = :discord_id
+                           OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:discord_name))
+                           OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:normalized_name))
                     """), {
                         "discord_name": interaction.user.name,
                         "normalized_name": normalized_discord_name,
                         "discord_id": discord_id_str
                     }).fetchone()
-                    
-                    if user_result:
-                        user_id = user_result[0]
-                        customer_result = s.execute(text("""
-                            SELECT id FROM "Customer" WHERE "userId" = :user_id
-                        """), {"user_id": user_id}).fetchone()
                 
-                # 如果還是找不到顧客記錄，檢查是否為夥伴
-                if not customer_result:
-                    partner_result = s.execute(text("""
-                        SELECT p.id FROM "Partner" p
-                        JOIN "User" u ON u.id = p."userId"
-                        WHERE u.discord = :discord_name OR u.discord = :discord_id
-                    """), {
-                        "discord_name": interaction.user.name,
-                        "discord_id": str(interaction.user.id)
-                    }).fetchone()
+                    # ✅ 如果第一次查詢失敗，嘗試使用 Discord global_name 或用戶名（如果存在）
+                    if not customer_result:
+                        # 嘗試使用 global_name（Discord 顯示名稱）
+                        global_name = getattr(interaction.user, 'global_name', None)
+                        if global_name:
+                            customer_result = s.execute(text("""
+                                SELECT c.id FROM "Customer" c
+                                JOIN "User" u ON u.id = c."userId"
+                                WHERE u.discord = :global_name 
+                                   OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:global_name))
+                            """), {
+                                "global_name": global_name
+                            }).fetchone()
+                    
+                        # 如果還是找不到，嘗試模糊匹配（包含關係）
+                        if not customer_result:
+                            # 使用 LIKE 進行模糊匹配（嘗試匹配部分名稱）
+                            customer_result = s.execute(text("""
+                                SELECT c.id FROM "Customer" c
+                                JOIN "User" u ON u.id = c."userId"
+                                WHERE u.discord LIKE :discord_name_pattern
+                                   OR u.discord LIKE :normalized_name_pattern
+                                   OR :discord_name LIKE '%' || u.discord || '%'
+                                   OR :normalized_name LIKE '%' || u.discord || '%'
+                            """), {
+                                "discord_name_pattern": f"%{interaction.user.name}%",
+                                "normalized_name_pattern": f"%{normalized_discord_name}%",
+                                "discord_name": interaction.user.name,
+                                "normalized_name": normalized_discord_name
+                            }).fetchone()
+                
+                    # 如果找不到顧客記錄，嘗試使用 Discord ID 查找
+                    if not customer_result:
+                        user_result = s.execute(text("""
+                            SELECT id FROM "User"
+                            WHERE discord = :discord_name OR discord = :normalized_name OR discord = :discord_id
+                        """), {
+                            "discord_name": interaction.user.name,
+                            "normalized_name": normalized_discord_name,
+                            "discord_id": discord_id_str
+                        }).fetchone()
                     
-                    # ✅ 修正用戶查找：使用標準化名稱查找夥伴
-                    if not partner_result:
+                        if user_result:
+                            user_id = user_result[0]
+                            customer_result = s.execute(text("""
+                                SELECT id FROM "Customer" WHERE "userId" = :user_id
+                            """), {"user_id": user_id}).fetchone()
+                
+                    # 如果還是找不到顧客記錄，檢查是否為夥伴
+                    if not customer_result:
                         partner_result = s.execute(text("""
                             SELECT p.id FROM "Partner" p
                             JOIN "User" u ON u.id = p."userId"
-                            WHERE u.discord = :normalized_name
-                        """), {
-                            "normalized_name": normalized_discord_name
-                        }).fetchone()
-                    
-                    if partner_result:
-                        # 夥伴不能提交評價（因為 GroupBookingReview.reviewerId 必須是 Customer.id）
-                        print(f"⚠️ 夥伴嘗試提交評價: Discord名稱={interaction.user.name}, Discord ID={interaction.user.id}")
-                        await interaction.response.send_message("❌ 抱歉，只有顧客可以提交評價。", ephemeral=True)
-                        return
-                    else:
-                        # 🔥 改進錯誤信息：提供更多調試信息
-                        # ✅ 檢查用戶是否存在於 User 表中（使用標準化名稱）
-                        user_check = s.execute(text("""
-                            SELECT id, discord, name FROM "User" 
-                            WHERE discord = :discord_id OR discord = :discord_name OR discord = :normalized_name
+                            WHERE u.discord = :discord_name OR u.discord = :discord_id
                         """), {
-                            "discord_id": discord_id_str,
                             "discord_name": interaction.user.name,
-                            "normalized_name": normalized_discord_name
+                            "discord_id": str(interaction.user.id)
                         }).fetchone()
-                        
-                        if user_check:
-                            print(f"⚠️ 用戶存在但沒有 Customer 或 Partner 記錄: Discord名稱={interaction.user.name}, Discord ID={interaction.user.id}, User ID={user_check[0]}")
+                    
+                        # ✅ 修正用戶查找：使用標準化名稱查找夥伴
+                        if not partner_result:
+                            partner_result = s.execute(text("""
+                                SELECT p.id FROM "Partner" p
+                                JOIN "User" u ON u.id = p."userId"
+                                WHERE u.discord = :normalized_name
+                            """), {
+                                "normalized_name": normalized_discord_name
+                            }).fetchone()
+                    
+                        if partner_result:
+                            # 夥伴不能提交評價（因為 GroupBookingReview.reviewerId 必須是 Customer.id）
+                            print(f"⚠️ 夥伴嘗試提交評價: Discord名稱={interaction.user.name}, Discord ID={interaction.user.id}")
+                            return "❌ 抱歉，只有顧客可以提交評價。", None
                         else:
-                            print(f"❌ 找不到用戶記錄: Discord名稱={interaction.user.name}, Discord ID={interaction.user.id}")
-                        await interaction.response.send_message("❌ 找不到您的用戶記錄，請聯繫管理員", ephemeral=True)
-                        return
-                
-                reviewer_id = customer_result[0]
-                
-                # ✅ 檢查 group_booking_id 是 GroupBooking 還是 MultiPlayerBooking
-                group_booking_check = s.execute(text("""
-                    SELECT id FROM "GroupBooking" WHERE id = :group_booking_id
-                """), {"group_booking_id": self.group_booking_id}).fetchone()
-                
-                multi_player_check = s.execute(text("""
-                    SELECT id FROM "MultiPlayerBooking" WHERE id = :group_booking_id
-                """), {"group_booking_id": self.group_booking_id}).fetchone()
+                            # 🔥 改進錯誤信息：提供更多調試信息
+                            # ✅ 檢查用戶是否存在於 User 表中（使用標準化名稱）
+                            user_check = s.execute(text("""
+                                SELECT id, discord, name FROM "User" 
+                                WHERE discord = :discord_id OR discord = :discord_name OR discord = :normalized_name
+                            """), {
+                                "discord_id": discord_id_str,
+                                "discord_name": interaction.user.name,
+                                "normalized_name": normalized_discord_name
+                            }).fetchone()
+                        
+                            if user_check:
+                                print(f"⚠️ 用戶存在但沒有 Customer 或 Partner 記錄: Discord名稱={interaction.user.name}, Discord ID={interaction.user.id}, User ID={user_check[0]}")
+                            else:
+                                print(f"❌ 找不到用戶記錄: Discord名稱={interaction.user.name}, Discord ID={interaction.user.id}")
+                            return "❌ 找不到您的用戶記錄，請聯繫管理員", None
                 
-                is_multiplayer = bool(multi_player_check and not group_booking_check)
+                    reviewer_id = customer_result[0]
                 
-                if not group_booking_check and not multi_player_check:
-                    print(f"❌ 找不到群組預約或多人陪玩記錄: {self.group_booking_id}")
-                    await interaction.response.send_message("❌ 找不到預約記錄，請聯繫管理員", ephemeral=True)
-                    return
+                    # ✅ 檢查 group_booking_id 是 GroupBooking 還是 MultiPlayerBooking
+                    group_booking_check = s.execute(text("""
+                        SELECT id FROM "GroupBooking" WHERE id = :group_booking_id
+                    """), {"group_booking_id": self.group_booking_id}).fetchone()
+                
+                    multi_player_check = s.execute(text("""
+                        SELECT id FROM "MultiPlayerBooking" WHERE id = :group_booking_id
+                    """), {"group_booking_id": self.group_booking_id}).fetchone()
+                
+                    is_multiplayer = bool(multi_player_check and not group_booking_check)
+                
+                    if not group_booking_check and not multi_player_check:
+                        print(f"❌ 找不到群組預約或多人陪玩記錄: {self.group_booking_id}")
+                        return "❌ 找不到預約記錄，請聯繫管理員", None
+                
+                    # ✅ 如果是多人陪玩，需要創建一個對應的 GroupBooking 記錄（如果不存在，用於評價系統）
+                    if is_multiplayer and not group_booking_check:
+                        # 獲取多人陪玩信息
+                        mpb_info = s.execute(text("""
+                            SELECT "customerId", date, "startTime", "endTime", "totalAmount", status
+                            FROM "MultiPlayerBooking"
+                            WHERE id = :mpb_id
+                        """), {"mpb_id": self.group_booking_id}).fetchone()
+                    
+                        if mpb_info:
+                            # 創建對應的 GroupBooking 記錄（用於評價系統）
+                            # 注意：GroupBooking 使用 initiatorId 和 initiatorType，而不是 customerId
+                            s.execute(text("""
+                                INSERT INTO "GroupBooking" (id, type, "initiatorId", "initiatorType", title, date, "startTime", "endTime", 
+                                                           "maxParticipants", "currentParticipants", status, "createdAt", "updatedAt")
+                                VALUES (:id, 'USER_INITIATED', :initiator_id, 'CUSTOMER', :title, :date, :start_time, :end_time, 
+                                        :max_participants, :current_participants, :status, NOW(), NOW())
+                            """), {
+                                "id": self.group_booking_id,
+                                "initiator_id": mpb_info[0],  # customerId 作為 initiatorId
+                                "title": f"多人陪玩評價 - {self.group_booking_id[:8]}",
+                                "date": mpb_info[1],
+                                "start_time": mpb_info[2],
+                                "end_time": mpb_info[3],
+                                "max_participants": 10,
+                                "current_participants": 0,
+                                "status": "COMPLETED"
+                            })
+                            s.commit()
                 
-                # ✅ 如果是多人陪玩，需要創建一個對應的 GroupBooking 記錄（如果不存在，用於評價系統）
-                if is_multiplayer and not group_booking_check:
-                    # 獲取多人陪玩信息
-                    mpb_info = s.execute(text("""
-                        SELECT "customerId", date, "startTime", "endTime", "totalAmount", status
-                        FROM "MultiPlayerBooking"
-                        WHERE id = :mpb_id
-                    """), {"mpb_id": self.group_booking_id}).fetchone()
-                    
-                    if mpb_info:
-                        # 創建對應的 GroupBooking 記錄（用於評價系統）
-                        # 注意：GroupBooking 使用 initiatorId 和 initiatorType，而不是 customerId
-                        s.execute(text("""
-                            INSERT INTO "GroupBooking" (id, type, "initiatorId", "initiatorType", title, date, "startTime", "endTime", 
-                                                       "maxParticipants", "currentParticipants", status, "createdAt", "updatedAt")
-                            VALUES (:id, 'USER_INITIATED', :initiator_id, 'CUSTOMER', :title, :date, :start_time, :end_time, 
-                                    :max_participants, :current_participants, :status, NOW(), NOW())
-                        """), {
-                            "id": self.group_booking_id,
-                            "initiator_id": mpb_info[0],  # customerId 作為 initiatorId
-                            "title": f"多人陪玩評價 - {self.group_booking_id[:8]}",
-                            "date": mpb_info[1],
-                            "start_time": mpb_info[2],
-                            "end_time": mpb_info[3],
-                            "max_participants": 10,
-                            "current_participants": 0,
-                            "status": "COMPLETED"
-                        })
-                        s.commit()
+                    # 🔥 生成唯一的 ID（使用 cuid 格式）
+                    review_id = f"gbr_{uuid.uuid4().hex[:12]}"
                 
-                # 🔥 生成唯一的 ID（使用 cuid 格式）
-                import uuid
-                review_id = f"gbr_{uuid.uuid4().hex[:12]}"
-                
-                # 創建群組預約評價記錄
-                review = GroupBookingReview(
-                    id=review_id,
-                    groupBookingId=self.group_booking_id,
-                    reviewerId=reviewer_id,
-                    rating=rating,
-                    comment=str(self.comment) if self.comment else None
-                )
-                s.add(review)
-                s.commit()
+                    # 創建群組預約評價記錄
+                    review = GroupBookingReview(
+                        id=review_id,
+                        groupBookingId=self.group_booking_id,
+                        reviewerId=reviewer_id,
+                        rating=rating,
+                        comment=str(self.comment) if self.comment else None
+                    )
+                    s.add(review)
+                    s.commit()
+                    return None, is_multiplayer
+            
+            error_message, is_multiplayer = await asyncio.to_thread(save_group_review)
+            if error_message:
+                await interaction.response.send_message(error_message, ephemeral=True)
+                return
             
             # ✅ 發送到管理員頻道：多人陪玩使用「多人陪玩」類型，群組預約使用「群組預約」類型
             # ✅ 多人陪玩顧客對多人陪玩的評價是對的，但本身本來就不需要分別對每一位夥伴評價，所以管理員頻道不需要回饋顧客對每一位或夥伴的評價
@@ -2003,211 +2203,220 @@ async def send_unified_rating_feedback(booking_id: str, booking_type: str = "一
     """統一的評價回饋函數，適用於所有類型的預約（一般預約、即時預約、純聊天、多人陪玩、群組預約）"""
     try:
         # 🔥 改善錯誤處理：避免 try/except 吃掉 SQL 錯誤，讓錯誤可以正確傳播
-        admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+        admin_channel = get_admin_channel()
         if not admin_channel:
             print(f"❌ 找不到管理員頻道 (ID: {ADMIN_CHANNEL_ID})")
             return
         
         # 根據預約類型獲取資訊
-        with Session() as s:
-            if booking_type == "群組預約":
-                # 群組預約
-                result = s.execute(text("""
-                    SELECT 
-                        gb.title, 
-                        gb."currentParticipants", 
-                        gb."maxParticipants",
-                        gb."startTime",
-                        gb."endTime",
-                        gb."initiatorId",
-                        gb."initiatorType",
-                        gb."discordTextChannelId",
-                        gb."discordVoiceChannelId"
-                    FROM "GroupBooking" gb
-                    WHERE gb.id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
+        def query_booking_info():
+            with Session() as s:
+                if booking_type == "群組預約":
+                    # 群組預約
+                    result = s.execute(text("""
+                        SELECT 
+                            gb.title, 
+                            gb."currentParticipants", 
+                            gb."maxParticipants",
+                            gb."startTime",
+                            gb."endTime",
+                            gb."initiatorId",
+                            gb."initiatorType",
+                            gb."discordTextChannelId",
+                            gb."discordVoiceChannelId"
+                        FROM "GroupBooking" gb
+                        WHERE gb.id = :booking_id
+                    """), {"booking_id": booking_id}).fetchone()
                 
-                if not result:
-                    print(f"❌ 找不到群組預約記錄: {booking_id}")
-                    return
+                    if not result:
+                        print(f"❌ 找不到群組預約記錄: {booking_id}")
+                        return None
                 
-                title = result[0] or "群組預約"
-                current_participants = result[1]
-                max_participants = result[2]
-                start_time = result[3]
-                end_time = result[4]
-                initiator_id = result[5]
-                initiator_type = result[6]
-                text_channel_id = result[7]
-                voice_channel_id = result[8]
-                
-                # 獲取參與者資訊
-                participants_info = []
-                if initiator_type == 'Customer':
-                    customer_result = s.execute(text("""
-                        SELECT u.discord, u.name
-                        FROM "Customer" c
-                        JOIN "User" u ON u.id = c."userId"
-                        WHERE c.id = :initiator_id
-                    """), {"initiator_id": initiator_id}).fetchone()
-                    if customer_result:
-                        customer_discord = customer_result[0]
-                        customer_name = customer_result[1] or customer_discord
-                        participants_info.append(f"顧客: {customer_name} ({customer_discord})")
-                
-                booking_results = s.execute(text("""
-                    SELECT DISTINCT u.discord, u.name
-                    FROM "Booking" b
-                    JOIN "Partner" p ON p.id = b."partnerId"
-                    JOIN "User" u ON u.id = p."userId"
-                    WHERE b."groupBookingId" = :booking_id
-                """), {"booking_id": booking_id}).fetchall()
-                
-                for partner_result in booking_results:
-                    partner_discord = partner_result[0]
-                    partner_name = partner_result[1] or partner_discord
-                    participants_info.append(f"夥伴: {partner_name} ({partner_discord})")
-                
-                participants_text = "\n".join(participants_info) if participants_info else "無"
-                participant_count = f"{current_participants}/{max_participants}"
-                booking_id_display = f"`{booking_id}`"
-                
-            elif booking_type == "多人陪玩":
-                # ✅ 多人陪玩：獲取所有參與者資訊（顧客和所有夥伴），不需要分別對每一位夥伴評價
-                result = s.execute(text("""
-                    SELECT 
-                        mp."startTime",
-                        mp."endTime",
-                        mp."discordTextChannelId",
-                        mp."discordVoiceChannelId",
-                        c.name as customer_name,
-                        cu.discord as customer_discord
-                    FROM "MultiPlayerBooking" mp
-                    JOIN "Customer" c ON c.id = mp."customerId"
-                    JOIN "User" cu ON cu.id = c."userId"
-                    WHERE mp.id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
+                    title = result[0] or "群組預約"
+                    current_participants = result[1]
+                    max_participants = result[2]
+                    start_time = result[3]
+                    end_time = result[4]
+                    initiator_id = result[5]
+                    initiator_type = result[6]
+                    text_channel_id = result[7]
+                    voice_channel_id = result[8]
+                
+                    # 獲取參與者資訊
+                    participants_info = []
+                    if initiator_type == 'Customer':
+                        customer_result = s.execute(text("""
+                            SELECT u.discord, u.name
+                            FROM "Customer" c
+                            JOIN "User" u ON u.id = c."userId"
+                            WHERE c.id = :initiator_id
+                        """), {"initiator_id": initiator_id}).fetchone()
+                        if customer_result:
+                            customer_discord = customer_result[0]
+                            customer_name = customer_result[1] or customer_discord
+                            participants_info.append(f"顧客: {customer_name} ({customer_discord})")
                 
-                if not result:
-                    print(f"❌ 找不到多人陪玩記錄: {booking_id}")
-                    return
+                    booking_results = s.execute(text("""
+                        SELECT DISTINCT u.discord, u.name
+                        FROM "Booking" b
+                        JOIN "Partner" p ON p.id = b."partnerId"
+                        JOIN "User" u ON u.id = p."userId"
+                        WHERE b."groupBookingId" = :booking_id
+                    """), {"booking_id": booking_id}).fetchall()
                 
-                start_time = result[0]
-                end_time = result[1]
-                text_channel_id = result[2]
-                voice_channel_id = result[3]
-                customer_name = result[4] or result[5]
-                customer_discord = result[5]
-                
-                # ✅ 獲取所有夥伴資訊（不需要分別對每一位夥伴評價，只顯示整體資訊）
-                partner_results = s.execute(text("""
-                    SELECT DISTINCT p.name as partner_name, pu.discord as partner_discord
-                    FROM "MultiPlayerBooking" mp
-                    JOIN "Booking" b ON b."multiPlayerBookingId" = mp.id
-                    JOIN "Schedule" s ON s.id = b."scheduleId"
-                    JOIN "Partner" p ON p.id = s."partnerId"
-                    JOIN "User" pu ON pu.id = p."userId"
-                    WHERE mp.id = :booking_id
-                    AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED', 'COMPLETED')
-                """), {"booking_id": booking_id}).fetchall()
-                
-                # ✅ 構建參與者資訊（只顯示顧客和夥伴列表，不需要分別評價）
-                participants_info = [f"顧客: {customer_name} ({customer_discord})"]
-                for partner_result in partner_results:
-                    partner_name = partner_result[0] or partner_result[1]
-                    partner_discord = partner_result[1]
-                    participants_info.append(f"夥伴: {partner_name} ({partner_discord})")
-                
-                participants_text = "\n".join(participants_info)
-                participant_count = f"1/{len(partner_results) + 1}"  # 顧客 + 夥伴數量
-                booking_id_display = f"`{booking_id}`"
-                title = "多人陪玩"
+                    for partner_result in booking_results:
+                        partner_discord = partner_result[0]
+                        partner_name = partner_result[1] or partner_discord
+                        participants_info.append(f"夥伴: {partner_name} ({partner_discord})")
                 
-            else:
-                # 一般預約、即時預約、純聊天
-                # 🔥 修復：Booking 表不存在 isInstantBooking 欄位，改用 paymentInfo JSON 判斷
-                result = s.execute(text("""
-                    SELECT 
-                        s."startTime",
-                        s."endTime",
-                        b."discordTextChannelId",
-                        b."discordVoiceChannelId",
-                        c.name as customer_name,
-                        cu.discord as customer_discord,
-                        p.name as partner_name,
-                        pu.discord as partner_discord,
-                        b."serviceType",
-                        b."paymentInfo"->>'isInstantBooking' as is_instant_booking
-                    FROM "Booking" b
-                    JOIN "Schedule" s ON s.id = b."scheduleId"
-                    JOIN "Customer" c ON c.id = b."customerId"
-                    JOIN "User" cu ON cu.id = c."userId"
-                    JOIN "Partner" p ON p.id = s."partnerId"
-                    JOIN "User" pu ON pu.id = p."userId"
-                    WHERE b.id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
+                    participants_text = "\n".join(participants_info) if participants_info else "無"
+                    participant_count = f"{current_participants}/{max_participants}"
+                    booking_id_display = f"`{booking_id}`"
                 
-                if not result:
-                    print(f"❌ 找不到預約記錄: {booking_id}")
-                    return
+                elif booking_type == "多人陪玩":
+                    # ✅ 多人陪玩：獲取所有參與者資訊（顧客和所有夥伴），不需要分別對每一位夥伴評價
+                    result = s.execute(text("""
+                        SELECT 
+                            mp."startTime",
+                            mp."endTime",
+                            mp."discordTextChannelId",
+                            mp."discordVoiceChannelId",
+                            c.name as customer_name,
+                            cu.discord as customer_discord
+                        FROM "MultiPlayerBooking" mp
+                        JOIN "Customer" c ON c.id = mp."customerId"
+                        JOIN "User" cu ON cu.id = c."userId"
+                        WHERE mp.id = :booking_id
+                    """), {"booking_id": booking_id}).fetchone()
                 
-                start_time = result[0]
-                end_time = result[1]
-                text_channel_id = result[2]
-                voice_channel_id = result[3]
-                customer_name = result[4] or result[5]
-                customer_discord = result[5]
-                partner_name = result[6] or result[7]
-                partner_discord = result[7]
-                service_type = result[8]
-                is_instant_booking_str = result[9]
-                
-                # 🔥 判斷是否為即時預約（從 paymentInfo JSON 中獲取）
-                is_instant = (
-                    is_instant_booking_str == 'true' or 
-                    is_instant_booking_str == True or
-                    (is_instant_booking_str is not None and str(is_instant_booking_str).lower() == 'true')
-                )
+                    if not result:
+                        print(f"❌ 找不到多人陪玩記錄: {booking_id}")
+                        return None
                 
-                participants_text = f"顧客: {customer_name} ({customer_discord})\n夥伴: {partner_name} ({partner_discord})"
-                participant_count = "2/2"
-                booking_id_display = f"`{booking_id}`"
+                    start_time = result[0]
+                    end_time = result[1]
+                    text_channel_id = result[2]
+                    voice_channel_id = result[3]
+                    customer_name = result[4] or result[5]
+                    customer_discord = result[5]
+                
+                    # ✅ 獲取所有夥伴資訊（不需要分別對每一位夥伴評價，只顯示整體資訊）
+                    partner_results = s.execute(text("""
+                        SELECT DISTINCT p.name as partner_name, pu.discord as partner_discord
+                        FROM "MultiPlayerBooking" mp
+                        JOIN "Booking" b ON b."multiPlayerBookingId" = mp.id
+                        JOIN "Schedule" s ON s.id = b."scheduleId"
+                        JOIN "Partner" p ON p.id = s."partnerId"
+                        JOIN "User" pu ON pu.id = p."userId"
+                        WHERE mp.id = :booking_id
+                        AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED', 'COMPLETED')
+                    """), {"booking_id": booking_id}).fetchall()
+                
+                    # ✅ 構建參與者資訊（只顯示顧客和夥伴列表，不需要分別評價）
+                    participants_info = [f"顧客: {customer_name} ({customer_discord})"]
+                    for partner_result in partner_results:
+                        partner_name = partner_result[0] or partner_result[1]
+                        partner_discord = partner_result[1]
+                        participants_info.append(f"夥伴: {partner_name} ({partner_discord})")
+                
+                    participants_text = "\n".join(participants_info)
+                    participant_count = f"1/{len(partner_results) + 1}"  # 顧客 + 夥伴數量
+                    booking_id_display = f"`{booking_id}`"
+                    title = "多人陪玩"
                 
-                # 確定預約類型標題
-                if service_type == "CHAT_ONLY":
-                    title = "純聊天"
-                elif is_instant:
-                    title = "即時預約"
                 else:
-                    title = "一般預約"
-            
-            # 轉換時間為台灣時間
-            if start_time and end_time:
-                if start_time.tzinfo is None:
-                    start_time = start_time.replace(tzinfo=timezone.utc)
-                if end_time.tzinfo is None:
-                    end_time = end_time.replace(tzinfo=timezone.utc)
+                    # 一般預約、即時預約、純聊天
+                    # 🔥 修復：Booking 表不存在 isInstantBooking 欄位，改用 paymentInfo JSON 判斷
+                    result = s.execute(text("""
+                        SELECT 
+                            s."startTime",
+                            s."endTime",
+                            b."discordTextChannelId",
+                            b."discordVoiceChannelId",
+                            c.name as customer_name,
+                            cu.discord as customer_discord,
+                            p.name as partner_name,
+                            pu.discord as partner_discord,
+                            b."serviceType",
+                            b."paymentInfo"->>'isInstantBooking' as is_instant_booking
+                        FROM "Booking" b
+                        JOIN "Schedule" s ON s.id = b."scheduleId"
+                        JOIN "Customer" c ON c.id = b."customerId"
+                        JOIN "User" cu ON cu.id = c."userId"
+                        JOIN "Partner" p ON p.id = s."partnerId"
+                        JOIN "User" pu ON pu.id = p."userId"
+                        WHERE b.id = :booking_id
+                    """), {"booking_id": booking_id}).fetchone()
                 
-                tw_start_time = start_time.astimezone(TW_TZ)
-                tw_end_time = end_time.astimezone(TW_TZ)
-                duration_minutes = int((end_time - start_time).total_seconds() / 60)
-            else:
-                tw_start_time = None
-                tw_end_time = None
-                duration_minutes = 0
+                    if not result:
+                        print(f"❌ 找不到預約記錄: {booking_id}")
+                        return None
+                
+                    start_time = result[0]
+                    end_time = result[1]
+                    text_channel_id = result[2]
+                    voice_channel_id = result[3]
+                    customer_name = result[4] or result[5]
+                    customer_discord = result[5]
+                    partner_name = result[6] or result[7]
+                    partner_discord = result[7]
+                    service_type = result[8]
+                    is_instant_booking_str = result[9]
+                
+                    # 🔥 判斷是否為即時預約（從 paymentInfo JSON 中獲取）
+                    is_instant = (
+                        is_instant_booking_str == 'true' or 
+                        is_instant_booking_str == True or
+                        (is_instant_booking_str is not None and str(is_instant_booking_str).lower() == 'true')
+                    )
+                
+                    participants_text = f"顧客: {customer_name} ({customer_discord})\n夥伴: {partner_name} ({partner_discord})"
+                    participant_count = "2/2"
+                    booking_id_display = f"`{booking_id}`"
+                
+                    # 確定預約類型標題
+                    if service_type == "CHAT_ONLY":
+                        title = "純聊天"
+                    elif is_instant:
+                        title = "即時預約"
+                    else:
+                        title = "一般預約"
             
-            # 獲取文字頻道資訊
-            text_channel_mention = "#不明"
-            if text_channel_id:
-                try:
-                    text_channel = bot.get_channel(int(text_channel_id))
-                    if text_channel:
-                        text_channel_mention = text_channel.mention
-                except:
-                    pass
+                return title, participants_text, participant_count, booking_id_display, start_time, end_time, text_channel_id, voice_channel_id
+        
+        booking_info = await asyncio.to_thread(query_booking_info)
+        if booking_info is None:
+            return
+        title, participants_text, participant_count, booking_id_display, start_time, end_time, text_channel_id, voice_channel_id = booking_info
+        
+        # 轉換時間為台灣時間
+        if start_time and end_time:
+            if start_time.tzinfo is None:
+                start_time = start_time.replace(tzinfo=timezone.utc)
+            if end_time.tzinfo is None:
+                end_time = end_time.replace(tzinfo=timezone.utc)
             
-            # 獲取評價資訊（如果沒有提供）
-            if rating is None or reviewer_name is None:
+            tw_start_time = start_time.astimezone(TW_TZ)
+            tw_end_time = end_time.astimezone(TW_TZ)
+            duration_minutes = int((end_time - start_time).total_seconds() / 60)
+        else:
+            tw_start_time = None
+            tw_end_time = None
+            duration_minutes = 0
+        
+        # 獲取文字頻道資訊
+        text_channel_mention = "#不明"
+        if text_channel_id:
+            try:
+                text_channel = bot.get_channel(int(text_channel_id))
+                if text_channel:
+                    text_channel_mention = text_channel.mention
+            except:
+                pass
+        
+        # 獲取評價資訊（如果沒有提供）
+        def query_latest_review():
+            with Session() as s:
                 review_result = s.execute(text("""
                     SELECT r.rating, r.comment, r."reviewerId"
                     FROM "Review" r
@@ -2215,24 +2424,26 @@ async def send_unified_rating_feedback(booking_id: str, booking_type: str = "一
                     ORDER BY r."createdAt" DESC
                     LIMIT 1
                 """), {"booking_id": booking_id}).fetchone()
-                
-                if review_result:
-                    if rating is None:
-                        rating = review_result[0]
-                    if comment is None:
-                        comment = review_result[1]
-                    if reviewer_name is None:
-                        reviewer_id = review_result[2]
-                        # 獲取評價者名稱
-                        user_result = s.execute(text("""
-                            SELECT u.name, u.discord
-                            FROM "User" u
-                            WHERE u.id = :user_id
-                        """), {"user_id": reviewer_id}).fetchone()
-                        if user_result:
-                            reviewer_name = user_result[0] or user_result[1] or "未知"
-                        else:
-                            reviewer_name = "未知"
+                if not review_result:
+                    return None
+                # 獲取評價者名稱
+                user_result = s.execute(text("""
+                    SELECT u.name, u.discord
+                    FROM "User" u
+                    WHERE u.id = :user_id
+                """), {"user_id": review_result[2]}).fetchone()
+                review_author = (user_result[0] or user_result[1] or "未知") if user_result else "未知"
+                return review_result[0], review_result[1], review_author
+        
+        if rating is None or reviewer_name is None:
+            review = await asyncio.to_thread(query_latest_review)
+            if review:
+                if rating is None:
+                    rating = review[0]
+                if comment is None:
+                    comment = review[1]
+                if reviewer_name is None:
+                    reviewer_name = review[2]
         
         # 創建評價嵌入訊息（統一格式）
         embed = discord.Embed(
@@ -2318,7 +2529,7 @@ async def send_unified_rating_feedback(booking_id: str, booking_type: str = "一
         
         embed.set_footer(text=f"PeiPlay {title}評價系統")
         
-        await admin_channel.send(embed=embed)
+        notify_admin(embed=embed)
         
     except Exception as e:
         # 🔥 改善錯誤處理：區分 SQL 錯誤和其他錯誤，SQL 錯誤應該重新拋出
@@ -2342,7 +2553,7 @@ async def send_group_rating_to_admin(group_booking_id, rating, comment, reviewer
 async def create_booking_voice_channel(booking_id, customer_discord, partner_discord, start_time, end_time, is_instant_booking=None, discord_delay_minutes=None):
     """為預約創建語音頻道"""
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return None
@@ -2375,7 +2586,7 @@ async def create_booking_voice_channel(booking_id, customer_discord, partner_dis
         end_time_str = tw_end_time.strftime("%H:%M")
         
         # 創建統一的頻道名稱（與文字頻道相同）
-        cute_item = random.choice(CUTE_ITEMS)
+        cute_item, _ = pick_cute_channel()
         if is_instant_booking == 'true':
             channel_name = f"⚡即時{date_str} {start_time_str}-{end_time_str} {cute_item}"
         else:
@@ -2387,19 +2598,10 @@ async def create_booking_voice_channel(booking_id, customer_discord, partner_dis
             partner_member: discord.PermissionOverwrite(view_channel=True, connect=True, speak=True),
         }
         
-        category = discord.utils.get(guild.categories, name="Voice Channels")
-        if not category:
-            category = discord.utils.get(guild.categories, name="語音頻道")
+        category = find_category(guild, VOICE_CATEGORY_NAMES)
         if not category:
-            category = discord.utils.get(guild.categories, name="語音")
-        if not category:
-            # 嘗試使用第一個可用的分類
-            if guild.categories:
-                category = guild.categories[0]
-                print(f"⚠️ 自動檢查使用現有分類: {category.name}")
-            else:
-                print("❌ 找不到任何分類，跳過此預約")
-                return None
+            print("❌ 找不到任何分類，跳過此預約")
+            return None
         
         vc = await guild.create_voice_channel(
             name=channel_name, 
@@ -2422,31 +2624,31 @@ async def create_booking_voice_channel(booking_id, customer_discord, partner_dis
         # 添加調試信息
         # 自動創建配對記錄，減少日誌輸出
         
-        with Session() as s:
-            try:
-                # 生成唯一的 ID（類似 Prisma 的 cuid）
-                import uuid
-                record_id = f"pair_{uuid.uuid4().hex[:12]}"
-                
-                record = PairingRecord(
-                    id=record_id,
+        def create_pairing_record():
+            # 生成唯一的 ID（類似 Prisma 的 cuid）
+            new_record_id = f"pair_{uuid.uuid4().hex[:12]}"
+            with Session() as s:
+                s.add(PairingRecord(
+                    id=new_record_id,
                     user1Id=user1_id,
                     user2Id=user2_id,
                     duration=duration_minutes * 60,
                     animalName="預約頻道",
                     bookingId=booking_id
-                )
-                s.add(record)
+                ))
                 s.commit()
-                created_at = record.createdAt
-            except Exception as e:
-                print(f"❌ 創建配對記錄失敗: {e}")
-                # 如果表不存在，使用預設的 record_id
-                if "relation \"PairingRecord\" does not exist" in str(e):
-                    record_id = "temp_" + str(int(time.time()))
-                    print(f"⚠️ 使用臨時 record_id: {record_id}")
-                else:
-                    record_id = None
+            return new_record_id
+        
+        try:
+            record_id = await asyncio.to_thread(create_pairing_record)
+        except Exception as e:
+            print(f"❌ 創建配對記錄失敗: {e}")
+            # 如果表不存在，使用預設的 record_id
+            if "relation \"PairingRecord\" does not exist" in str(e):
+                record_id = "temp_" + str(int(time.time()))
+                print(f"⚠️ 使用臨時 record_id: {record_id}")
+            else:
+                record_id = None
         
         # 初始化頻道狀態
         active_voice_channels[vc.id] = {
@@ -2462,7 +2664,7 @@ async def create_booking_voice_channel(booking_id, customer_discord, partner_dis
             print(f"⏰ Discord 頻道將在 {discord_delay_minutes} 分鐘後自動開啟")
             
             # 通知創建頻道頻道
-            channel_creation_channel = bot.get_channel(CHANNEL_CREATION_CHANNEL_ID)
+            channel_creation_channel = get_channel_creation_channel()
             if channel_creation_channel:
                 instant_embed = discord.Embed(
                     title="⚡ 即時預約語音頻道已創建",
@@ -2517,41 +2719,43 @@ async def create_booking_voice_channel(booking_id, customer_discord, partner_dis
             async def delayed_open_voice():
                 await asyncio.sleep(int(discord_delay_minutes or 3) * 60)  # 等待指定分鐘數
                 try:
-                    # 檢查預約狀態是否仍然是 PARTNER_ACCEPTED
-                    with Session() as check_s:
-                        current_booking = check_s.execute(
-                            text("SELECT status FROM \"Booking\" WHERE id = :booking_id"),
-                            {"booking_id": booking_id}
-                        ).fetchone()
+                    # 檢查預約狀態是否仍然是 PARTNER_ACCEPTED（先關閉 session 再呼叫 Discord API）
+                    def query_booking_status():
+                        with Session() as check_s:
+                            return check_s.execute(
+                                text("SELECT status FROM \"Booking\" WHERE id = :booking_id"),
+                                {"booking_id": booking_id}
+                            ).fetchone()
+                    
+                    current_booking = await asyncio.to_thread(query_booking_status)
+                    if current_booking and current_booking.status == 'PARTNER_ACCEPTED':
+                        # 開啟語音頻道
+                        await vc.set_permissions(guild.default_role, view_channel=True)
+                        # 文字頻道由 check_new_bookings 創建，這裡不需要處理
                         
-                        if current_booking and current_booking.status == 'PARTNER_ACCEPTED':
-                            # 開啟語音頻道
-                            await vc.set_permissions(guild.default_role, view_channel=True)
-                            # 文字頻道由 check_new_bookings 創建，這裡不需要處理
-                            
-                            # 發送開啟通知
-                            embed = discord.Embed(
-                                title="🎮 即時預約頻道已開啟！",
-                                description=f"歡迎 {customer_member.mention} 和 {partner_member.mention} 來到 {channel_name}！",
-                                color=0x00ff00,
-                                timestamp=datetime.now(timezone.utc)
-                            )
-                            embed.add_field(name="⏰ 預約時長", value=f"{duration_minutes} 分鐘", inline=True)
-                            embed.add_field(name="💰 費用", value=f"${duration_minutes * 2 * 150}", inline=True)  # 假設每半小時150元
-                            
-                            # 文字頻道由 check_new_bookings 創建，這裡不需要發送通知
-                            # 即時預約語音頻道已開啟，減少日誌輸出
-                        else:
-                            print(f"⚠️ 預約 {booking_id} 狀態已改變，取消延遲開啟")
+                        # 發送開啟通知
+                        embed = discord.Embed(
+                            title="🎮 即時預約頻道已開啟！",
+                            description=f"歡迎 {customer_member.mention} 和 {partner_member.mention} 來到 {channel_name}！",
+                            color=0x00ff00,
+                            timestamp=datetime.now(timezone.utc)
+                        )
+                        embed.add_field(name="⏰ 預約時長", value=f"{duration_minutes} 分鐘", inline=True)
+                        embed.add_field(name="💰 費用", value=f"${duration_minutes * 2 * 150}", inline=True)  # 假設每半小時150元
+                        
+                        # 文字頻道由 check_new_bookings 創建，這裡不需要發送通知
+                        # 即時預約語音頻道已開啟，減少日誌輸出
+                    else:
+                        print(f"⚠️ 預約 {booking_id} 狀態已改變，取消延遲開啟")
                 except Exception as e:
                     print(f"❌ 延遲開啟語音頻道失敗: {e}")
             
             # 啟動延遲開啟任務
-            bot.loop.create_task(delayed_open_voice())
+            create_background_task(delayed_open_voice())
             
         else:
             # 通知創建頻道頻道
-            channel_creation_channel = bot.get_channel(CHANNEL_CREATION_CHANNEL_ID)
+            channel_creation_channel = get_channel_creation_channel()
             if channel_creation_channel:
                 await channel_creation_channel.send(
                     f"🎉 自動創建語音頻道：\n"
@@ -2585,37 +2789,33 @@ async def create_booking_voice_channel(booking_id, customer_discord, partner_dis
 async def delete_booking_channels(booking_id: str):
     """刪除預約相關的 Discord 頻道"""
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return False
         
         # 從資料庫獲取頻道 ID
-        with Session() as s:
-            # 先檢查欄位是否存在
-            check_columns = s.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'Booking' 
-                AND column_name IN ('discordTextChannelId', 'discordVoiceChannelId')
-            """)).fetchall()
-            
-            if len(check_columns) < 2:
-                print(f"⚠️ Discord 欄位尚未創建，無法獲取頻道資訊")
-                return False
-            
-            result = s.execute(
-                text("SELECT \"discordTextChannelId\", \"discordVoiceChannelId\" FROM \"Booking\" WHERE id = :booking_id"),
-                {"booking_id": booking_id}
-            )
-            row = result.fetchone()
-            
-            if not row:
-                print(f"❌ 找不到預約 {booking_id} 的頻道資訊")
-                return False
-            
-            text_channel_id = row[0]
-            voice_channel_id = row[1]
+        def query_channel_ids():
+            with Session() as s:
+                # 先檢查欄位是否存在（欄位清單已快取）
+                if not booking_has_columns(s, 'discordTextChannelId', 'discordVoiceChannelId'):
+                    print(f"⚠️ Discord 欄位尚未創建，無法獲取頻道資訊")
+                    return None
+                
+                row = s.execute(
+                    text("SELECT \"discordTextChannelId\", \"discordVoiceChannelId\" FROM \"Booking\" WHERE id = :booking_id"),
+                    {"booking_id": booking_id}
+                ).fetchone()
+                
+                if not row:
+                    print(f"❌ 找不到預約 {booking_id} 的頻道資訊")
+                    return None
+                return row[0], row[1]
+        
+        channel_ids = await asyncio.to_thread(query_channel_ids)
+        if channel_ids is None:
+            return False
+        text_channel_id, voice_channel_id = channel_ids
         
         deleted_channels = []
         
@@ -2645,34 +2845,25 @@ async def delete_booking_channels(booking_id: str):
             except Exception as voice_error:
                 print(f"❌ 刪除語音頻道失敗: {voice_error}")
         
-        # 清除資料庫中的頻道 ID
-        try:
+        # 清除資料庫中的頻道 ID（前面已確認欄位存在）
+        def clear_channel_ids():
             with Session() as s:
-                # 先檢查欄位是否存在
-                check_columns = s.execute(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'Booking' 
-                    AND column_name IN ('discordTextChannelId', 'discordVoiceChannelId')
-                """)).fetchall()
-                
-                if len(check_columns) >= 2:
-                    s.execute(
-                        text("UPDATE \"Booking\" SET \"discordTextChannelId\" = NULL, \"discordVoiceChannelId\" = NULL WHERE id = :booking_id"),
-                        {"booking_id": booking_id}
-                    )
-                    s.commit()
-                    # 已清除預約的頻道ID，減少日誌輸出
-                else:
-                    print(f"⚠️ Discord 欄位尚未創建，跳過清除頻道 ID")
+                s.execute(
+                    text("UPDATE \"Booking\" SET \"discordTextChannelId\" = NULL, \"discordVoiceChannelId\" = NULL WHERE id = :booking_id"),
+                    {"booking_id": booking_id}
+                )
+                s.commit()
+        
+        try:
+            await asyncio.to_thread(clear_channel_ids)
         except Exception as db_error:
             print(f"❌ 清除頻道 ID 失敗: {db_error}")
         
         # 通知管理員
         try:
-            admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+            admin_channel = get_admin_channel()
             if admin_channel and deleted_channels:
-                await admin_channel.send(
+                notify_admin(
                     f"🗑️ **預約頻道已刪除**\n"
                     f"預約ID: `{booking_id}`\n"
                     f"已刪除頻道: {', '.join(deleted_channels)}"
@@ -2738,11 +2929,6 @@ async def check_new_bookings():
         
         for row in rows:
                 try:
-                    # 檢查是否已經創建過文字頻道
-                    if row.id in processed_text_channels:
-                        print(f"⚠️ 預約 {row.id} 已在記憶體中標記為已處理，跳過")
-                        continue  # 靜默跳過，不輸出日誌
-                    
                     # 檢查資料庫中是否已經有文字頻道ID（在線程中執行）
                     # ADDED FOR TRANSACTION SAFETY: 每輪創建新 session，確保異常時 rollback
                     def check_existing_channel(booking_id):
@@ -2762,14 +2948,13 @@ async def check_new_bookings():
                     existing_channel_id = await asyncio.to_thread(check_existing_channel, row.id)
                     if existing_channel_id:
                         # 🔥 如果已有頻道 ID，驗證頻道是否真的存在且可用
-                        guild = bot.get_guild(GUILD_ID)
+                        guild = get_main_guild()
                         if guild:
                             try:
                                 text_channel = guild.get_channel(int(existing_channel_id))
                                 if text_channel:
-                                    # 頻道存在且可用，標記為已處理
+                                    # 頻道存在且可用
                                     print(f"✅ 預約 {row.id} 在資料庫中已有文字頻道ID且頻道存在，跳過")
-                                    processed_text_channels.add(row.id)
                                     continue
                                 else:
                                     # 頻道 ID 存在但頻道不存在，視為錯誤
@@ -2812,22 +2997,24 @@ async def check_new_bookings():
                         # 建立成功後，更新資料庫並標記 processed
                         try:
                             # ADDED FOR TRANSACTION SAFETY: 每輪創建新 session，確保異常時 rollback
-                            with Session() as update_s:
-                                try:
-                                    update_s.execute(
-                                        text("""
-                                            UPDATE "Booking"
-                                            SET "discordTextChannelId" = :channel_id
-                                            WHERE id = :booking_id
-                                        """),
-                                        {"channel_id": str(text_channel.id), "booking_id": row.id}
-                                    )
-                                    update_s.commit()
-                                except Exception as e:
-                                    # ADDED FOR TRANSACTION SAFETY: 確保異常時 rollback
-                                    update_s.rollback()
-                                    raise
-                            processed_text_channels.add(row.id)
+                            def save_text_channel_id():
+                                with Session() as update_s:
+                                    try:
+                                        update_s.execute(
+                                            text("""
+                                                UPDATE "Booking"
+                                                SET "discordTextChannelId" = :channel_id
+                                                WHERE id = :booking_id
+                                            """),
+                                            {"channel_id": str(text_channel.id), "booking_id": row.id}
+                                        )
+                                        update_s.commit()
+                                    except Exception as e:
+                                        # ADDED FOR TRANSACTION SAFETY: 確保異常時 rollback
+                                        update_s.rollback()
+                                        raise
+                            
+                            await asyncio.to_thread(save_text_channel_id)
                             print(f"✅ 預約 {row.id} 已建立文字頻道並寫回資料庫")
                             continue
                         except Exception as db_err:
@@ -2957,19 +3144,13 @@ async def check_instant_bookings_for_text_channel():
                     print(f"❌ 資料庫連接失敗，已重試 {max_retries} 次: {db_error}")
                     return
         
-        # 🔥 過濾掉已經處理過的預約（避免重複輸出）
-        filtered_rows = [row for row in rows if row.id not in processed_text_channels]
-        
+        # 已寫回 discordEarlyTextChannelId 的預約不會再出現在查詢結果中
         # 處理找到的即時預約
-        for row in filtered_rows:
+        for row in rows:
             try:
                 booking_id = row.id
                 
-                # 檢查是否已經處理過
-                if booking_id in processed_text_channels:
-                    continue
-                
-                guild = bot.get_guild(GUILD_ID)
+                guild = get_main_guild()
                 if not guild:
                     print("❌ 找不到 Discord 伺服器")
                     continue
@@ -2980,9 +3161,8 @@ async def check_instant_bookings_for_text_channel():
                 customer_discord = row.customer_discord
                 partner_discord = row.partner_discord
                 
-                # 🔥 調試信息：只在第一次處理時輸出，避免重複輸出
-                if booking_id not in processed_text_channels:
-                    print(f"🔍 即時預約 {booking_id} Discord 信息: 顧客名稱={customer_name}, 顧客Discord={customer_discord}, 夥伴名稱={partner_name}, 夥伴Discord={partner_discord}")
+                # 🔥 調試信息
+                logger.debug("🔍 即時預約 %s Discord 信息: 顧客名稱=%s, 顧客Discord=%s, 夥伴名稱=%s, 夥伴Discord=%s", booking_id, customer_name, customer_discord, partner_name, partner_discord)
                 
                 customer_member = None
                 partner_member = None
@@ -2992,13 +3172,13 @@ async def check_instant_bookings_for_text_channel():
                 if customer_discord:
                     try:
                         # 🔥 不管 Discord 名稱有什麼特殊符號，都嘗試查找成員
-                        # 先嘗試作為 Discord ID 查找（如果是純數字且長度足夠）
-                        discord_id_clean = str(customer_discord).replace('.', '').replace('-', '') if isinstance(customer_discord, str) else str(customer_discord)
-                        if discord_id_clean.isdigit() and len(discord_id_clean) >= 17:
+                        # 先嘗試作為 Discord ID 查找（符合 SNOWFLAKE_RE 時）
+                        discord_id_clean = str(customer_discord)
+                        if SNOWFLAKE_RE.fullmatch(discord_id_clean):
                             # 這是 Discord ID，直接查找
                             customer_member = guild.get_member(int(discord_id_clean))
                             if customer_member:
-                                print(f"✅ 通過 Discord ID 找到顧客: {customer_member.name}")
+                                logger.debug("✅ 通過 Discord ID 找到顧客: %s", customer_member.name)
                         else:
                             # 這是用戶名（可能包含特殊符號），使用 find_member_by_discord_name 查找
                             customer_member = find_member_by_discord_name(guild, str(customer_discord))
@@ -3008,7 +3188,7 @@ async def check_instant_bookings_for_text_channel():
                 
                 # 如果 Discord 字段找不到，再嘗試用用戶名查找
                 if not customer_member and customer_name:
-                    print(f"🔍 Discord 字段找不到，嘗試用用戶名查找顧客: '{customer_name}'")
+                    logger.debug("🔍 Discord 字段找不到，嘗試用用戶名查找顧客: '%s'", customer_name)
                     customer_member = find_member_by_discord_name(guild, customer_name)
                 
                 # 🔥 優先使用 Discord 字段查找夥伴（因為這是用戶在 Discord 中的實際用戶名）
@@ -3016,9 +3196,9 @@ async def check_instant_bookings_for_text_channel():
                 if partner_discord:
                     try:
                         # 🔥 不管 Discord 名稱有什麼特殊符號，都嘗試查找成員
-                        # 先嘗試作為 Discord ID 查找（如果是純數字且長度足夠）
-                        discord_id_clean = str(partner_discord).replace('.', '').replace('-', '') if isinstance(partner_discord, str) else str(partner_discord)
-                        if discord_id_clean.isdigit() and len(discord_id_clean) >= 17:
+                        # 先嘗試作為 Discord ID 查找（符合 SNOWFLAKE_RE 時）
+                        discord_id_clean = str(partner_discord)
+                        if SNOWFLAKE_RE.fullmatch(discord_id_clean):
                             # 這是 Discord ID，直接查找
                             partner_member = guild.get_member(int(discord_id_clean))
                         else:
@@ -3030,7 +3210,7 @@ async def check_instant_bookings_for_text_channel():
                 
                 # 如果 Discord 字段找不到，再嘗試用用戶名查找
                 if not partner_member and partner_name:
-                    print(f"🔍 Discord 字段找不到，嘗試用用戶名查找夥伴: {partner_name}")
+                    logger.debug("🔍 Discord 字段找不到，嘗試用用戶名查找夥伴: %s", partner_name)
                     partner_member = find_member_by_discord_name(guild, partner_name)
                 
                 # 如果還是找不到，輸出警告並嘗試最後的查找方式
@@ -3053,7 +3233,7 @@ async def check_instant_bookings_for_text_channel():
                             if (member_name_clean == customer_name_clean or member_display_clean == customer_name_clean or
                                 customer_name_clean in member_name_clean or customer_name_clean in member_display_clean):
                                 customer_member = member
-                                print(f"✅ 通過清理特殊字符匹配找到顧客: {member.name} (查詢: {customer_name})")
+                                logger.debug("✅ 通過清理特殊字符匹配找到顧客: %s (查詢: %s)", member.name, customer_name)
                                 break
                 
                 if not partner_member:
@@ -3075,7 +3255,7 @@ async def check_instant_bookings_for_text_channel():
                             if (member_name_clean == partner_name_clean or member_display_clean == partner_name_clean or
                                 partner_name_clean in member_name_clean or partner_name_clean in member_display_clean):
                                 partner_member = member
-                                print(f"✅ 通過清理特殊字符匹配找到夥伴: {member.name} (查詢: {partner_name})")
+                                logger.debug("✅ 通過清理特殊字符匹配找到夥伴: %s (查詢: %s)", member.name, partner_name)
                                 break
                 
                 # 🔥 即使找不到 Discord 成員，也繼續創建頻道（用戶可能尚未加入伺服器）
@@ -3111,10 +3291,7 @@ async def check_instant_bookings_for_text_channel():
                 )
                 
                 # 🔥 使用 booking_id 的 hash 來確定性地選擇動物，確保文字和語音頻道使用相同的動物（與群組預約邏輯一致）
-                import hashlib
-                hash_obj = hashlib.md5(str(booking_id).encode())
-                hash_hex = hash_obj.hexdigest()
-                animal = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+                animal = cute_item_for(str(booking_id))
                 
                 # 🔥 創建頻道名稱（與群組預約格式一致）
                 if is_chat_only:
@@ -3131,14 +3308,15 @@ async def check_instant_bookings_for_text_channel():
                     # 3. 至少完成一個實際 Discord 動作（如更新資料庫）
                     if customer_member and partner_member:
                         print(f"✅ 已存在相同名稱的文字頻道: {channel_name}，更新資料庫並標記為已處理")
-                        with Session() as update_s:
-                            update_s.execute(
-                                text("UPDATE \"Booking\" SET \"discordEarlyTextChannelId\" = :channel_id WHERE id = :booking_id"),
-                                {"channel_id": str(existing_channels[0].id), "booking_id": booking_id}
-                            )
-                            update_s.commit()
-                        # 只有在成功更新資料庫且成員都存在時，才標記為 processed
-                        processed_text_channels.add(booking_id)
+                        def save_early_text_channel_id():
+                            with Session() as update_s:
+                                update_s.execute(
+                                    text("UPDATE \"Booking\" SET \"discordEarlyTextChannelId\" = :channel_id WHERE id = :booking_id"),
+                                    {"channel_id": str(existing_channels[0].id), "booking_id": booking_id}
+                                )
+                                update_s.commit()
+                        
+                        await asyncio.to_thread(save_early_text_channel_id)
                         continue
                     else:
                         print(f"⚠️ 已存在相同名稱的文字頻道: {channel_name}，但缺少 Discord 成員，不標記為 processed")
@@ -3146,17 +3324,10 @@ async def check_instant_bookings_for_text_channel():
                         continue
                 
                 # 🔥 找到分類（與群組預約邏輯一致）
-                category = discord.utils.get(guild.categories, name="Voice Channels")
-                if not category:
-                    category = discord.utils.get(guild.categories, name="語音頻道")
+                category = find_category(guild, VOICE_CATEGORY_NAMES)
                 if not category:
-                    category = discord.utils.get(guild.categories, name="語音")
-                if not category:
-                    if guild.categories:
-                        category = guild.categories[0]
-                    else:
-                        print("❌ 找不到任何分類")
-                        continue
+                    print("❌ 找不到任何分類")
+                    continue
                 
                 # 🔥 設定權限（與群組預約邏輯一致）
                 overwrites = {
@@ -3185,16 +3356,19 @@ async def check_instant_bookings_for_text_channel():
                 
                 # 建立成功後，更新資料庫的提前溝通頻道 ID
                 try:
-                    with Session() as s:
-                        s.execute(
-                            text("""
-                                UPDATE "Booking"
-                                SET "discordEarlyTextChannelId" = :channel_id
-                                WHERE id = :booking_id
-                            """),
-                            {"channel_id": str(text_channel.id), "booking_id": booking_id}
-                        )
-                        s.commit()
+                    def save_early_text_channel_id():
+                        with Session() as s:
+                            s.execute(
+                                text("""
+                                    UPDATE "Booking"
+                                    SET "discordEarlyTextChannelId" = :channel_id
+                                    WHERE id = :booking_id
+                                """),
+                                {"channel_id": str(text_channel.id), "booking_id": booking_id}
+                            )
+                            s.commit()
+                    
+                    await asyncio.to_thread(save_early_text_channel_id)
                 except Exception as db_err:
                     print(f"❌ 即時預約 {booking_id} 保存文字頻道 ID 失敗: {db_err}")
                     continue
@@ -3274,60 +3448,25 @@ async def check_instant_bookings_for_text_channel():
                     except:
                         pass
                 
-                # 🔥 發送安全規範（與群組預約格式一致）
-                safety_embed = discord.Embed(
-                    title="🎙️ 即時預約聊天頻道使用規範與警告" if not is_chat_only else "🎙️ 純聊天預約聊天頻道使用規範與警告",
-                    description="為了您的安全，請務必遵守以下規範：",
-                    color=0xff6b6b,
-                    timestamp=datetime.now(timezone.utc)
-                )
-                
-                if is_chat_only:
-                    safety_embed.add_field(
-                        name="📌 頻道性質",
-                        value="此聊天頻道為【純聊天預約用途】。\n僅限輕鬆互動、日常話題、遊戲閒聊使用。\n禁止任何涉及交易、暗示、或其他非聊天用途的行為。",
-                        inline=False
-                    )
-                else:
-                    safety_embed.add_field(
-                        name="📌 頻道性質",
-                        value="此聊天頻道為【即時預約用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。",
-                        inline=False
-                    )
-                
-                safety_embed.add_field(
-                    name="⚠️ 使用規範（請務必遵守）",
-                    value="• 禁止挑釁、辱罵、騷擾他人，保持禮貌尊重\n"
-                          "• 禁止使用色情、暴力、血腥、歧視等不當言語或內容\n"
-                          "• 不得進行金錢交易、索取或提供個資（例如 LINE、IG、電話）\n"
-                          "• 不得錄音、偷拍或截圖他人對話，除非經雙方同意\n"
-                          "• 禁止惡意模仿或干擾他人聊天\n"
-                          "• 禁止使用變聲器或播放音效干擾頻道秩序",
-                    inline=False
-                )
-                
-                safety_embed.add_field(
-                    name="🚨 警告事項",
-                    value="• 系統將隨機錄取部分聊天內容以進行安全稽核\n"
-                          "• 如被舉報違規，管理員可立即封鎖或禁言，不另行通知\n"
-                          "• 為了您的安全，禁止隨意透漏個人資訊，包括(身分證、住家地址、等等......)\n"
-                          "• 若你無法接受以上規範，請勿加入頻道",
-                    inline=False
-                )
-                
+                # 🔥 發送安全規範（與群組預約格式一致；取用預先建好的模板，只補上時間戳）
+                safety_embed = INSTANT_SAFETY_EMBED_TEMPLATES[bool(is_chat_only)].copy()
+                safety_embed.timestamp = datetime.now(timezone.utc)
                 await text_channel.send(embed=safety_embed)
                 
                 # 🔥 語音頻道將在預約開始前 5 分鐘創建（不在這裡創建）
                 # 更新資料庫，保存文字頻道 ID（用於倒數計時和評價系統）
-                with Session() as update_s:
-                    update_s.execute(
-                        text("UPDATE \"Booking\" SET \"discordTextChannelId\" = :text_channel_id WHERE id = :booking_id"),
-                        {
-                            "text_channel_id": str(text_channel.id),
-                            "booking_id": booking_id
-                        }
-                    )
-                    update_s.commit()
+                def save_text_channel_id():
+                    with Session() as update_s:
+                        update_s.execute(
+                            text("UPDATE \"Booking\" SET \"discordTextChannelId\" = :text_channel_id WHERE id = :booking_id"),
+                            {
+                                "text_channel_id": str(text_channel.id),
+                                "booking_id": booking_id
+                            }
+                        )
+                        update_s.commit()
+                
+                await asyncio.to_thread(save_text_channel_id)
                 
                 # 🔥 創建語音頻道的任務（在預約開始前 5 分鐘執行）
                 async def create_voice_channel_5min_before():
@@ -3348,20 +3487,22 @@ async def check_instant_bookings_for_text_channel():
                             print(f"⚡ 立即創建語音頻道（已超過開始前 3 分鐘）: 預約 {booking_id}")
                         
                         # 檢查預約狀態是否仍然是 CONFIRMED，以及是否已經創建過語音頻道
-                        with Session() as check_s:
-                            current_booking = check_s.execute(
-                                text("SELECT status, \"discordVoiceChannelId\" FROM \"Booking\" WHERE id = :booking_id"),
-                                {"booking_id": booking_id}
-                            ).fetchone()
-                            
-                            if not current_booking or current_booking.status != 'CONFIRMED':
-                                print(f"⚠️ 預約 {booking_id} 狀態已改變，取消創建語音頻道")
-                                return
-                            
-                            # 🔥 檢查是否已經創建過語音頻道，避免重複創建
-                            if current_booking.discordVoiceChannelId:
-                                print(f"✅ 預約 {booking_id} 的語音頻道已存在，跳過創建")
-                                return
+                        def query_booking_voice_state():
+                            with Session() as check_s:
+                                return check_s.execute(
+                                    text("SELECT status, \"discordVoiceChannelId\" FROM \"Booking\" WHERE id = :booking_id"),
+                                    {"booking_id": booking_id}
+                                ).fetchone()
+                        
+                        current_booking = await asyncio.to_thread(query_booking_voice_state)
+                        if not current_booking or current_booking.status != 'CONFIRMED':
+                            print(f"⚠️ 預約 {booking_id} 狀態已改變，取消創建語音頻道")
+                            return
+                        
+                        # 🔥 檢查是否已經創建過語音頻道，避免重複創建
+                        if current_booking.discordVoiceChannelId:
+                            print(f"✅ 預約 {booking_id} 的語音頻道已存在，跳過創建")
+                            return
                         
                         # 重新查找 Discord 成員（可能現在已經在伺服器中了）
                         customer_member_vc = None
@@ -3369,8 +3510,8 @@ async def check_instant_bookings_for_text_channel():
                         
                         if customer_discord:
                             try:
-                                if customer_discord.replace('.', '').replace('-', '').isdigit():
-                                    customer_member_vc = guild.get_member(int(float(customer_discord)))
+                                if SNOWFLAKE_RE.fullmatch(customer_discord):
+                                    customer_member_vc = guild.get_member(int(customer_discord))
                                 else:
                                     customer_member_vc = find_member_by_discord_name(guild, customer_discord)
                             except (ValueError, TypeError):
@@ -3378,8 +3519,8 @@ async def check_instant_bookings_for_text_channel():
                         
                         if partner_discord:
                             try:
-                                if partner_discord.replace('.', '').replace('-', '').isdigit():
-                                    partner_member_vc = guild.get_member(int(float(partner_discord)))
+                                if SNOWFLAKE_RE.fullmatch(partner_discord):
+                                    partner_member_vc = guild.get_member(int(partner_discord))
                                 else:
                                     partner_member_vc = find_member_by_discord_name(guild, partner_discord)
                             except (ValueError, TypeError):
@@ -3406,21 +3547,21 @@ async def check_instant_bookings_for_text_channel():
                         # 為顧客添加權限
                         if customer_member_vc:
                             voice_overwrites[customer_member_vc] = discord.PermissionOverwrite(view_channel=True, connect=True, speak=True)
-                            print(f"✅ 為顧客 {customer_member_vc.name} 設置語音頻道權限")
+                            logger.debug("✅ 為顧客 %s 設置語音頻道權限", customer_member_vc.name)
                         else:
                             print(f"⚠️ 未找到顧客成員，將創建匿名語音頻道")
                         
                         # 為夥伴添加權限
                         if partner_member_vc:
                             voice_overwrites[partner_member_vc] = discord.PermissionOverwrite(view_channel=True, connect=True, speak=True)
-                            print(f"✅ 為夥伴 {partner_member_vc.name} 設置語音頻道權限")
+                            logger.debug("✅ 為夥伴 %s 設置語音頻道權限", partner_member_vc.name)
                         else:
                             print(f"⚠️ 未找到夥伴成員，將創建匿名語音頻道")
                         
                         # 🔥 即使找不到成員，也要創建語音頻道（匿名頻道）
-                        print(f"🔍 準備創建語音頻道: {voice_channel_name}")
-                        print(f"   類別: {category.name if category else 'None'}")
-                        print(f"   權限覆蓋數量: {len(voice_overwrites)}")
+                        logger.debug("🔍 準備創建語音頻道: %s", voice_channel_name)
+                        logger.debug("   類別: %s", category.name if category else 'None')
+                        logger.debug("   權限覆蓋數量: %s", len(voice_overwrites))
                         
                         # 創建語音頻道
                         voice_channel = await guild.create_voice_channel(
@@ -3432,19 +3573,19 @@ async def check_instant_bookings_for_text_channel():
                         print(f"✅ 語音頻道已創建: {voice_channel.name} (ID: {voice_channel.id})")
                         
                         # 更新資料庫，保存語音頻道 ID
-                        with Session() as update_s:
-                            update_s.execute(
-                                text("UPDATE \"Booking\" SET \"discordVoiceChannelId\" = :voice_channel_id WHERE id = :booking_id"),
-                                {
-                                    "voice_channel_id": str(voice_channel.id),
-                                    "booking_id": booking_id
-                                }
-                            )
-                            update_s.commit()
-                        
-                        print(f"✅ 已為即時預約 {booking_id} 創建語音頻道: {voice_channel_name}")
+                        def save_voice_channel_id():
+                            with Session() as update_s:
+                                update_s.execute(
+                                    text("UPDATE \"Booking\" SET \"discordVoiceChannelId\" = :voice_channel_id WHERE id = :booking_id"),
+                                    {
+                                        "voice_channel_id": str(voice_channel.id),
+                                        "booking_id": booking_id
+                                    }
+                                )
+                                update_s.commit()
                         
-                        # 在文字頻道發送通知
+                        # 寫入語音頻道 ID 與在文字頻道發送通知互不相依，同時進行
+                        pending = [asyncio.to_thread(save_voice_channel_id)]
                         if text_channel:
                             embed = discord.Embed(
                                 title="🎤 語音頻道已創建！",
@@ -3454,7 +3595,10 @@ async def check_instant_bookings_for_text_channel():
                             )
                             embed.add_field(name="⏰ 預約時長", value=f"{duration_minutes} 分鐘", inline=True)
                             embed.add_field(name="🎤 語音頻道", value=f"{voice_channel.mention}", inline=True)
-                            await text_channel.send(embed=embed)
+                            pending.append(text_channel.send(embed=embed))
+                        await asyncio.gather(*pending)
+                        
+                        print(f"✅ 已為即時預約 {booking_id} 創建語音頻道: {voice_channel_name}")
                     except Exception as e:
                         print(f"❌ 創建語音頻道失敗: {e}")
                         import traceback
@@ -3464,7 +3608,7 @@ async def check_instant_bookings_for_text_channel():
                 # 🔥 避免重複啟動任務
                 if booking_id not in active_voice_channel_tasks:
                     active_voice_channel_tasks.add(booking_id)
-                    bot.loop.create_task(create_voice_channel_5min_before())
+                    create_background_task(create_voice_channel_5min_before())
                     # 🔥 減少日誌輸出，只在第一次啟動時輸出
                     # print(f"🔍 語音頻道創建任務已啟動: 預約 {booking_id}")
                 
@@ -3474,7 +3618,7 @@ async def check_instant_bookings_for_text_channel():
                 # 🔥 避免重複啟動任務
                 if booking_id not in active_countdown_tasks:
                     active_countdown_tasks.add(booking_id)
-                    bot.loop.create_task(countdown_with_rating(
+                    create_background_task(countdown_with_rating(
                         None,  # vc_id（語音頻道尚未創建）
                         None,  # channel_name（語音頻道尚未創建）
                         text_channel, 
@@ -3486,7 +3630,7 @@ async def check_instant_bookings_for_text_channel():
                     ))
                 
                 # 發送預約通知到「創建通知」頻道
-                notification_channel = bot.get_channel(1419585779432423546)
+                notification_channel = get_notification_channel()
                 if notification_channel:
                     # 🔥 減少重複日誌輸出
                     # print(f"🔍 準備發送即時預約通知: booking_id={booking_id}, notification_channel={notification_channel}")
@@ -3552,49 +3696,47 @@ async def check_instant_bookings_for_text_channel():
                         
                         # 嘗試從 Discord ID 獲取用戶 ID
                         try:
-                            if customer_discord and customer_discord.replace('.', '').replace('-', '').isdigit():
-                                user1_id = str(int(float(customer_discord)))
+                            if customer_discord and SNOWFLAKE_RE.fullmatch(customer_discord):
+                                user1_id = str(int(customer_discord))
                         except (ValueError, TypeError):
                             pass
                         
                         try:
-                            if partner_discord and partner_discord.replace('.', '').replace('-', '').isdigit():
-                                user2_id = str(int(float(partner_discord)))
+                            if partner_discord and SNOWFLAKE_RE.fullmatch(partner_discord):
+                                user2_id = str(int(partner_discord))
                         except (ValueError, TypeError):
                             pass
-                        record_id = None
-                        created_at = None
-                        
                         if user1_id and user2_id:
                             try:
-                                with Session() as s:
-                                    # 先檢查是否已經存在配對記錄
-                                    existing_record = s.execute(
-                                        text("SELECT id, \"createdAt\" FROM \"PairingRecord\" WHERE \"bookingId\" = :booking_id"),
-                                        {"booking_id": booking_id}
-                                    ).fetchone()
+                                def create_pairing_record():
+                                    with Session() as s:
+                                        # 先檢查是否已經存在配對記錄
+                                        existing_record = s.execute(
+                                            text("SELECT id FROM \"PairingRecord\" WHERE \"bookingId\" = :booking_id"),
+                                            {"booking_id": booking_id}
+                                        ).fetchone()
                                     
-                                    if existing_record:
-                                        record_id = existing_record[0]
-                                        created_at = existing_record[1]
-                                        print(f"✅ 使用現有配對記錄: {record_id}")
-                                    else:
-                                        # 生成唯一的 ID
-                                        import uuid
-                                        record_id = str(uuid.uuid4())
+                                        if existing_record:
+                                            record_id = existing_record[0]
+                                            print(f"✅ 使用現有配對記錄: {record_id}")
+                                        else:
+                                            # 生成唯一的 ID
+                                            import uuid
+                                            record_id = str(uuid.uuid4())
                                         
-                                        record = PairingRecord(
-                                            id=record_id,
-                                            user1Id=user1_id,
-                                            user2Id=user2_id,
-                                            duration=duration_minutes * 60,
-                                            animalName="預約頻道",
-                                            bookingId=booking_id
-                                        )
-                                        s.add(record)
-                                        s.commit()
-                                        created_at = record.createdAt
-                                        print(f"✅ 創建新配對記錄: {record_id} (即時預約)")
+                                            record = PairingRecord(
+                                                id=record_id,
+                                                user1Id=user1_id,
+                                                user2Id=user2_id,
+                                                duration=duration_minutes * 60,
+                                                animalName="預約頻道",
+                                                bookingId=booking_id
+                                            )
+                                            s.add(record)
+                                            s.commit()
+                                            print(f"✅ 創建新配對記錄: {record_id} (即時預約)")
+                                
+                                await asyncio.to_thread(create_pairing_record)
                             except Exception as e:
                                 print(f"⚠️ 創建配對記錄失敗: {e}")
                                 import traceback
@@ -3604,7 +3746,7 @@ async def check_instant_bookings_for_text_channel():
                         import traceback
                         traceback.print_exc()
                 else:
-                    print(f"⚠️ 找不到創建通知頻道 (ID: 1419585779432423546)")
+                    print(f"⚠️ 找不到創建通知頻道 (ID: {BOOKING_NOTIFICATION_CHANNEL_ID})")
                 
                 
             except Exception as e:
@@ -3673,21 +3815,18 @@ async def check_regular_bookings_for_text_channel():
                     print(f"❌ 資料庫連接失敗，已重試 {max_retries} 次: {db_error}")
                     return
         
-        # 🔥 過濾掉已經處理過的預約（避免重複輸出）
-        filtered_rows = [row for row in rows if row.id not in processed_text_channels]
+        # 🔥 過濾掉找不到成員而已警告過的預約（避免重複輸出）
+        warned_bookings = getattr(check_regular_bookings_for_text_channel, '_warned_bookings', ())
+        filtered_rows = [row for row in rows if row.id not in warned_bookings]
         
         if len(filtered_rows) > 0:
-            print(f"🔍 找到 {len(filtered_rows)} 個一般預約需要創建文字頻道")
+            logger.debug("🔍 找到 %s 個一般預約需要創建文字頻道", len(filtered_rows))
         
         # 處理找到的一般預約
         for row in filtered_rows:
             try:
                 booking_id = row.id
                 
-                # 檢查是否已經處理過
-                if booking_id in processed_text_channels:
-                    continue
-                
                 customer_discord = row.customer_discord
                 partner_discord = row.partner_discord
                 
@@ -3695,7 +3834,7 @@ async def check_regular_bookings_for_text_channel():
                     print(f"⚠️ 預約 {booking_id} 缺少 Discord ID，跳過")
                     continue
                 
-                guild = bot.get_guild(GUILD_ID)
+                guild = get_main_guild()
                 if not guild:
                     print("❌ 找不到 Discord 伺服器")
                     continue
@@ -3705,28 +3844,26 @@ async def check_regular_bookings_for_text_channel():
                 partner_member = None
                 
                 try:
-                    if customer_discord.replace('.', '').replace('-', '').isdigit():
-                        customer_member = guild.get_member(int(float(customer_discord)))
+                    if SNOWFLAKE_RE.fullmatch(customer_discord):
+                        customer_member = guild.get_member(int(customer_discord))
                     else:
                         customer_member = find_member_by_discord_name(guild, customer_discord)
                 except (ValueError, TypeError):
                     customer_member = None
                 
                 try:
-                    if partner_discord.replace('.', '').replace('-', '').isdigit():
-                        partner_member = guild.get_member(int(float(partner_discord)))
+                    if SNOWFLAKE_RE.fullmatch(partner_discord):
+                        partner_member = guild.get_member(int(partner_discord))
                     else:
                         partner_member = find_member_by_discord_name(guild, partner_discord)
                 except (ValueError, TypeError):
                     partner_member = None
                 
                 if not customer_member or not partner_member:
-                    # 🔥 將預約 ID 添加到已處理列表，避免重複處理和輸出
-                    # 如果找不到成員，無法創建頻道，但我們不希望每次都重複檢查
-                    processed_text_channels.add(booking_id)
+                    # 如果找不到成員，無法創建頻道；記錄到 _warned_bookings 後不再重複檢查
                     # 只在第一次遇到時輸出詳細信息
                     if not hasattr(check_regular_bookings_for_text_channel, '_warned_bookings'):
-                        check_regular_bookings_for_text_channel._warned_bookings = set()
+                        check_regular_bookings_for_text_channel._warned_bookings = BoundedSet()
                     if booking_id not in check_regular_bookings_for_text_channel._warned_bookings:
                         missing_info = []
                         if not customer_member:
@@ -3742,10 +3879,7 @@ async def check_regular_bookings_for_text_channel():
                 end_time = row.endTime
                 
                 # 🔥 使用 booking ID 來確定性地生成 emoji，確保文字和語音頻道使用相同的 emoji（與語音頻道邏輯一致）
-                import hashlib
-                hash_obj = hashlib.md5(str(booking_id).encode())
-                hash_hex = hash_obj.hexdigest()
-                cute_item_full = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+                cute_item_full = cute_item_for(str(booking_id))
                 # 只提取 emoji 部分（去掉後面的文字）
                 cute_item = cute_item_full.split()[0] if cute_item_full else "🎀"
                 
@@ -3784,16 +3918,19 @@ async def check_regular_bookings_for_text_channel():
                 
                 # 建立成功後，更新資料庫的文字頻道 ID
                 try:
-                    with Session() as s:
-                        s.execute(
-                            text("""
-                                UPDATE "Booking"
-                                SET "discordTextChannelId" = :channel_id
-                                WHERE id = :booking_id
-                            """),
-                            {"channel_id": str(text_channel.id), "booking_id": booking_id}
-                        )
-                        s.commit()
+                    def save_text_channel_id():
+                        with Session() as s:
+                            s.execute(
+                                text("""
+                                    UPDATE "Booking"
+                                    SET "discordTextChannelId" = :channel_id
+                                    WHERE id = :booking_id
+                                """),
+                                {"channel_id": str(text_channel.id), "booking_id": booking_id}
+                            )
+                            s.commit()
+                    
+                    await asyncio.to_thread(save_text_channel_id)
                 except Exception as db_err:
                     print(f"❌ 一般預約 {booking_id} 保存文字頻道 ID 失敗: {db_err}")
                     continue
@@ -3811,7 +3948,7 @@ async def check_regular_bookings_for_text_channel():
                 await text_channel.send(embed=embed)
                 
                 # 發送預約通知到「創建通知」頻道（與即時預約邏輯一致）
-                notification_channel = bot.get_channel(1419585779432423546)
+                notification_channel = get_notification_channel()
                 if notification_channel:
                     try:
                         # 計算時長
@@ -3866,39 +4003,37 @@ async def check_regular_bookings_for_text_channel():
                         # 創建配對記錄（與即時預約邏輯一致）
                         user1_id = str(customer_member.id) if customer_member else None
                         user2_id = str(partner_member.id) if partner_member else None
-                        record_id = None
-                        created_at = None
-                        
                         if user1_id and user2_id:
                             try:
-                                with Session() as s:
-                                    # 先檢查是否已經存在配對記錄
-                                    existing_record = s.execute(
-                                        text("SELECT id, \"createdAt\" FROM \"PairingRecord\" WHERE \"bookingId\" = :booking_id"),
-                                        {"booking_id": booking_id}
-                                    ).fetchone()
+                                def create_pairing_record():
+                                    with Session() as s:
+                                        # 先檢查是否已經存在配對記錄
+                                        existing_record = s.execute(
+                                            text("SELECT id FROM \"PairingRecord\" WHERE \"bookingId\" = :booking_id"),
+                                            {"booking_id": booking_id}
+                                        ).fetchone()
                                     
-                                    if existing_record:
-                                        record_id = existing_record[0]
-                                        created_at = existing_record[1]
-                                        print(f"✅ 使用現有配對記錄: {record_id}")
-                                    else:
-                                        # 生成唯一的 ID
-                                        import uuid
-                                        record_id = str(uuid.uuid4())
+                                        if existing_record:
+                                            record_id = existing_record[0]
+                                            print(f"✅ 使用現有配對記錄: {record_id}")
+                                        else:
+                                            # 生成唯一的 ID
+                                            import uuid
+                                            record_id = str(uuid.uuid4())
                                         
-                                        record = PairingRecord(
-                                            id=record_id,
-                                            user1Id=user1_id,
-                                            user2Id=user2_id,
-                                            duration=duration_minutes * 60,
-                                            animalName="預約頻道",
-                                            bookingId=booking_id
-                                        )
-                                        s.add(record)
-                                        s.commit()
-                                        created_at = record.createdAt
-                                        print(f"✅ 創建新配對記錄: {record_id} (一般預約)")
+                                            record = PairingRecord(
+                                                id=record_id,
+                                                user1Id=user1_id,
+                                                user2Id=user2_id,
+                                                duration=duration_minutes * 60,
+                                                animalName="預約頻道",
+                                                bookingId=booking_id
+                                            )
+                                            s.add(record)
+                                            s.commit()
+                                            print(f"✅ 創建新配對記錄: {record_id} (一般預約)")
+                                
+                                await asyncio.to_thread(create_pairing_record)
                             except Exception as e:
                                 print(f"⚠️ 創建配對記錄失敗: {e}")
                                 import traceback
@@ -3908,7 +4043,7 @@ async def check_regular_bookings_for_text_channel():
                         import traceback
                         traceback.print_exc()
                 else:
-                    print(f"⚠️ 找不到創建通知頻道 (ID: 1419585779432423546)")
+                    print(f"⚠️ 找不到創建通知頻道 (ID: {BOOKING_NOTIFICATION_CHANNEL_ID})")
                 
                 
             except Exception as e:
@@ -4037,7 +4172,7 @@ async def cleanup_expired_channels():
     await bot.wait_until_ready()
     
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return
@@ -4280,7 +4415,7 @@ async def cleanup_expired_channels():
         expired_vc_ids = []
         
         for vc_id, vc_data in active_voice_channels.items():
-            if vc_data['remaining'] <= 0:
+            if voice_channel_seconds_left(vc_data) <= 0:
                 expired_vc_ids.append(vc_id)
         
         for vc_id in expired_vc_ids:
@@ -4404,7 +4539,7 @@ async def check_booking_timeouts():
         timeout_bookings = await asyncio.to_thread(query_timeout_bookings)
         
         if timeout_bookings:
-            print(f"🔍 找到 {len(timeout_bookings)} 個超時預約需要處理")
+            logger.debug("🔍 找到 %s 個超時預約需要處理", len(timeout_bookings))
             
             for booking in timeout_bookings:
                 try:
@@ -4473,9 +4608,9 @@ async def check_booking_timeouts():
                         no_response_count = await asyncio.to_thread(query)
                         
                         if no_response_count >= 3:
-                            admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+                            admin_channel = get_admin_channel()
                             if admin_channel:
-                                await admin_channel.send(
+                                notify_admin(
                                     f"⚠️ **夥伴回應超時警告**\n"
                                     f"👤 夥伴: {partner_name}\n"
                                     f"📊 本月未回覆次數: {no_response_count} 次\n"
@@ -4535,9 +4670,9 @@ async def check_missing_ratings():
             return  # 資料庫連線錯誤，安全跳過該輪檢查
         
         if missing_ratings:
-            print(f"🔍 處理 {len(missing_ratings)} 個遺失評價")
+            logger.debug("🔍 處理 %s 個遺失評價", len(missing_ratings))
             
-            admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+            admin_channel = get_admin_channel()
             if admin_channel:
                 for booking in missing_ratings:
                     try:
@@ -4549,7 +4684,7 @@ async def check_missing_ratings():
                         
                         time_since_end = (now - end_time).total_seconds() / 60  # 分鐘
                         
-                        await admin_channel.send(
+                        notify_admin(
                             f"**{booking.customer_name}** 評價 **{booking.partner_name}**\n"
                             f"⭐ 未評價\n"
                             f"💬 顧客未填寫評價（預約已結束 {time_since_end:.0f} 分鐘）"
@@ -4585,7 +4720,7 @@ async def check_group_and_multiplayer_text_channels():
     await bot.wait_until_ready()
     
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return
@@ -4835,26 +4970,29 @@ async def check_group_and_multiplayer_text_channels():
                     text_channel = None
                     
                     # 先查找既有文字頻道
-                    with Session() as s:
-                        result = s.execute(text("""
-                            SELECT "discordTextChannelId" 
-                            FROM "GroupBooking" 
-                            WHERE id = :group_booking_id
-                        """), {"group_booking_id": group_booking_id}).fetchone()
-                        
-                        if result and result[0]:
-                            try:
-                                text_channel = guild.get_channel(int(result[0]))
-                                if text_channel:
-                                    print(f"✅ 找到群組預約 {group_booking_id} 的既有文字頻道: {text_channel.name}")
-                                else:
-                                    print(f"⚠️ 警告：群組預約 {group_booking_id} 的 discordTextChannelId ({result[0]}) 無效，找不到對應頻道，將創建新頻道")
-                            except Exception as e:
-                                print(f"⚠️ 警告：無法查找群組預約 {group_booking_id} 的文字頻道: {e}，將創建新頻道")
+                    def query_text_channel_id():
+                        with Session() as s:
+                            result = s.execute(text("""
+                                SELECT "discordTextChannelId" 
+                                FROM "GroupBooking" 
+                                WHERE id = :group_booking_id
+                            """), {"group_booking_id": group_booking_id}).fetchone()
+                            return result[0] if result else None
+                    
+                    existing_channel_id = await asyncio.to_thread(query_text_channel_id)
+                    if existing_channel_id:
+                        try:
+                            text_channel = guild.get_channel(int(existing_channel_id))
+                            if text_channel:
+                                print(f"✅ 找到群組預約 {group_booking_id} 的既有文字頻道: {text_channel.name}")
+                            else:
+                                print(f"⚠️ 警告：群組預約 {group_booking_id} 的 discordTextChannelId ({existing_channel_id}) 無效，找不到對應頻道，將創建新頻道")
+                        except Exception as e:
+                            print(f"⚠️ 警告：無法查找群組預約 {group_booking_id} 的文字頻道: {e}，將創建新頻道")
                     
                     # 如果找不到文字頻道，則創建新頻道
                     if not text_channel:
-                        print(f"🔍 群組預約 {group_booking_id} 缺少文字頻道，開始創建...")
+                        logger.debug("🔍 群組預約 %s 缺少文字頻道，開始創建...", group_booking_id)
                         try:
                             # 轉換時間為台灣時區
                             start_time = row.startTime
@@ -4887,7 +5025,7 @@ async def check_group_and_multiplayer_text_channels():
                         if group_booking_id not in active_countdown_tasks:
                             active_countdown_tasks.add(group_booking_id)
                             # 如果找到既有頻道或剛創建的頻道，啟動倒數計時任務（包含倒數提醒）
-                            bot.loop.create_task(
+                            create_background_task(
                                 countdown_with_group_rating(
                                     None,  # vc_id (群組預約可能還沒有語音頻道)
                                     text_channel.name,
@@ -4919,7 +5057,7 @@ async def check_group_and_multiplayer_text_channels():
                     total_count = row.total_count if hasattr(row, 'total_count') else 0
                     rejected_count = row.rejected_count if hasattr(row, 'rejected_count') else 0
                     
-                    print(f"🔍 處理多人陪玩 {multi_player_booking_id}: 開始時間={row.startTime}, 已確認={confirmed_count}/{total_count}, 已拒絕={rejected_count}")
+                    logger.debug("🔍 處理多人陪玩 %s: 開始時間=%s, 已確認=%s/%s, 已拒絕=%s", multi_player_booking_id, row.startTime, confirmed_count, total_count, rejected_count)
                     
                     if not customer_discord:
                         print(f"⚠️ 多人陪玩預約 {multi_player_booking_id} 沒有顧客 Discord ID")
@@ -4950,7 +5088,7 @@ async def check_group_and_multiplayer_text_channels():
                     # ✅ 若已存在文字或語音頻道，必須直接 return，不得再創建
                     if existing_channels and existing_channels[0]:
                         # 檢查頻道是否真的存在
-                        guild = bot.get_guild(GUILD_ID)
+                        guild = get_main_guild()
                         if guild:
                             existing_text_channel = guild.get_channel(int(existing_channels[0]))
                             if existing_text_channel:
@@ -4960,26 +5098,29 @@ async def check_group_and_multiplayer_text_channels():
                     text_channel = None
                     
                     # 先查找既有文字頻道
-                    with Session() as s:
-                        result = s.execute(text("""
-                            SELECT "discordTextChannelId" 
-                            FROM "MultiPlayerBooking" 
-                            WHERE id = :multi_player_booking_id
-                        """), {"multi_player_booking_id": multi_player_booking_id}).fetchone()
-                        
-                        if result and result[0]:
-                            try:
-                                text_channel = guild.get_channel(int(result[0]))
-                                if text_channel:
-                                    print(f"✅ 找到多人陪玩 {multi_player_booking_id} 的既有文字頻道: {text_channel.name}")
-                                else:
-                                    print(f"⚠️ 警告：多人陪玩 {multi_player_booking_id} 的 discordTextChannelId ({result[0]}) 無效，找不到對應頻道，將創建新頻道")
-                            except Exception as e:
-                                print(f"⚠️ 警告：無法查找多人陪玩 {multi_player_booking_id} 的文字頻道: {e}，將創建新頻道")
+                    def query_text_channel_id():
+                        with Session() as s:
+                            result = s.execute(text("""
+                                SELECT "discordTextChannelId" 
+                                FROM "MultiPlayerBooking" 
+                                WHERE id = :multi_player_booking_id
+                            """), {"multi_player_booking_id": multi_player_booking_id}).fetchone()
+                            return result[0] if result else None
+                    
+                    existing_channel_id = await asyncio.to_thread(query_text_channel_id)
+                    if existing_channel_id:
+                        try:
+                            text_channel = guild.get_channel(int(existing_channel_id))
+                            if text_channel:
+                                print(f"✅ 找到多人陪玩 {multi_player_booking_id} 的既有文字頻道: {text_channel.name}")
+                            else:
+                                print(f"⚠️ 警告：多人陪玩 {multi_player_booking_id} 的 discordTextChannelId ({existing_channel_id}) 無效，找不到對應頻道，將創建新頻道")
+                        except Exception as e:
+                            print(f"⚠️ 警告：無法查找多人陪玩 {multi_player_booking_id} 的文字頻道: {e}，將創建新頻道")
                     
                     # 如果找不到文字頻道，則創建新頻道
                     if not text_channel:
-                        print(f"🔍 多人陪玩 {multi_player_booking_id} 缺少文字頻道，開始創建...")
+                        logger.debug("🔍 多人陪玩 %s 缺少文字頻道，開始創建...", multi_player_booking_id)
                         try:
                             # 轉換時間為台灣時區
                             start_time = row.startTime
@@ -5013,7 +5154,7 @@ async def check_group_and_multiplayer_text_channels():
                         if multi_player_booking_id not in active_countdown_tasks:
                             active_countdown_tasks.add(multi_player_booking_id)
                             # 啟動倒數計時任務（多人陪玩）
-                            bot.loop.create_task(
+                            create_background_task(
                                 countdown_with_group_rating(
                                     None,  # vc_id (多人陪玩可能還沒有語音頻道)
                                     text_channel.name,
@@ -5061,15 +5202,156 @@ async def check_group_and_multiplayer_text_channels():
             print(f"❌ 檢查群組和多人陪玩文字頻道任務錯誤: {e}")
 
 # --- 自動檢查預約任務 ---
+# 預約輪詢的查詢在模組載入時建立一次 text() 物件，每輪只綁定參數，不重複解析 SQL
+# 使用原生 SQL 查詢避免 orderNumber 欄位問題
+# 添加檢查：只處理還沒有 Discord 頻道的預約
+# 修改：排除即時預約和多人陪玩預約，避免重複處理
+_BOOKING_POLL_SQL = """
+    SELECT 
+        b.id, b."customerId", b."scheduleId", b.status, b."createdAt", b."updatedAt",
+        c.name as customer_name,
+        COALESCE(b."paymentInfo"->>'customerDiscord', cu.discord) as customer_discord,
+        p.name as partner_name, pu.discord as partner_discord,
+        s."startTime", s."endTime",
+        b."paymentInfo"->>'isInstantBooking' as is_instant_booking,
+        b."paymentInfo"->>'discordDelayMinutes' as discord_delay_minutes
+    FROM "Booking" b
+    JOIN "Schedule" s ON s.id = b."scheduleId"
+    JOIN "Customer" c ON c.id = b."customerId"
+    JOIN "User" cu ON cu.id = c."userId"
+    JOIN "Partner" p ON p.id = s."partnerId"
+    JOIN "User" pu ON pu.id = p."userId"
+    WHERE b.status = 'CONFIRMED'
+    AND (b."paymentInfo"->>'isInstantBooking' IS NULL OR b."paymentInfo"->>'isInstantBooking' != 'true')
+    AND b."multiPlayerBookingId" IS NULL
+    AND b."groupBookingId" IS NULL
+    AND (b.processed IS NULL OR b.processed = false)
+    AND s."startTime" >= :start_time_1
+    AND s."startTime" <= :start_time_2
+    AND b."discordVoiceChannelId" IS NULL
+    AND b."discordTextChannelId" IS NULL
+    AND s."endTime" > :current_time
+"""
+BOOKING_POLL_QUERY = text(_BOOKING_POLL_SQL)
+# processed 欄位不存在時使用的版本：同一段 SQL 去掉 processed 條件，兩者不會各自漂移
+BOOKING_POLL_QUERY_WITHOUT_PROCESSED = text(_BOOKING_POLL_SQL.replace('    AND (b.processed IS NULL OR b.processed = false)\n', ''))
+
+# 即時預約查詢（排除多人陪玩和群組預約）
+INSTANT_BOOKING_POLL_QUERY = text("""
+    SELECT 
+        b.id, b."customerId", b."scheduleId", b.status, b."createdAt", b."updatedAt",
+        c.name as customer_name,
+        COALESCE(b."paymentInfo"->>'customerDiscord', cu.discord) as customer_discord,
+        p.name as partner_name, pu.discord as partner_discord,
+        s."startTime", s."endTime",
+        b."paymentInfo"->>'isInstantBooking' as is_instant_booking,
+        b."paymentInfo"->>'discordDelayMinutes' as discord_delay_minutes
+    FROM "Booking" b
+    JOIN "Schedule" s ON s.id = b."scheduleId"
+    JOIN "Customer" c ON c.id = b."customerId"
+    JOIN "User" cu ON cu.id = c."userId"
+    JOIN "Partner" p ON p.id = s."partnerId"
+    JOIN "User" pu ON pu.id = p."userId"
+    WHERE b.status = 'CONFIRMED'
+    AND b."paymentInfo"->>'isInstantBooking' = 'true'
+    AND b."multiPlayerBookingId" IS NULL
+    AND b."groupBookingId" IS NULL
+    AND s."startTime" >= :instant_start_time_1
+    AND s."startTime" <= :instant_start_time_2
+    AND b."discordVoiceChannelId" IS NULL
+    AND s."endTime" > :current_time
+""")
+
+# 查詢群組預約（通過 groupBookingId 判斷）
+GROUP_BOOKING_POLL_QUERY = text("""
+    SELECT 
+        b."groupBookingId", b."customerId", b."scheduleId", b.status, b."createdAt", b."updatedAt",
+        c.name as customer_name, cu.discord as customer_discord,
+        p.name as partner_name, pu.discord as partner_discord,
+        s."startTime", s."endTime"
+    FROM "Booking" b
+    JOIN "Schedule" s ON s.id = b."scheduleId"
+    JOIN "Customer" c ON c.id = b."customerId"
+    JOIN "User" cu ON cu.id = c."userId"
+    JOIN "Partner" p ON p.id = s."partnerId"
+    JOIN "User" pu ON pu.id = p."userId"
+    WHERE b.status = 'CONFIRMED'
+    AND b."groupBookingId" IS NOT NULL
+    AND s."startTime" >= :start_time_1
+    AND s."startTime" <= :start_time_2
+    AND s."endTime" > :current_time
+    AND b."discordVoiceChannelId" IS NULL
+""")
+
+# ✅ 查詢多人陪玩預約（開始前3-5分鐘創建語音頻道）
+# 🔥 修改：必須所有夥伴都 CONFIRMED，且沒有 REJECTED 的夥伴
+MULTI_PLAYER_BOOKING_POLL_QUERY = text("""
+    SELECT 
+        mpb.id as multi_player_booking_id,
+        mpb."customerId",
+        mpb."startTime",
+        mpb."endTime",
+        c.name as customer_name,
+        cu.discord as customer_discord,
+        array_agg(DISTINCT p.name) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')) as partner_names,
+        array_agg(DISTINCT pu.discord) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED') AND pu.discord IS NOT NULL) as partner_discords,
+        COUNT(DISTINCT b.id) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')) as confirmed_count,
+        COUNT(DISTINCT b.id) as total_count
+    FROM "MultiPlayerBooking" mpb
+    JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
+    JOIN "Schedule" s ON s.id = b."scheduleId"
+    JOIN "Customer" c ON c.id = mpb."customerId"
+    JOIN "User" cu ON cu.id = c."userId"
+    JOIN "Partner" p ON p.id = s."partnerId"
+    JOIN "User" pu ON pu.id = p."userId"
+    WHERE mpb.status IN ('ACTIVE', 'PENDING')
+    AND mpb."startTime" >= :start_time_1
+    AND mpb."startTime" <= :start_time_2
+    AND mpb."endTime" > :current_time
+    AND mpb."discordVoiceChannelId" IS NULL
+    GROUP BY mpb.id, mpb."customerId", mpb."startTime", mpb."endTime", c.name, cu.discord
+    HAVING 
+        -- 必須所有夥伴都 CONFIRMED 或 PARTNER_ACCEPTED（沒有 PENDING 或 REJECTED）
+        COUNT(DISTINCT b.id) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')) = COUNT(DISTINCT b.id)
+        AND COUNT(DISTINCT b.id) FILTER (WHERE b.status IN ('REJECTED', 'PARTNER_REJECTED')) = 0
+        AND COUNT(DISTINCT pu.discord) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED') AND pu.discord IS NOT NULL) > 0
+""")
+
+BOOKING_CHECK_LEAD = timedelta(minutes=4)  # 排程檢查在開始前 4 分鐘執行（落在語音頻道創建窗口內）
+booking_check_timers = {}  # /schedule_booking 排程的預約檢查 {booking_id: TimerHandle}
+check_bookings_lock = None  # 定期輪詢與排程檢查共用，避免同時執行而重複創建頻道（setup_hook 時建立）
+
 @tasks.loop(seconds=CHECK_INTERVAL)
 async def check_bookings():
-    """定期檢查已付款的預約並創建語音頻道"""
+    """定期檢查已付款的預約並創建語音頻道（網站未通知或 bot 重啟時的備援）"""
+    async with check_bookings_lock:
+        await check_bookings_once()
+
+def schedule_booking_check(booking_id, start_dt):
+    """在預約進入創建窗口時立即執行一次預約檢查，不必等下一輪輪詢（只能在事件循環中呼叫）"""
+    old = booking_check_timers.pop(booking_id, None)
+    if old:
+        old.cancel()
+    
+    def on_due():
+        booking_check_timers.pop(booking_id, None)
+        create_background_task(run_scheduled_booking_check())
+    
+    delay = max(0, (start_dt - BOOKING_CHECK_LEAD - discord.utils.utcnow()).total_seconds())
+    booking_check_timers[booking_id] = asyncio.get_running_loop().call_later(delay, on_due)
+
+async def run_scheduled_booking_check():
+    async with check_bookings_lock:
+        await check_bookings_once()
+
+async def check_bookings_once():
+    """檢查已付款的預約並創建語音頻道"""
     global db_connection_error_reported
     await bot.wait_until_ready()
     
     try:
         # 減少日誌輸出
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print("❌ 找不到 Discord 伺服器")
             return
@@ -5088,62 +5370,6 @@ async def check_bookings():
         instant_window_start = now - timedelta(hours=24)  # 擴展到過去24小時，確保能捕獲到所有已確認的即時預約
         instant_window_end = now + timedelta(hours=24)  # 未來24小時內
         
-        # 使用原生 SQL 查詢避免 orderNumber 欄位問題
-        # 添加檢查：只處理還沒有 Discord 頻道的預約
-        # 修改：排除即時預約和多人陪玩預約，避免重複處理
-        query = """
-            SELECT 
-                b.id, b."customerId", b."scheduleId", b.status, b."createdAt", b."updatedAt",
-                c.name as customer_name,
-                COALESCE(b."paymentInfo"->>'customerDiscord', cu.discord) as customer_discord,
-                p.name as partner_name, pu.discord as partner_discord,
-                s."startTime", s."endTime",
-                b."paymentInfo"->>'isInstantBooking' as is_instant_booking,
-                b."paymentInfo"->>'discordDelayMinutes' as discord_delay_minutes
-            FROM "Booking" b
-            JOIN "Schedule" s ON s.id = b."scheduleId"
-            JOIN "Customer" c ON c.id = b."customerId"
-            JOIN "User" cu ON cu.id = c."userId"
-            JOIN "Partner" p ON p.id = s."partnerId"
-            JOIN "User" pu ON pu.id = p."userId"
-            WHERE b.status = 'CONFIRMED'
-            AND (b."paymentInfo"->>'isInstantBooking' IS NULL OR b."paymentInfo"->>'isInstantBooking' != 'true')
-            AND b."multiPlayerBookingId" IS NULL
-            AND b."groupBookingId" IS NULL
-            AND (b.processed IS NULL OR b.processed = false)
-            AND s."startTime" >= :start_time_1
-            AND s."startTime" <= :start_time_2
-            AND b."discordVoiceChannelId" IS NULL
-            AND b."discordTextChannelId" IS NULL
-            AND s."endTime" > :current_time
-            """
-            
-        # 即時預約查詢（排除多人陪玩和群組預約）
-        instant_query = """
-            SELECT 
-                b.id, b."customerId", b."scheduleId", b.status, b."createdAt", b."updatedAt",
-                c.name as customer_name,
-                COALESCE(b."paymentInfo"->>'customerDiscord', cu.discord) as customer_discord,
-                p.name as partner_name, pu.discord as partner_discord,
-                s."startTime", s."endTime",
-                b."paymentInfo"->>'isInstantBooking' as is_instant_booking,
-                b."paymentInfo"->>'discordDelayMinutes' as discord_delay_minutes
-            FROM "Booking" b
-            JOIN "Schedule" s ON s.id = b."scheduleId"
-            JOIN "Customer" c ON c.id = b."customerId"
-            JOIN "User" cu ON cu.id = c."userId"
-            JOIN "Partner" p ON p.id = s."partnerId"
-            JOIN "User" pu ON pu.id = p."userId"
-            WHERE b.status = 'CONFIRMED'
-            AND b."paymentInfo"->>'isInstantBooking' = 'true'
-            AND b."multiPlayerBookingId" IS NULL
-            AND b."groupBookingId" IS NULL
-            AND s."startTime" >= :instant_start_time_1
-            AND s."startTime" <= :instant_start_time_2
-            AND b."discordVoiceChannelId" IS NULL
-            AND s."endTime" > :current_time
-        """
-        
         # 將同步資料庫操作移到線程池，避免阻塞事件循環
         # ADDED FOR TRANSACTION SAFETY: 每輪創建新 session，確保異常時 rollback
         def query_all_bookings():
@@ -5152,82 +5378,28 @@ async def check_bookings():
                 try:
                     # 查詢一般預約（processed 欄位如果不存在，b.processed IS NULL 會返回 true，所以查詢仍能正常工作）
                     try:
-                        result = s.execute(text(query), {"start_time_1": window_start, "start_time_2": window_end, "current_time": now})
+                        result = s.execute(BOOKING_POLL_QUERY, {"start_time_1": window_start, "start_time_2": window_end, "current_time": now})
                     except Exception as query_error:
                         # ADDED FOR TRANSACTION SAFETY: 確保異常時 rollback
                         s.rollback()
                         # 如果查詢失敗（可能是 processed 欄位不存在），移除 processed 條件重試
                         if "processed" in str(query_error).lower():
-                            query_without_processed = query.replace("AND (b.processed IS NULL OR b.processed = false)", "")
-                            result = s.execute(text(query_without_processed), {"start_time_1": window_start, "start_time_2": window_end, "current_time": now})
+                            result = s.execute(BOOKING_POLL_QUERY_WITHOUT_PROCESSED, {"start_time_1": window_start, "start_time_2": window_end, "current_time": now})
                         else:
                             raise
                     
                     # 查詢即時預約
-                    instant_result = s.execute(text(instant_query), {"instant_start_time_1": instant_window_start, "instant_start_time_2": instant_window_end, "current_time": now})
-                    
-                    # 查詢群組預約（通過 groupBookingId 判斷）
-                    group_query = """
-                        SELECT 
-                            b."groupBookingId", b."customerId", b."scheduleId", b.status, b."createdAt", b."updatedAt",
-                            c.name as customer_name, cu.discord as customer_discord,
-                            p.name as partner_name, pu.discord as partner_discord,
-                            s."startTime", s."endTime"
-                        FROM "Booking" b
-                        JOIN "Schedule" s ON s.id = b."scheduleId"
-                        JOIN "Customer" c ON c.id = b."customerId"
-                        JOIN "User" cu ON cu.id = c."userId"
-                        JOIN "Partner" p ON p.id = s."partnerId"
-                        JOIN "User" pu ON pu.id = p."userId"
-                        WHERE b.status = 'CONFIRMED'
-                        AND b."groupBookingId" IS NOT NULL
-                        AND s."startTime" >= :start_time_1
-                        AND s."startTime" <= :start_time_2
-                        AND s."endTime" > :current_time
-                        AND b."discordVoiceChannelId" IS NULL
-                    """
+                    instant_result = s.execute(INSTANT_BOOKING_POLL_QUERY, {"instant_start_time_1": instant_window_start, "instant_start_time_2": instant_window_end, "current_time": now})
                     
-                    group_result = s.execute(text(group_query), {"start_time_1": window_start, "start_time_2": window_end, "current_time": now})
+                    # 查詢群組預約
+                    group_result = s.execute(GROUP_BOOKING_POLL_QUERY, {"start_time_1": window_start, "start_time_2": window_end, "current_time": now})
                     
-                    # ✅ 查詢多人陪玩預約（開始前3-5分鐘創建語音頻道）
-                    # 🔥 修改：必須所有夥伴都 CONFIRMED，且沒有 REJECTED 的夥伴
+                    # 查詢多人陪玩預約
                     # ✅ 時間窗口：開始前5分鐘到開始前3分鐘（確保在開始前3-5分鐘創建）
                     multi_player_window_start = now + timedelta(minutes=3)  # 開始前3分鐘
                     multi_player_window_end = now + timedelta(minutes=5)    # 開始前5分鐘
                     
-                    multi_player_query = """
-                        SELECT 
-                            mpb.id as multi_player_booking_id,
-                            mpb."customerId",
-                            mpb."startTime",
-                            mpb."endTime",
-                            c.name as customer_name,
-                            cu.discord as customer_discord,
-                            array_agg(DISTINCT p.name) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')) as partner_names,
-                            array_agg(DISTINCT pu.discord) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED') AND pu.discord IS NOT NULL) as partner_discords,
-                            COUNT(DISTINCT b.id) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')) as confirmed_count,
-                            COUNT(DISTINCT b.id) as total_count
-                        FROM "MultiPlayerBooking" mpb
-                        JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
-                        JOIN "Schedule" s ON s.id = b."scheduleId"
-                        JOIN "Customer" c ON c.id = mpb."customerId"
-                        JOIN "User" cu ON cu.id = c."userId"
-                        JOIN "Partner" p ON p.id = s."partnerId"
-                        JOIN "User" pu ON pu.id = p."userId"
-                        WHERE mpb.status IN ('ACTIVE', 'PENDING')
-                        AND mpb."startTime" >= :start_time_1
-                        AND mpb."startTime" <= :start_time_2
-                        AND mpb."endTime" > :current_time
-                        AND mpb."discordVoiceChannelId" IS NULL
-                        GROUP BY mpb.id, mpb."customerId", mpb."startTime", mpb."endTime", c.name, cu.discord
-                        HAVING 
-                            -- 必須所有夥伴都 CONFIRMED 或 PARTNER_ACCEPTED（沒有 PENDING 或 REJECTED）
-                            COUNT(DISTINCT b.id) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')) = COUNT(DISTINCT b.id)
-                            AND COUNT(DISTINCT b.id) FILTER (WHERE b.status IN ('REJECTED', 'PARTNER_REJECTED')) = 0
-                            AND COUNT(DISTINCT pu.discord) FILTER (WHERE b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED') AND pu.discord IS NOT NULL) > 0
-                    """
-                    
-                    multi_player_result = s.execute(text(multi_player_query), {"start_time_1": multi_player_window_start, "start_time_2": multi_player_window_end, "current_time": now})
+                    multi_player_result = s.execute(MULTI_PLAYER_BOOKING_POLL_QUERY, {"start_time_1": multi_player_window_start, "start_time_2": multi_player_window_end, "current_time": now})
                     
                     # 轉換為列表，避免在線程外訪問結果
                     result_list = list(result)
@@ -5255,24 +5427,24 @@ async def check_bookings():
                     partner_names = row.partner_names if isinstance(row.partner_names, list) else list(row.partner_names) if row.partner_names else []
                     partner_discords = row.partner_discords if isinstance(row.partner_discords, list) else list(row.partner_discords) if row.partner_discords else []
                     
-                    booking = type('Booking', (), {
-                        'id': row.multi_player_booking_id,
-                        'customerId': row.customerId,
-                        'status': 'CONFIRMED',
-                        'serviceType': 'MULTI_PLAYER',
-                        'customer': type('Customer', (), {
-                            'user': type('User', (), {
-                                'discord': row.customer_discord
-                            })()
-                        })(),
-                        'schedule': type('Schedule', (), {
-                            'startTime': row.startTime,
-                            'endTime': row.endTime,
-                            'partners': [{'name': name, 'discord': disc} for name, disc in zip(partner_names, partner_discords)]
-                        })(),
-                        'isInstantBooking': None,
-                        'discordDelayMinutes': None
-                    })()
+                    booking = SimpleNamespace(
+                        id=row.multi_player_booking_id,
+                        customerId=row.customerId,
+                        status='CONFIRMED',
+                        serviceType='MULTI_PLAYER',
+                        customer=SimpleNamespace(
+                            user=SimpleNamespace(
+                                discord=row.customer_discord
+                            )
+                        ),
+                        schedule=SimpleNamespace(
+                            startTime=row.startTime,
+                            endTime=row.endTime,
+                            partners=[{'name': name, 'discord': disc} for name, disc in zip(partner_names, partner_discords)]
+                        ),
+                        isInstantBooking=None,
+                        discordDelayMinutes=None
+                    )
                     all_bookings.append(booking)
                 except Exception as e:
                     print(f"⚠️ 處理多人陪玩預約失敗: {e}")
@@ -5300,88 +5472,88 @@ async def check_bookings():
             
             # 為每個群組創建預約對象
             for group_id, group_data in group_bookings.items():
-                    booking = type('Booking', (), {
-                        'id': group_id,
-                        'customerId': group_data['customerId'],
-                        'status': 'CONFIRMED',
-                        'serviceType': 'GROUP',
-                        'customer': type('Customer', (), {
-                            'user': type('User', (), {
-                                'discord': group_data['customer_discord']
-                            })()
-                        })(),
-                        'schedule': type('Schedule', (), {
-                            'startTime': group_data['startTime'],
-                            'endTime': group_data['endTime'],
-                            'partners': group_data['partners']
-                        })(),
-                        'isInstantBooking': None,
-                        'discordDelayMinutes': None
-                    })()
+                    booking = SimpleNamespace(
+                        id=group_id,
+                        customerId=group_data['customerId'],
+                        status='CONFIRMED',
+                        serviceType='GROUP',
+                        customer=SimpleNamespace(
+                            user=SimpleNamespace(
+                                discord=group_data['customer_discord']
+                            )
+                        ),
+                        schedule=SimpleNamespace(
+                            startTime=group_data['startTime'],
+                            endTime=group_data['endTime'],
+                            partners=group_data['partners']
+                        ),
+                        isInstantBooking=None,
+                        discordDelayMinutes=None
+                    )
                     all_bookings.append(booking)
                 
             # 處理一般預約
             general_count = 0
             for row in result_list:
                 general_count += 1
-                booking = type('Booking', (), {
-                    'id': row.id,
-                    'customerId': row.customerId,
-                    'scheduleId': row.scheduleId,
-                    'status': row.status,
-                    'createdAt': row.createdAt,
-                    'updatedAt': row.updatedAt,
-                    'customer': type('Customer', (), {
-                        'name': getattr(row, 'customer_name', None),
-                        'user': type('User', (), {
-                            'discord': row.customer_discord
-                        })()
-                    })(),
-                    'schedule': type('Schedule', (), {
-                        'startTime': row.startTime,
-                        'endTime': row.endTime,
-                        'partner': type('Partner', (), {
-                            'name': getattr(row, 'partner_name', None),
-                            'user': type('User', (), {
-                                'discord': row.partner_discord
-                            })()
-                        })()
-                    })(),
-                    'isInstantBooking': getattr(row, 'is_instant_booking', None),
-                    'discordDelayMinutes': getattr(row, 'discord_delay_minutes', None)
-                })()
+                booking = SimpleNamespace(
+                    id=row.id,
+                    customerId=row.customerId,
+                    scheduleId=row.scheduleId,
+                    status=row.status,
+                    createdAt=row.createdAt,
+                    updatedAt=row.updatedAt,
+                    customer=SimpleNamespace(
+                        name=getattr(row, 'customer_name', None),
+                        user=SimpleNamespace(
+                            discord=row.customer_discord
+                        )
+                    ),
+                    schedule=SimpleNamespace(
+                        startTime=row.startTime,
+                        endTime=row.endTime,
+                        partner=SimpleNamespace(
+                            name=getattr(row, 'partner_name', None),
+                            user=SimpleNamespace(
+                                discord=row.partner_discord
+                            )
+                        )
+                    ),
+                    isInstantBooking=getattr(row, 'is_instant_booking', None),
+                    discordDelayMinutes=getattr(row, 'discord_delay_minutes', None)
+                )
                 all_bookings.append(booking)
             
             # 處理即時預約
             instant_count = 0
             for row in instant_result_list:
                 instant_count += 1
-                booking = type('Booking', (), {
-                    'id': row.id,
-                    'customerId': row.customerId,
-                    'scheduleId': row.scheduleId,
-                    'status': row.status,
-                    'createdAt': row.createdAt,
-                    'updatedAt': row.updatedAt,
-                    'customer': type('Customer', (), {
-                        'name': getattr(row, 'customer_name', None),
-                        'user': type('User', (), {
-                            'discord': row.customer_discord
-                        })()
-                    })(),
-                    'schedule': type('Schedule', (), {
-                        'startTime': row.startTime,
-                        'endTime': row.endTime,
-                        'partner': type('Partner', (), {
-                            'name': getattr(row, 'partner_name', None),
-                            'user': type('User', (), {
-                                'discord': row.partner_discord
-                            })()
-                        })()
-                    })(),
-                    'isInstantBooking': getattr(row, 'is_instant_booking', None),
-                    'discordDelayMinutes': getattr(row, 'discord_delay_minutes', None)
-                })()
+                booking = SimpleNamespace(
+                    id=row.id,
+                    customerId=row.customerId,
+                    scheduleId=row.scheduleId,
+                    status=row.status,
+                    createdAt=row.createdAt,
+                    updatedAt=row.updatedAt,
+                    customer=SimpleNamespace(
+                        name=getattr(row, 'customer_name', None),
+                        user=SimpleNamespace(
+                            discord=row.customer_discord
+                        )
+                    ),
+                    schedule=SimpleNamespace(
+                        startTime=row.startTime,
+                        endTime=row.endTime,
+                        partner=SimpleNamespace(
+                            name=getattr(row, 'partner_name', None),
+                            user=SimpleNamespace(
+                                discord=row.partner_discord
+                            )
+                        )
+                    ),
+                    isInstantBooking=getattr(row, 'is_instant_booking', None),
+                    discordDelayMinutes=getattr(row, 'discord_delay_minutes', None)
+                )
                 all_bookings.append(booking)
             
             bookings = all_bookings
@@ -5563,7 +5735,7 @@ async def check_bookings():
                                 await asyncio.to_thread(extend_booking_time)
                                 
                                 # 更新 Discord 頻道名稱
-                                guild = bot.get_guild(GUILD_ID)
+                                guild = get_main_guild()
                                 if guild:
                                     # 更新文字頻道名稱
                                     if consecutive_booking.discordTextChannelId:
@@ -5586,10 +5758,7 @@ async def check_bookings():
                                             end_time_str = tw_end_time.strftime("%H:%M")
                                             
                                             # 使用連續預約的 ID 來生成一致的 cute_item
-                                            import hashlib
-                                            hash_obj = hashlib.md5(str(consecutive_booking.id).encode())
-                                            hash_hex = hash_obj.hexdigest()
-                                            cute_item = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+                                            cute_item = cute_item_for(str(consecutive_booking.id))
                                             
                                             new_text_name = f"📅{date_str} {start_time_str}-{end_time_str} {cute_item}"
                                             await text_channel.edit(name=new_text_name)
@@ -5616,10 +5785,7 @@ async def check_bookings():
                                             end_time_str = tw_end_time.strftime("%H:%M")
                                             
                                             # 使用連續預約的 ID 來生成一致的 cute_item
-                                            import hashlib
-                                            hash_obj = hashlib.md5(str(consecutive_booking.id).encode())
-                                            hash_hex = hash_obj.hexdigest()
-                                            cute_item = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+                                            cute_item = cute_item_for(str(consecutive_booking.id))
                                             
                                             new_voice_name = f"📅{date_str} {start_time_str}-{end_time_str} {cute_item}"
                                             await voice_channel.edit(name=new_voice_name)
@@ -5640,31 +5806,16 @@ async def check_bookings():
                             group_booking_id = booking.groupBookingId
                         else:
                             # 如果沒有 groupBookingId，嘗試通過 booking.id 查詢
-                            with Session() as s:
-                                result = s.execute(text("""
-                                    SELECT "groupBookingId" 
-                                    FROM "Booking" 
-                                    WHERE id = :booking_id
-                                """), {'booking_id': booking.id}).fetchone()
-                                if result and result[0]:
-                                    group_booking_id = result[0]
-                        
-                        # 如果找到 groupBookingId，檢查是否已經有語音頻道
-                        if group_booking_id:
-                            with Session() as s:
-                                existing = s.execute(text("""
-                                    SELECT "discordVoiceChannelId" 
-                                    FROM "GroupBooking" 
-                                    WHERE id = :group_id
-                                """), {'group_id': group_booking_id}).fetchone()
-                                
-                                if existing and existing[0]:
-                                    # 檢查頻道是否真的存在
-                                    guild = bot.get_guild(GUILD_ID)
-                                    if guild:
-                                        existing_channel = guild.get_channel(int(existing[0]))
-                                        if existing_channel:
-                                            continue
+                            def query_group_booking_id(booking_id):
+                                with Session() as s:
+                                    result = s.execute(text("""
+                                        SELECT "groupBookingId" 
+                                        FROM "Booking" 
+                                        WHERE id = :booking_id
+                                    """), {'booking_id': booking_id}).fetchone()
+                                    return result[0] if result else None
+                            
+                            group_booking_id = await asyncio.to_thread(query_group_booking_id, booking.id)
                         
                         partner_discords = [partner['discord'] for partner in booking.schedule.partners]
                         
@@ -5675,7 +5826,7 @@ async def check_bookings():
                         # 使用 groupBookingId 或 booking.id 作為群組ID
                         group_id_to_use = group_booking_id if group_booking_id else booking.id
                         
-                        # 創建多人開團語音頻道
+                        # 創建多人開團語音頻道（已有語音頻道時直接返回既有頻道，並會寫回 GroupBooking）
                         vc = await create_group_booking_voice_channel(
                             group_id_to_use,
                             customer_discord,
@@ -5689,18 +5840,6 @@ async def check_bookings():
                             # 如果頻道已存在，create_group_booking_voice_channel 會返回現有頻道但不打印
                             # 這裡只打印實際創建的情況
                             pass  # 頻道創建訊息已在 create_group_booking_voice_channel 中打印
-                            # 如果使用了 groupBookingId，更新資料庫
-                            if group_booking_id:
-                                with Session() as s:
-                                    s.execute(text("""
-                                        UPDATE "GroupBooking" 
-                                        SET "discordVoiceChannelId" = :channel_id
-                                        WHERE id = :group_id
-                                    """), {
-                                        'channel_id': str(vc.id),
-                                        'group_id': group_booking_id
-                                    })
-                                    s.commit()
                         else:
                             print(f"❌ 群組預約語音頻道創建失敗 (ID: {group_id_to_use})")
                         continue
@@ -5723,7 +5862,7 @@ async def check_bookings():
                         # ✅ 若已存在語音頻道，必須直接 return，不得再創建
                         if existing_channels and existing_channels[1]:
                             # 檢查頻道是否真的存在
-                            guild = bot.get_guild(GUILD_ID)
+                            guild = get_main_guild()
                             if guild:
                                 existing_voice_channel = guild.get_channel(int(existing_channels[1]))
                                 if existing_voice_channel:
@@ -5830,13 +5969,13 @@ async def check_bookings():
                     if customer_discord:
                         try:
                             # 🔥 不管 Discord 名稱有什麼特殊符號，都嘗試查找成員
-                            # 先嘗試作為 Discord ID 查找（如果是純數字且長度足夠）
-                            discord_id_clean = str(customer_discord).replace('.', '').replace('-', '') if isinstance(customer_discord, str) else str(customer_discord)
-                            if discord_id_clean.isdigit() and len(discord_id_clean) >= 17:
+                            # 先嘗試作為 Discord ID 查找（符合 SNOWFLAKE_RE 時）
+                            discord_id_clean = str(customer_discord)
+                            if SNOWFLAKE_RE.fullmatch(discord_id_clean):
                                 # 這是 Discord ID，直接查找
                                 customer_member = guild.get_member(int(discord_id_clean))
                                 if customer_member:
-                                    print(f"✅ 通過 Discord ID 找到顧客: {customer_member.name}")
+                                    logger.debug("✅ 通過 Discord ID 找到顧客: %s", customer_member.name)
                             else:
                                 # 這是用戶名（可能包含特殊符號），使用 find_member_by_discord_name 查找
                                 customer_member = find_member_by_discord_name(guild, str(customer_discord))
@@ -5846,7 +5985,7 @@ async def check_bookings():
                     
                     # 如果 Discord 字段找不到，再嘗試用用戶名查找
                     if not customer_member and customer_name:
-                        print(f"🔍 Discord 字段找不到，嘗試用用戶名查找顧客: '{customer_name}'")
+                        logger.debug("🔍 Discord 字段找不到，嘗試用用戶名查找顧客: '%s'", customer_name)
                         customer_member = find_member_by_discord_name(guild, customer_name)
                     
                     # 🔥 優先使用 Discord 字段查找夥伴（因為這是用戶在 Discord 中的實際用戶名）
@@ -5854,9 +5993,9 @@ async def check_bookings():
                     if partner_discord:
                         try:
                             # 🔥 不管 Discord 名稱有什麼特殊符號，都嘗試查找成員
-                            # 先嘗試作為 Discord ID 查找（如果是純數字且長度足夠）
-                            discord_id_clean = str(partner_discord).replace('.', '').replace('-', '') if isinstance(partner_discord, str) else str(partner_discord)
-                            if discord_id_clean.isdigit() and len(discord_id_clean) >= 17:
+                            # 先嘗試作為 Discord ID 查找（符合 SNOWFLAKE_RE 時）
+                            discord_id_clean = str(partner_discord)
+                            if SNOWFLAKE_RE.fullmatch(discord_id_clean):
                                 # 這是 Discord ID，直接查找
                                 partner_member = guild.get_member(int(discord_id_clean))
                             else:
@@ -5868,7 +6007,7 @@ async def check_bookings():
                     
                     # 如果 Discord 字段找不到，再嘗試用用戶名查找
                     if not partner_member and partner_name:
-                        print(f"🔍 Discord 字段找不到，嘗試用用戶名查找夥伴: {partner_name}")
+                        logger.debug("🔍 Discord 字段找不到，嘗試用用戶名查找夥伴: %s", partner_name)
                         partner_member = find_member_by_discord_name(guild, partner_name)
                     
                     # 如果還是找不到，輸出警告並嘗試最後的查找方式
@@ -5891,7 +6030,7 @@ async def check_bookings():
                                 if (member_name_clean == customer_name_clean or member_display_clean == customer_name_clean or
                                     customer_name_clean in member_name_clean or customer_name_clean in member_display_clean):
                                     customer_member = member
-                                    print(f"✅ 通過清理特殊字符匹配找到顧客: {member.name} (查詢: {customer_name})")
+                                    logger.debug("✅ 通過清理特殊字符匹配找到顧客: %s (查詢: %s)", member.name, customer_name)
                                     break
                     
                     if not partner_member:
@@ -5913,7 +6052,7 @@ async def check_bookings():
                                 if (member_name_clean == partner_name_clean or member_display_clean == partner_name_clean or
                                     partner_name_clean in member_name_clean or partner_name_clean in member_display_clean):
                                     partner_member = member
-                                    print(f"✅ 通過清理特殊字符匹配找到夥伴: {member.name} (查詢: {partner_name})")
+                                    logger.debug("✅ 通過清理特殊字符匹配找到夥伴: %s (查詢: %s)", member.name, partner_name)
                                     break
                     
                     # 🔥 即使找不到 Discord 成員，也繼續創建頻道（用戶可能尚未加入伺服器）
@@ -5947,10 +6086,7 @@ async def check_bookings():
                     is_chat_only = False
                     
                     # 🔥 使用 booking_id 的 hash 來確定性地選擇動物，確保文字和語音頻道使用相同的動物（與群組預約邏輯一致）
-                    import hashlib
-                    hash_obj = hashlib.md5(str(booking.id).encode())
-                    hash_hex = hash_obj.hexdigest()
-                    animal = CUTE_ITEMS[int(hash_hex[:2], 16) % len(CUTE_ITEMS)]
+                    animal = cute_item_for(str(booking.id))
                     cute_item = animal.split()[0] if animal else "🎀"
                     
                     # 🔥 創建頻道名稱（一般預約：使用日期時間格式）
@@ -5968,12 +6104,15 @@ async def check_bookings():
                         # 3. 至少完成一個實際 Discord 動作（如更新資料庫）
                         if customer_member and partner_member:
                             print(f"✅ 已存在相同名稱的文字頻道: {channel_name}，更新資料庫並標記為已處理")
-                            with Session() as update_s:
-                                update_s.execute(
-                                    text("UPDATE \"Booking\" SET \"discordTextChannelId\" = :channel_id WHERE id = :booking_id"),
-                                    {"channel_id": str(existing_channels[0].id), "booking_id": booking.id}
-                                )
-                                update_s.commit()
+                            def save_text_channel_id():
+                                with Session() as update_s:
+                                    update_s.execute(
+                                        text("UPDATE \"Booking\" SET \"discordTextChannelId\" = :channel_id WHERE id = :booking_id"),
+                                        {"channel_id": str(existing_channels[0].id), "booking_id": booking.id}
+                                    )
+                                    update_s.commit()
+                            
+                            await asyncio.to_thread(save_text_channel_id)
                             # 只有在成功更新資料庫且成員都存在時，才標記為 processed
                             continue
                         else:
@@ -5982,17 +6121,10 @@ async def check_bookings():
                             continue
                     
                     # 🔥 找到分類（與群組預約邏輯一致）
-                    category = discord.utils.get(guild.categories, name="Voice Channels")
+                    category = find_category(guild, VOICE_CATEGORY_NAMES)
                     if not category:
-                        category = discord.utils.get(guild.categories, name="語音頻道")
-                    if not category:
-                        category = discord.utils.get(guild.categories, name="語音")
-                    if not category:
-                        if guild.categories:
-                            category = guild.categories[0]
-                        else:
-                            print("❌ 找不到任何分類")
-                            continue
+                        print("❌ 找不到任何分類")
+                        continue
                     
                     # 🔥 設定權限（與群組預約邏輯一致）
                     overwrites = {
@@ -6021,16 +6153,19 @@ async def check_bookings():
                     
                     # 建立成功後，更新資料庫的文字頻道 ID（一般預約使用 discordTextChannelId）
                     try:
-                        with Session() as s:
-                            s.execute(
-                                text("""
-                                    UPDATE "Booking"
-                                    SET "discordTextChannelId" = :channel_id
-                                    WHERE id = :booking_id
-                                """),
-                                {"channel_id": str(text_channel.id), "booking_id": booking.id}
-                            )
-                            s.commit()
+                        def save_text_channel_id():
+                            with Session() as s:
+                                s.execute(
+                                    text("""
+                                        UPDATE "Booking"
+                                        SET "discordTextChannelId" = :channel_id
+                                        WHERE id = :booking_id
+                                    """),
+                                    {"channel_id": str(text_channel.id), "booking_id": booking.id}
+                                )
+                                s.commit()
+                        
+                        await asyncio.to_thread(save_text_channel_id)
                     except Exception as db_err:
                         print(f"❌ 一般預約 {booking.id} 保存文字頻道 ID 失敗: {db_err}")
                         continue
@@ -6108,40 +6243,9 @@ async def check_bookings():
                     # 🔥 發送歡迎訊息（一般預約格式）
                     await text_channel.send(embed=welcome_embed)
                     
-                    # 🔥 發送安全規範（與即時預約格式一致）
-                    safety_embed = discord.Embed(
-                        title="🎙️ 一般預約聊天頻道使用規範與警告",
-                        description="為了您的安全，請務必遵守以下規範：",
-                        color=0xff6b6b,
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    
-                    safety_embed.add_field(
-                        name="📌 頻道性質",
-                        value="此聊天頻道為【一般預約用途】。\n僅限遊戲討論、戰術交流、團隊協作使用。\n禁止任何涉及交易、暗示、或其他非遊戲用途的行為。",
-                        inline=False
-                    )
-                    
-                    safety_embed.add_field(
-                        name="⚠️ 使用規範（請務必遵守）",
-                        value="• 禁止挑釁、辱罵、騷擾他人，保持禮貌尊重\n"
-                              "• 禁止使用色情、暴力、血腥、歧視等不當言語或內容\n"
-                              "• 不得進行金錢交易、索取或提供個資（例如 LINE、IG、電話）\n"
-                              "• 不得錄音、偷拍或截圖他人對話，除非經雙方同意\n"
-                              "• 禁止惡意模仿或干擾他人聊天\n"
-                              "• 禁止使用變聲器或播放音效干擾頻道秩序",
-                        inline=False
-                    )
-                    
-                    safety_embed.add_field(
-                        name="🚨 警告事項",
-                        value="• 系統將隨機錄取部分聊天內容以進行安全稽核\n"
-                              "• 如被舉報違規，管理員可立即封鎖或禁言，不另行通知\n"
-                              "• 為了您的安全，禁止隨意透漏個人資訊，包括(身分證、住家地址、等等......)\n"
-                              "• 若你無法接受以上規範，請勿加入頻道",
-                        inline=False
-                    )
-                    
+                    # 🔥 發送安全規範（與即時預約格式一致；取用預先建好的模板，只補上時間戳）
+                    safety_embed = REGULAR_SAFETY_EMBED_TEMPLATE.copy()
+                    safety_embed.timestamp = datetime.now(timezone.utc)
                     await text_channel.send(embed=safety_embed)
                     
                     # 🔥 語音頻道將在預約開始前 5 分鐘創建（不在這裡創建）
@@ -6168,20 +6272,22 @@ async def check_bookings():
                                 print(f"⚡ 立即創建語音頻道（已超過開始前 3 分鐘）: 預約 {booking.id}")
                             
                             # 檢查預約狀態是否仍然是 CONFIRMED，以及是否已經創建過語音頻道
-                            with Session() as check_s:
-                                current_booking = check_s.execute(
-                                    text("SELECT status, \"discordVoiceChannelId\" FROM \"Booking\" WHERE id = :booking_id"),
-                                    {"booking_id": booking.id}
-                                ).fetchone()
-                                
-                                if not current_booking or current_booking.status != 'CONFIRMED':
-                                    print(f"⚠️ 預約 {booking.id} 狀態已改變，取消創建語音頻道")
-                                    return
-                                
-                                # 🔥 檢查是否已經創建過語音頻道，避免重複創建
-                                if current_booking.discordVoiceChannelId:
-                                    print(f"✅ 預約 {booking.id} 的語音頻道已存在，跳過創建")
-                                    return
+                            def query_booking_voice_state():
+                                with Session() as check_s:
+                                    return check_s.execute(
+                                        text("SELECT status, \"discordVoiceChannelId\" FROM \"Booking\" WHERE id = :booking_id"),
+                                        {"booking_id": booking.id}
+                                    ).fetchone()
+                            
+                            current_booking = await asyncio.to_thread(query_booking_voice_state)
+                            if not current_booking or current_booking.status != 'CONFIRMED':
+                                print(f"⚠️ 預約 {booking.id} 狀態已改變，取消創建語音頻道")
+                                return
+                            
+                            # 🔥 檢查是否已經創建過語音頻道，避免重複創建
+                            if current_booking.discordVoiceChannelId:
+                                print(f"✅ 預約 {booking.id} 的語音頻道已存在，跳過創建")
+                                return
                             
                             # 重新查找 Discord 成員（可能現在已經在伺服器中了）
                             customer_member_vc = None
@@ -6189,8 +6295,8 @@ async def check_bookings():
                             
                             if customer_discord:
                                 try:
-                                    if customer_discord.replace('.', '').replace('-', '').isdigit():
-                                        customer_member_vc = guild.get_member(int(float(customer_discord)))
+                                    if SNOWFLAKE_RE.fullmatch(customer_discord):
+                                        customer_member_vc = guild.get_member(int(customer_discord))
                                     else:
                                         customer_member_vc = find_member_by_discord_name(guild, customer_discord)
                                 except (ValueError, TypeError):
@@ -6198,8 +6304,8 @@ async def check_bookings():
                             
                             if partner_discord:
                                 try:
-                                    if partner_discord.replace('.', '').replace('-', '').isdigit():
-                                        partner_member_vc = guild.get_member(int(float(partner_discord)))
+                                    if SNOWFLAKE_RE.fullmatch(partner_discord):
+                                        partner_member_vc = guild.get_member(int(partner_discord))
                                     else:
                                         partner_member_vc = find_member_by_discord_name(guild, partner_discord)
                                 except (ValueError, TypeError):
@@ -6233,21 +6339,21 @@ async def check_bookings():
                             # 為顧客添加權限
                             if customer_member_vc:
                                 voice_overwrites[customer_member_vc] = discord.PermissionOverwrite(view_channel=True, connect=True, speak=True)
-                                print(f"✅ 為顧客 {customer_member_vc.name} 設置語音頻道權限")
+                                logger.debug("✅ 為顧客 %s 設置語音頻道權限", customer_member_vc.name)
                             else:
                                 print(f"⚠️ 未找到顧客成員，將創建匿名語音頻道")
                             
                             # 為夥伴添加權限
                             if partner_member_vc:
                                 voice_overwrites[partner_member_vc] = discord.PermissionOverwrite(view_channel=True, connect=True, speak=True)
-                                print(f"✅ 為夥伴 {partner_member_vc.name} 設置語音頻道權限")
+                                logger.debug("✅ 為夥伴 %s 設置語音頻道權限", partner_member_vc.name)
                             else:
                                 print(f"⚠️ 未找到夥伴成員，將創建匿名語音頻道")
                             
                             # 🔥 即使找不到成員，也要創建語音頻道（匿名頻道）
-                            print(f"🔍 準備創建語音頻道: {voice_channel_name}")
-                            print(f"   類別: {category.name if category else 'None'}")
-                            print(f"   權限覆蓋數量: {len(voice_overwrites)}")
+                            logger.debug("🔍 準備創建語音頻道: %s", voice_channel_name)
+                            logger.debug("   類別: %s", category.name if category else 'None')
+                            logger.debug("   權限覆蓋數量: %s", len(voice_overwrites))
                             
                             # 創建語音頻道
                             voice_channel = await guild.create_voice_channel(
@@ -6259,22 +6365,19 @@ async def check_bookings():
                             print(f"✅ 語音頻道已創建: {voice_channel.name} (ID: {voice_channel.id})")
                             
                             # 更新資料庫，保存語音頻道 ID
-                            with Session() as update_s:
-                                update_s.execute(
-                                    text("UPDATE \"Booking\" SET \"discordVoiceChannelId\" = :voice_channel_id WHERE id = :booking_id"),
-                                    {
-                                        "voice_channel_id": str(voice_channel.id),
-                                        "booking_id": booking.id
-                                    }
-                                )
-                                update_s.commit()
-                            
-                            # 🔥 判斷預約類型（檢查是否為即時預約）
-                            is_instant = getattr(booking, 'isInstantBooking', None) == 'true' or getattr(booking, 'isInstantBooking', None) == True
-                            booking_type = "即時預約" if is_instant else "一般預約"
-                            print(f"✅ 已為{booking_type} {booking.id} 創建語音頻道: {voice_channel_name}")
+                            def save_voice_channel_id():
+                                with Session() as update_s:
+                                    update_s.execute(
+                                        text("UPDATE \"Booking\" SET \"discordVoiceChannelId\" = :voice_channel_id WHERE id = :booking_id"),
+                                        {
+                                            "voice_channel_id": str(voice_channel.id),
+                                            "booking_id": booking.id
+                                        }
+                                    )
+                                    update_s.commit()
                             
-                            # 在文字頻道發送通知
+                            # 寫入語音頻道 ID 與在文字頻道發送通知互不相依，同時進行
+                            pending = [asyncio.to_thread(save_voice_channel_id)]
                             if text_channel:
                                 embed = discord.Embed(
                                     title="🎤 語音頻道已創建！",
@@ -6284,7 +6387,13 @@ async def check_bookings():
                                 )
                                 embed.add_field(name="⏰ 預約時長", value=f"{duration_minutes} 分鐘", inline=True)
                                 embed.add_field(name="🎤 語音頻道", value=f"{voice_channel.mention}", inline=True)
-                                await text_channel.send(embed=embed)
+                                pending.append(text_channel.send(embed=embed))
+                            await asyncio.gather(*pending)
+                            
+                            # 🔥 判斷預約類型（檢查是否為即時預約）
+                            is_instant = getattr(booking, 'isInstantBooking', None) == 'true' or getattr(booking, 'isInstantBooking', None) == True
+                            booking_type = "即時預約" if is_instant else "一般預約"
+                            print(f"✅ 已為{booking_type} {booking.id} 創建語音頻道: {voice_channel_name}")
                         except Exception as e:
                             print(f"❌ 創建語音頻道失敗: {e}")
                             import traceback
@@ -6294,7 +6403,7 @@ async def check_bookings():
                     # 🔥 避免重複啟動任務
                     if booking.id not in active_voice_channel_tasks:
                         active_voice_channel_tasks.add(booking.id)
-                        bot.loop.create_task(create_voice_channel_5min_before())
+                        create_background_task(create_voice_channel_5min_before())
                         # 🔥 減少日誌輸出
                         # print(f"🔍 語音頻道創建任務已啟動: 預約 {booking.id}")
                     
@@ -6304,7 +6413,7 @@ async def check_bookings():
                     # 🔥 避免重複啟動任務
                     if booking.id not in active_countdown_tasks:
                         active_countdown_tasks.add(booking.id)
-                        bot.loop.create_task(countdown_with_rating(
+                        create_background_task(countdown_with_rating(
                             None,  # vc_id（語音頻道尚未創建）
                             None,  # channel_name（語音頻道尚未創建）
                             text_channel, 
@@ -6353,7 +6462,7 @@ async def check_instant_booking_timing():
     await bot.wait_until_ready()
     
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             return
         
@@ -6372,13 +6481,7 @@ async def check_instant_booking_timing():
                     # 檢查 tenMinuteReminderShown 列是否存在
                     column_exists = False
                     try:
-                        result = session.execute(text("""
-                            SELECT column_name 
-                            FROM information_schema.columns 
-                            WHERE table_name='Booking' AND column_name='tenMinuteReminderShown'
-                        """))
-                        if result.fetchone():
-                            column_exists = True
+                        column_exists = booking_has_columns(session, 'tenMinuteReminderShown')
                     except:
                         pass
                     
@@ -6907,7 +7010,7 @@ async def check_instant_booking_timing():
                 
                 is_instant = getattr(booking, 'is_instant_booking', None) == 'true'
                 booking_type = "即時預約" if is_instant else "一般預約"
-                print(f"🔍 處理已結束的{booking_type}: {booking.id}, 結束時間: {booking.endTime}")
+                logger.debug("🔍 處理已結束的%s: %s, 結束時間: %s", booking_type, booking.id, booking.endTime)
                 
                 # 刪除語音頻道
                 if booking.discordVoiceChannelId:
@@ -6957,7 +7060,7 @@ async def check_instant_booking_timing():
                                     traceback.print_exc()
                             
                             # 啟動自動提交評價回饋任務
-                            bot.loop.create_task(auto_submit_rating_feedback())
+                            create_background_task(auto_submit_rating_feedback())
                         else:
                             print(f"⚠️ 預約 {booking.id} 已發送過評價系統，跳過")
                 
@@ -6994,7 +7097,7 @@ async def check_instant_booking_timing():
                 if completed_key in sent_reminders:
                     continue
                 
-                print(f"🔍 處理已結束的群組預約: {booking.id}, 結束時間: {booking.endTime}")
+                logger.debug("🔍 處理已結束的群組預約: %s, 結束時間: %s", booking.id, booking.endTime)
                 
                 # 刪除語音頻道
                 if booking.discordVoiceChannelId:
@@ -7184,7 +7287,7 @@ async def check_instant_booking_timing():
                 if completed_key in sent_reminders:
                     continue
                 
-                print(f"🔍 處理已結束的多人陪玩: {booking.id}, 結束時間: {booking.endTime}")
+                logger.debug("🔍 處理已結束的多人陪玩: %s, 結束時間: %s", booking.id, booking.endTime)
                 
                 # 刪除語音頻道
                 if booking.discordVoiceChannelId:
@@ -7247,7 +7350,7 @@ async def check_instant_booking_timing():
                                     print(f"⚠️ 自動清理多人陪玩評價頻道失敗: {e}")
                             
                             # 啟動自動清理任務
-                            bot.loop.create_task(auto_cleanup_rating_channel())
+                            create_background_task(auto_cleanup_rating_channel())
                         else:
                             print(f"⚠️ 多人陪玩 {booking.id} 已發送過評價系統，跳過")
                 
@@ -7330,8 +7433,6 @@ async def check_instant_booking_timing():
             except Exception:
                 pass
         
-        session.close()
-        
     except Exception:
         pass
 
@@ -7339,20 +7440,20 @@ async def check_instant_booking_timing():
 async def send_rating_to_admin(record_id, rating_data, user1_id, user2_id):
     """發送評價結果到管理員頻道"""
     try:
-        admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+        admin_channel = get_admin_channel()
         if not admin_channel:
             print(f"❌ 找不到管理員頻道 (ID: {ADMIN_CHANNEL_ID})")
             return
         
         # 獲取用戶資訊
         try:
-            from_user = await bot.fetch_user(int(rating_data['user1']))
+            from_user = await get_or_fetch_user(rating_data['user1'])
             from_user_display = from_user.display_name
         except:
             from_user_display = f"用戶 {rating_data['user1']}"
         
         try:
-            to_user = await bot.fetch_user(int(rating_data['user2']))
+            to_user = await get_or_fetch_user(rating_data['user2'])
             to_user_display = to_user.display_name
         except:
             to_user_display = f"用戶 {rating_data['user2']}"
@@ -7406,8 +7507,8 @@ async def send_rating_to_admin(record_id, rating_data, user1_id, user2_id):
         
         embed.set_footer(text="PeiPlay 評價系統")
         
-        await admin_channel.send(embed=embed)
-        print(f"✅ 評價已發送到管理員頻道: {from_user_display} → {to_user_display} ({rating_data['rating']}⭐)")
+        notify_admin(embed=embed)
+        print(f"✅ 評價已加入管理員通知佇列: {from_user_display} → {to_user_display} ({rating_data['rating']}⭐)")
         
     except Exception as e:
         print(f"❌ 發送評價到管理員頻道失敗: {e}")
@@ -7570,28 +7671,41 @@ class RatingCommentModal(Modal, title="匿名評分與留言"):
         self.add_item(self.comment)
 
     async def on_submit(self, interaction: discord.Interaction):
+        user_id = str(interaction.user.id)
+        marked = saved = False
         try:
-            print(f"🔍 收到評價提交: record_id={self.record_id}, rating={self.rating}, role={self.role}, comment={self.comment.value}")
+            logger.debug("🔍 收到評價提交: record_id=%s, rating=%s, role=%s, comment=%s", self.record_id, self.rating, self.role, self.comment.value)
             
-            # 使用新的 session 來避免連接問題
-            with Session() as s:
-                record = s.get(PairingRecord, self.record_id)
-                if not record:
-                    print(f"❌ 找不到配對記錄: {self.record_id}")
-                    await interaction.response.send_message("❌ 找不到配對記錄", ephemeral=True)
-                    return
-                
-                record.rating = self.rating
-                record.comment = str(self.comment.value) if self.comment.value else None
-                s.commit()
+            # 同一用戶對同一筆記錄只能評價一次（從其他按鈕再開一個表單也會被擋下）
+            if user_id in rating_submitted_users.get(self.record_id, ()):
+                await interaction.response.send_message("❗ 你已經評價過這次配對了。", ephemeral=True)
+                return
+            # 在第一個 await 之前標記，避免連點送出時兩個請求都通過檢查；寫入失敗再移除
+            rating_submitted_users.setdefault(self.record_id, set()).add(user_id)
+            marked = True
+            
+            # 單一 UPDATE ... RETURNING 完成寫入，不需先 SELECT 整筆記錄
+            def save_rating(record_id, rating, comment):
+                with Session() as s:
+                    row = s.execute(
+                        update(PairingRecord)
+                        .where(PairingRecord.id == record_id)
+                        .values(rating=rating, comment=comment)
+                        .returning(PairingRecord.id)
+                    ).first()
+                    s.commit()
+                    return row is not None
+            
+            comment_value = str(self.comment.value) if self.comment.value else None
+            if not await asyncio.to_thread(save_rating, self.record_id, self.rating, comment_value):
+                print(f"❌ 找不到配對記錄: {self.record_id}")
+                await interaction.response.send_message("❌ 找不到配對記錄", ephemeral=True)
+                return
+            saved = True
+            invalidate_pairing_stats(self.user1_id, self.user2_id)
             
             await interaction.response.send_message("✅ 感謝你的匿名評價！", ephemeral=True)
 
-            # 標記用戶已提交評價（統一使用字符串格式）
-            if self.record_id not in rating_submitted_users:
-                rating_submitted_users[self.record_id] = set()
-            rating_submitted_users[self.record_id].add(str(interaction.user.id))
-
             if self.record_id not in pending_ratings:
                 pending_ratings[self.record_id] = []
             
@@ -7609,7 +7723,6 @@ class RatingCommentModal(Modal, title="匿名評分與留言"):
             # 立即發送評價到管理員頻道
             await send_rating_to_admin(self.record_id, rating_data, self.user1_id, self.user2_id)
 
-            evaluated_records.add(self.record_id)
             print(f"✅ 評價流程完成")
             
             # 檢查是否所有用戶都已提交評價，如果是則刪除文字頻道
@@ -7642,6 +7755,7 @@ class RatingCommentModal(Modal, title="匿名評分與留言"):
                             # 清理追蹤
                             rating_text_channels.pop(self.record_id, None)
                             rating_channel_created_time.pop(self.record_id, None)
+                            rating_submitted_users.pop(self.record_id, None)
                     except Exception as e:
                         print(f"❌ 刪除文字頻道失敗: {e}")
         except Exception as e:
@@ -7652,88 +7766,190 @@ class RatingCommentModal(Modal, title="匿名評分與留言"):
                 await interaction.response.send_message("❌ 提交失敗，請稍後再試", ephemeral=True)
             except:
                 pass
+        finally:
+            # 沒有寫入成功就移除標記，讓用戶可以重新提交
+            if marked and not saved:
+                rating_submitted_users.get(self.record_id, set()).discard(user_id)
+
+# --- 手動配對（/createvc、/createvc-now）的評價按鈕 ---
+# 模組層級定義一次，不再於每次倒數結束時重新建立類別；與預約用的 RatingView 分開避免衝突
+class ManualRatingView(View):
+    def __init__(self, record_id, user1_id, user2_id):
+        super().__init__(timeout=600)  # 10分鐘超時
+        self.record_id = record_id
+        self.user1_id = user1_id  # 顧客 ID
+        self.user2_id = user2_id  # 夥伴 ID
+        self.selected_rating = 0
+        self.submitted = False
 
-# --- 延長按鈕 ---
-class Extend5MinView(View):
-    def __init__(self, booking_id, vc, channel_name, text_channel):
-        super().__init__(timeout=300)  # 5分鐘超時
-        self.booking_id = booking_id
-        self.vc = vc
-        # ✅ 修復：檢查 vc 是否存在再訪問 id 屬性
-        self.vc_id = vc.id if vc else None
-        self.channel_name = channel_name
-        self.text_channel = text_channel
-        self.extended = False  # 追蹤是否已延長
+    def get_user_role(self, user_id: str) -> str:
+        """根據用戶ID自動判斷身份"""
+        if str(user_id) == str(self.user1_id):
+            return 'customer'  # 顧客
+        elif str(user_id) == str(self.user2_id):
+            return 'partner'  # 夥伴
+        else:
+            return None
 
-    @discord.ui.button(label="⏰ 延長 5 分鐘", style=discord.ButtonStyle.success, custom_id="extend_5min")
-    async def extend_5_minutes(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.extended:
-            await interaction.response.send_message("❌ 已經延長過了，無法再次延長！", ephemeral=True)
-            return
-        
+    @discord.ui.button(label="☆ 1星", style=discord.ButtonStyle.secondary, row=0)
+    async def star1(self, interaction: discord.Interaction, button: Button):
+        await self.select_rating(interaction, 1)
+
+    @discord.ui.button(label="☆ 2星", style=discord.ButtonStyle.secondary, row=0)
+    async def star2(self, interaction: discord.Interaction, button: Button):
+        await self.select_rating(interaction, 2)
+
+    @discord.ui.button(label="☆ 3星", style=discord.ButtonStyle.secondary, row=0)
+    async def star3(self, interaction: discord.Interaction, button: Button):
+        await self.select_rating(interaction, 3)
+
+    @discord.ui.button(label="☆ 4星", style=discord.ButtonStyle.secondary, row=0)
+    async def star4(self, interaction: discord.Interaction, button: Button):
+        await self.select_rating(interaction, 4)
+
+    @discord.ui.button(label="☆ 5星", style=discord.ButtonStyle.secondary, row=0)
+    async def star5(self, interaction: discord.Interaction, button: Button):
+        await self.select_rating(interaction, 5)
+
+    @discord.ui.button(label="提交評價", style=discord.ButtonStyle.success, row=1)
+    async def submit_rating(self, interaction: discord.Interaction, button: Button):
         try:
-            # 更新資料庫中的預約結束時間
-            with Session() as s:
-                # 首先檢查是否是多人陪玩（MultiPlayerBooking 表的 ID）
-                multi_player_check = s.execute(text("""
-                    SELECT id FROM "MultiPlayerBooking" WHERE id = :booking_id
-                """), {"booking_id": self.booking_id}).fetchone()
-                
-                if multi_player_check:
-                    # 多人陪玩：直接更新 MultiPlayerBooking 表的 endTime
-                    s.execute(text("""
-                        UPDATE "MultiPlayerBooking" 
-                        SET "endTime" = "endTime" + INTERVAL '5 minutes'
-                        WHERE id = :booking_id
-                    """), {"booking_id": self.booking_id})
-                    print(f"✅ 已延長多人陪玩 {self.booking_id} 的結束時間 5 分鐘")
+            if self.submitted:
+                if not interaction.response.is_done():
+                    await interaction.response.send_message("❗ 已提交過評價。", ephemeral=True)
+                return
+
+            if self.selected_rating == 0:
+                if not interaction.response.is_done():
+                    await interaction.response.send_message("❗ 請先選擇評分（點擊星星）", ephemeral=True)
+                return
+
+            # 根據用戶ID自動判斷身份
+            user_role = self.get_user_role(str(interaction.user.id))
+            if not user_role:
+                if not interaction.response.is_done():
+                    await interaction.response.send_message("❗ 您不是此配對的參與者，無法提交評價", ephemeral=True)
+                return
+
+            if not interaction.response.is_done():
+                await interaction.response.send_modal(RatingCommentModal(self.record_id, self.selected_rating, user_role, self.user1_id, self.user2_id))
+            self.submitted = True
+        except Exception as e:
+            print(f"❌ 提交評價按鈕錯誤: {e}")
+
+    async def select_rating(self, interaction: discord.Interaction, rating: int):
+        try:
+            self.selected_rating = rating
+            stars = [
+                (self.star1, "1"),
+                (self.star2, "2"),
+                (self.star3, "3"),
+                (self.star4, "4"),
+                (self.star5, "5")
+            ]
+
+            for i, (star_button, num) in enumerate(stars, 1):
+                if i <= rating:
+                    star_button.style = discord.ButtonStyle.success
+                    # 更新 label，使用 ⭐ 表示已選擇
+                    star_button.label = f"⭐ {num}星"
                 else:
-                    # 檢查是否是群組預約（GroupBooking 表的 ID）
-                    group_booking_check = s.execute(text("""
-                        SELECT id FROM "GroupBooking" WHERE id = :booking_id
+                    star_button.style = discord.ButtonStyle.secondary
+                    # 更新 label，使用 ☆ 表示未選擇
+                    star_button.label = f"☆ {num}星"
+
+            if not interaction.response.is_done():
+                await interaction.response.edit_message(view=self)
+                await interaction.followup.send(f"✅ 已選擇 {rating} 星評分", ephemeral=True)
+        except Exception as e:
+            print(f"❌ 選擇評分錯誤: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+# --- 延長按鈕 ---
+class Extend5MinView(View):
+    def __init__(self, booking_id, vc, channel_name, text_channel):
+        super().__init__(timeout=300)  # 5分鐘超時
+        self.booking_id = booking_id
+        self.vc = vc
+        # ✅ 修復：檢查 vc 是否存在再訪問 id 屬性
+        self.vc_id = vc.id if vc else None
+        self.channel_name = channel_name
+        self.text_channel = text_channel
+        self.extended = False  # 追蹤是否已延長
+
+    @discord.ui.button(label="⏰ 延長 5 分鐘", style=discord.ButtonStyle.success, custom_id="extend_5min")
+    async def extend_5_minutes(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.extended:
+            await interaction.response.send_message("❌ 已經延長過了，無法再次延長！", ephemeral=True)
+            return
+        
+        try:
+            # 更新資料庫中的預約結束時間
+            def extend_booking_end_time():
+                with Session() as s:
+                    # 首先檢查是否是多人陪玩（MultiPlayerBooking 表的 ID）
+                    multi_player_check = s.execute(text("""
+                        SELECT id FROM "MultiPlayerBooking" WHERE id = :booking_id
                     """), {"booking_id": self.booking_id}).fetchone()
-                    
-                    if group_booking_check:
-                        # 群組預約：更新 GroupBooking 表的 endTime
+                
+                    if multi_player_check:
+                        # 多人陪玩：直接更新 MultiPlayerBooking 表的 endTime
                         s.execute(text("""
-                            UPDATE "GroupBooking" 
+                            UPDATE "MultiPlayerBooking" 
                             SET "endTime" = "endTime" + INTERVAL '5 minutes'
                             WHERE id = :booking_id
                         """), {"booking_id": self.booking_id})
-                        print(f"✅ 已延長群組預約 {self.booking_id} 的結束時間 5 分鐘")
+                        print(f"✅ 已延長多人陪玩 {self.booking_id} 的結束時間 5 分鐘")
                     else:
-                        # 單人預約：更新 Schedule 表的 endTime（通過 Booking 表找到 Schedule）
-                        booking_info = s.execute(text("""
-                            SELECT "scheduleId" FROM "Booking" WHERE id = :booking_id
+                        # 檢查是否是群組預約（GroupBooking 表的 ID）
+                        group_booking_check = s.execute(text("""
+                            SELECT id FROM "GroupBooking" WHERE id = :booking_id
                         """), {"booking_id": self.booking_id}).fetchone()
-                        
-                        if booking_info:
-                            s.execute(text("""
-                                UPDATE "Schedule" 
-                                SET "endTime" = "endTime" + INTERVAL '5 minutes'
-                                WHERE id = :schedule_id
-                            """), {"schedule_id": booking_info[0]})
-                            print(f"✅ 已延長單人預約 {self.booking_id} 的結束時間 5 分鐘")
-                        else:
-                            # 如果都找不到，嘗試直接更新 Schedule（向後兼容）
+                    
+                        if group_booking_check:
+                            # 群組預約：更新 GroupBooking 表的 endTime
                             s.execute(text("""
-                                UPDATE "Schedule" 
+                                UPDATE "GroupBooking" 
                                 SET "endTime" = "endTime" + INTERVAL '5 minutes'
-                                WHERE id = (
-                                    SELECT "scheduleId" FROM "Booking" WHERE id = :booking_id
-                                )
+                                WHERE id = :booking_id
                             """), {"booking_id": self.booking_id})
-                            print(f"⚠️ 未找到 booking 信息，使用預設方式延長 {self.booking_id}")
+                            print(f"✅ 已延長群組預約 {self.booking_id} 的結束時間 5 分鐘")
+                        else:
+                            # 單人預約：更新 Schedule 表的 endTime（通過 Booking 表找到 Schedule）
+                            booking_info = s.execute(text("""
+                                SELECT "scheduleId" FROM "Booking" WHERE id = :booking_id
+                            """), {"booking_id": self.booking_id}).fetchone()
+                        
+                            if booking_info:
+                                s.execute(text("""
+                                    UPDATE "Schedule" 
+                                    SET "endTime" = "endTime" + INTERVAL '5 minutes'
+                                    WHERE id = :schedule_id
+                                """), {"schedule_id": booking_info[0]})
+                                print(f"✅ 已延長單人預約 {self.booking_id} 的結束時間 5 分鐘")
+                            else:
+                                # 如果都找不到，嘗試直接更新 Schedule（向後兼容）
+                                s.execute(text("""
+                                    UPDATE "Schedule" 
+                                    SET "endTime" = "endTime" + INTERVAL '5 minutes'
+                                    WHERE id = (
+                                        SELECT "scheduleId" FROM "Booking" WHERE id = :booking_id
+                                    )
+                                """), {"booking_id": self.booking_id})
+                                print(f"⚠️ 未找到 booking 信息，使用預設方式延長 {self.booking_id}")
                 
-                s.commit()
+                    s.commit()
+            
+            await asyncio.to_thread(extend_booking_end_time)
             
             # 標記為已延長
             self.extended = True
             
             # 更新 active_voice_channels 中的剩餘時間（延長5分鐘 = 300秒）
             if hasattr(self, 'vc_id') and self.vc_id in active_voice_channels:
-                active_voice_channels[self.vc_id]['remaining'] += 300  # 延長5分鐘
-                active_voice_channels[self.vc_id]['extended'] += 1
+                extend_voice_channel(self.vc_id, 300)  # 延長5分鐘
                 # print(f"✅ 已更新 active_voice_channels 中的頻道 {self.vc_id}，延長5分鐘")
             
             # 更新按鈕狀態
@@ -7753,7 +7969,7 @@ class Extend5MinView(View):
             print(f"✅ 預約 {self.booking_id} 已延長 5 分鐘")
             
             # 重新啟動倒數計時，但這次是延長後的時間
-            bot.loop.create_task(
+            create_background_task(
                 countdown_with_rating_extended(
                     self.vc.id, self.channel_name, self.text_channel, 
                     self.vc, None, [], None, self.booking_id
@@ -7796,7 +8012,7 @@ class BookingRatingView(View):
         user_discord = interaction.user.name
         
         # 🔥 檢查是否為群組預約，如果是，檢查用戶是否是夥伴
-        try:
+        def query_group_partner_discords():
             with Session() as s:
                 # 檢查是否為群組預約
                 group_booking_check = s.execute(text("""
@@ -7805,55 +8021,59 @@ class BookingRatingView(View):
                     WHERE id = :booking_id
                 """), {"booking_id": self.booking_id}).fetchone()
                 
-                if group_booking_check:
-                    # 這是群組預約，檢查用戶是否是夥伴
-                    # 查詢該群組預約的所有夥伴 Discord ID
-                    partner_result = s.execute(text("""
-                        SELECT DISTINCT pu.discord as partner_discord
-                        FROM "GroupBooking" gb
-                        JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
-                        JOIN "Partner" p ON p.id = gbp."partnerId"
+                if not group_booking_check:
+                    return []
+                
+                # 這是群組預約，查詢該群組預約的所有夥伴 Discord ID
+                partner_result = s.execute(text("""
+                    SELECT DISTINCT pu.discord as partner_discord
+                    FROM "GroupBooking" gb
+                    JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
+                    JOIN "Partner" p ON p.id = gbp."partnerId"
+                    JOIN "User" pu ON pu.id = p."userId"
+                    WHERE gb.id = :group_booking_id
+                    AND gbp."partnerId" IS NOT NULL
+                """), {"group_booking_id": self.booking_id}).fetchall()
+                partner_discords = [row.partner_discord for row in partner_result if row.partner_discord]
+                
+                # 檢查發起者是否為夥伴
+                initiator_id = group_booking_check[1]
+                initiator_type = group_booking_check[2]
+                
+                if initiator_type == 'PARTNER':
+                    # 查詢發起者夥伴的 Discord ID
+                    initiator_partner_result = s.execute(text("""
+                        SELECT pu.discord as partner_discord
+                        FROM "Partner" p
                         JOIN "User" pu ON pu.id = p."userId"
-                        WHERE gb.id = :group_booking_id
-                        AND gbp."partnerId" IS NOT NULL
-                    """), {"group_booking_id": self.booking_id}).fetchall()
-                    
-                    # 檢查發起者是否為夥伴
-                    initiator_id = group_booking_check[1]
-                    initiator_type = group_booking_check[2]
-                    
-                    if initiator_type == 'PARTNER':
-                        # 查詢發起者夥伴的 Discord ID
-                        initiator_partner_result = s.execute(text("""
-                            SELECT pu.discord as partner_discord
-                            FROM "Partner" p
-                            JOIN "User" pu ON pu.id = p."userId"
-                            WHERE p.id = :initiator_id
-                        """), {"initiator_id": initiator_id}).fetchone()
-                        
-                        if initiator_partner_result:
-                            partner_discords = [row.partner_discord for row in partner_result if row.partner_discord]
-                            partner_discords.append(initiator_partner_result[0])
-                    else:
-                        partner_discords = [row.partner_discord for row in partner_result if row.partner_discord]
+                        WHERE p.id = :initiator_id
+                    """), {"initiator_id": initiator_id}).fetchone()
                     
-                    # 檢查當前用戶是否是夥伴
-                    user_discord_lower = user_discord.lower().strip()
-                    for partner_discord in partner_discords:
-                        if partner_discord:
-                            partner_discord_lower = partner_discord.lower().strip()
-                            # 支持多種匹配方式（與 find_member_by_discord_name 邏輯一致）
-                            if (user_discord_lower == partner_discord_lower or
-                                user_discord_lower.startswith(partner_discord_lower) or
-                                partner_discord_lower.startswith(user_discord_lower) or
-                                str(user_id) == partner_discord or
-                                partner_discord == str(user_id)):
-                                await interaction.response.send_message(
-                                    "❌ 夥伴不需要進行評價。評價系統僅供顧客使用。",
-                                    ephemeral=True
-                                )
-                                print(f"⚠️ 夥伴 {user_discord} 嘗試使用評價系統，已拒絕")
-                                return
+                    if initiator_partner_result:
+                        partner_discords.append(initiator_partner_result[0])
+                return partner_discords
+        
+        try:
+            # 先在執行緒中查完資料並關閉 session，再回應互動
+            partner_discords = await asyncio.to_thread(query_group_partner_discords)
+            
+            # 檢查當前用戶是否是夥伴
+            user_discord_lower = user_discord.lower().strip()
+            for partner_discord in partner_discords:
+                if partner_discord:
+                    partner_discord_lower = partner_discord.lower().strip()
+                    # 支持多種匹配方式（與 find_member_by_discord_name 邏輯一致）
+                    if (user_discord_lower == partner_discord_lower or
+                        user_discord_lower.startswith(partner_discord_lower) or
+                        partner_discord_lower.startswith(user_discord_lower) or
+                        str(user_id) == partner_discord or
+                        partner_discord == str(user_id)):
+                        await interaction.response.send_message(
+                            "❌ 夥伴不需要進行評價。評價系統僅供顧客使用。",
+                            ephemeral=True
+                        )
+                        print(f"⚠️ 夥伴 {user_discord} 嘗試使用評價系統，已拒絕")
+                        return
         except Exception as e:
             print(f"⚠️ 檢查用戶是否為夥伴時發生錯誤: {e}")
             # 如果檢查失敗，繼續執行（不阻擋評價）
@@ -7898,152 +8118,133 @@ class BookingRatingModal(discord.ui.Modal):
         
         # 獲取顧客和夥伴信息
         try:
-            # 重試機制處理資料庫連接問題
-            max_retries = 3
-            result = None
-            is_group_booking = False
-            
-            for attempt in range(max_retries):
-                try:
-                    with Session() as s:
-                        # 首先嘗試查詢一般預約（Booking 表）
-                        result = s.execute(text("""
-                            SELECT 
-                                c.name as customer_name, p.name as partner_name,
-                                cu.discord as customer_discord, pu.discord as partner_discord
-                            FROM "Booking" b
-                            JOIN "Schedule" s ON s.id = b."scheduleId"
-                            JOIN "Customer" c ON c.id = b."customerId"
-                            JOIN "User" cu ON cu.id = c."userId"
-                            JOIN "Partner" p ON p.id = s."partnerId"
-                            JOIN "User" pu ON pu.id = p."userId"
-                            WHERE b.id = :booking_id
+            def query_booking_or_save_group_review():
+                with Session() as s:
+                    # 首先嘗試查詢一般預約（Booking 表）
+                    result = s.execute(text("""
+                        SELECT 
+                            c.name as customer_name, p.name as partner_name,
+                            cu.discord as customer_discord, pu.discord as partner_discord
+                        FROM "Booking" b
+                        JOIN "Schedule" s ON s.id = b."scheduleId"
+                        JOIN "Customer" c ON c.id = b."customerId"
+                        JOIN "User" cu ON cu.id = c."userId"
+                        JOIN "Partner" p ON p.id = s."partnerId"
+                        JOIN "User" pu ON pu.id = p."userId"
+                        WHERE b.id = :booking_id
+                    """), {"booking_id": self.booking_id}).fetchone()
+                    
+                    # 如果找不到一般預約，嘗試查詢群組預約或多人陪玩
+                    if not result:
+                        # ✅ 檢查是否為群組預約或多人陪玩
+                        group_booking_check = s.execute(text("""
+                            SELECT id FROM "GroupBooking" WHERE id = :booking_id
                         """), {"booking_id": self.booking_id}).fetchone()
                         
-                        # 如果找不到一般預約，嘗試查詢群組預約或多人陪玩
-                        if not result:
-                            # ✅ 檢查是否為群組預約或多人陪玩
-                            group_booking_check = s.execute(text("""
-                                SELECT id FROM "GroupBooking" WHERE id = :booking_id
-                            """), {"booking_id": self.booking_id}).fetchone()
+                        multi_player_check = s.execute(text("""
+                            SELECT id FROM "MultiPlayerBooking" WHERE id = :booking_id
+                        """), {"booking_id": self.booking_id}).fetchone()
+                        
+                        is_multiplayer = bool(multi_player_check and not group_booking_check)
+                        
+                        if group_booking_check or multi_player_check:
+                            # 對於群組預約，使用 GroupBookingReview 的邏輯
+                            # ✅ 修正用戶查找：使用 normalize_discord_username 標準化 Discord 用戶名
+                            normalized_discord_name = normalize_discord_username(interaction.user.name)
+                            discord_id_str = str(interaction.user.id)
                             
-                            multi_player_check = s.execute(text("""
-                                SELECT id FROM "MultiPlayerBooking" WHERE id = :booking_id
-                            """), {"booking_id": self.booking_id}).fetchone()
+                            # 獲取用戶的 Customer ID
+                            # ✅ 使用改進的用戶查找邏輯（支持多種匹配方式）
+                            user_result = s.execute(text("""
+                                SELECT c.id FROM "Customer" c
+                                JOIN "User" u ON u.id = c."userId"
+                                WHERE u.discord = :discord_name 
+                                   OR u.discord = :normalized_name 
+                                   OR u.discord = :discord_id
+                                   OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:discord_name))
+                                   OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:normalized_name))
+                            """), {
+                                "discord_name": interaction.user.name,
+                                "normalized_name": normalized_discord_name,
+                                "discord_id": discord_id_str
+                            }).fetchone()
                             
-                            is_multiplayer = bool(multi_player_check and not group_booking_check)
+                            # 如果第一次查詢失敗，嘗試使用 Discord global_name
+                            if not user_result:
+                                global_name = getattr(interaction.user, 'global_name', None)
+                                if global_name:
+                                    user_result = s.execute(text("""
+                                        SELECT c.id FROM "Customer" c
+                                        JOIN "User" u ON u.id = c."userId"
+                                        WHERE u.discord = :global_name 
+                                           OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:global_name))
+                                    """), {
+                                        "global_name": global_name
+                                    }).fetchone()
                             
-                            if group_booking_check or multi_player_check:
-                                is_group_booking = True
-                                # 對於群組預約，使用 GroupBookingReview 的邏輯
-                                # ✅ 修正用戶查找：使用 normalize_discord_username 標準化 Discord 用戶名
-                                normalized_discord_name = normalize_discord_username(interaction.user.name)
-                                discord_id_str = str(interaction.user.id)
-                                
-                                # 獲取用戶的 Customer ID
-                                # ✅ 使用改進的用戶查找邏輯（支持多種匹配方式）
-                                user_result = s.execute(text("""
-                                    SELECT c.id FROM "Customer" c
-                                    JOIN "User" u ON u.id = c."userId"
-                                    WHERE u.discord = :discord_name 
-                                       OR u.discord = :normalized_name 
-                                       OR u.discord = :discord_id
-                                       OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:discord_name))
-                                       OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:normalized_name))
+                            if not user_result:
+                                # 如果找不到顧客記錄，嘗試使用 Discord ID 查找
+                                user_info = s.execute(text("""
+                                    SELECT id FROM "User"
+                                    WHERE discord = :discord_name OR discord = :normalized_name OR discord = :discord_id
                                 """), {
                                     "discord_name": interaction.user.name,
                                     "normalized_name": normalized_discord_name,
                                     "discord_id": discord_id_str
                                 }).fetchone()
                                 
-                                # 如果第一次查詢失敗，嘗試使用 Discord global_name
-                                if not user_result:
-                                    global_name = getattr(interaction.user, 'global_name', None)
-                                    if global_name:
-                                        user_result = s.execute(text("""
-                                            SELECT c.id FROM "Customer" c
-                                            JOIN "User" u ON u.id = c."userId"
-                                            WHERE u.discord = :global_name 
-                                               OR LOWER(TRIM(u.discord)) = LOWER(TRIM(:global_name))
-                                        """), {
-                                            "global_name": global_name
-                                        }).fetchone()
-                                
-                                if not user_result:
-                                    # 如果找不到顧客記錄，嘗試使用 Discord ID 查找
-                                    user_info = s.execute(text("""
-                                        SELECT id FROM "User"
-                                        WHERE discord = :discord_name OR discord = :normalized_name OR discord = :discord_id
-                                    """), {
-                                        "discord_name": interaction.user.name,
-                                        "normalized_name": normalized_discord_name,
-                                        "discord_id": discord_id_str
-                                    }).fetchone()
-                                    
-                                    if user_info:
-                                        user_id = user_info[0]
-                                        user_result = s.execute(text("""
-                                            SELECT id FROM "Customer" WHERE "userId" = :user_id
-                                        """), {"user_id": user_id}).fetchone()
-                                
-                                if not user_result:
-                                    await interaction.response.send_message("❌ 找不到您的用戶記錄，請聯繫管理員", ephemeral=True)
-                                    return
-                                
-                                reviewer_id = user_result[0]
-                                
-                                # 檢查是否已經評價過
-                                existing_review = s.execute(text("""
-                                    SELECT id FROM "GroupBookingReview" 
-                                    WHERE "groupBookingId" = :group_id AND "reviewerId" = :reviewer_id
-                                """), {
-                                    'group_id': self.booking_id,
-                                    'reviewer_id': reviewer_id
-                                }).fetchone()
-                                
-                                if existing_review:
-                                    await interaction.response.send_message("❌ 此群組預約已經評價過了。", ephemeral=True)
-                                    return
-                                
-                                # 創建群組預約評價記錄
-                                import uuid
-                                review_id = f"gbr_{uuid.uuid4().hex[:12]}"
-                                
-                                s.execute(text("""
-                                    INSERT INTO "GroupBookingReview" (id, "groupBookingId", "reviewerId", rating, comment, "createdAt")
-                                    VALUES (:id, :group_id, :reviewer_id, :rating, :comment, :created_at)
-                                """), {
-                                    "id": review_id,
-                                    "group_id": self.booking_id,
-                                    "reviewer_id": reviewer_id,
-                                    "rating": self.rating,
-                                    "comment": comment,
-                                    "created_at": datetime.now(timezone.utc)
-                                })
-                                s.commit()
-                                
-                                # ✅ 發送到管理員頻道：區分群組預約和多人陪玩
-                                # ✅ 多人陪玩顧客對多人陪玩的評價是對的，但本身本來就不需要分別對每一位夥伴評價，所以管理員頻道不需要回饋顧客對每一位或夥伴的評價
-                                if is_multiplayer:
-                                    # ✅ 多人陪玩：使用「多人陪玩」類型，只發送一個整體評價回饋（不對每一位夥伴發送）
-                                    await send_unified_rating_feedback(self.booking_id, "多人陪玩", self.rating, comment, interaction.user.name)
-                                else:
-                                    # 群組預約：使用「群組預約」類型
-                                    await send_group_rating_to_admin(self.booking_id, self.rating, comment, interaction.user.name)
-                                
-                                # 標記用戶已提交評價
-                                self.parent_view.submitted_users.add(interaction.user.id)
-                                
-                                # 確認收到評價
-                                await interaction.response.send_message(
-                                    f"✅ 感謝您的評價！\n"
-                                    f"評分：{'⭐' * self.rating}\n"
-                                    f"評論：{comment}",
-                                    ephemeral=True
-                                )
-                                return
-                        
-                        break  # 成功則跳出重試循環
+                                if user_info:
+                                    user_id = user_info[0]
+                                    user_result = s.execute(text("""
+                                        SELECT id FROM "Customer" WHERE "userId" = :user_id
+                                    """), {"user_id": user_id}).fetchone()
+                            
+                            if not user_result:
+                                return None, "❌ 找不到您的用戶記錄，請聯繫管理員", None
+                            
+                            reviewer_id = user_result[0]
+                            
+                            # 檢查是否已經評價過
+                            existing_review = s.execute(text("""
+                                SELECT id FROM "GroupBookingReview" 
+                                WHERE "groupBookingId" = :group_id AND "reviewerId" = :reviewer_id
+                            """), {
+                                'group_id': self.booking_id,
+                                'reviewer_id': reviewer_id
+                            }).fetchone()
+                            
+                            if existing_review:
+                                return None, "❌ 此群組預約已經評價過了。", None
+                            
+                            # 創建群組預約評價記錄
+                            review_id = f"gbr_{uuid.uuid4().hex[:12]}"
+                            
+                            s.execute(text("""
+                                INSERT INTO "GroupBookingReview" (id, "groupBookingId", "reviewerId", rating, comment, "createdAt")
+                                VALUES (:id, :group_id, :reviewer_id, :rating, :comment, :created_at)
+                            """), {
+                                "id": review_id,
+                                "group_id": self.booking_id,
+                                "reviewer_id": reviewer_id,
+                                "rating": self.rating,
+                                "comment": comment,
+                                "created_at": datetime.now(timezone.utc)
+                            })
+                            s.commit()
+                            return None, None, is_multiplayer
+                    
+                    return result, None, None
+            
+            # 重試機制處理資料庫連接問題
+            max_retries = 3
+            result = None
+            error_message = None
+            group_is_multiplayer = None
+            
+            for attempt in range(max_retries):
+                try:
+                    result, error_message, group_is_multiplayer = await asyncio.to_thread(query_booking_or_save_group_review)
+                    break  # 成功則跳出重試循環
                 except Exception as db_error:
                     print(f"❌ 資料庫查詢失敗 (嘗試 {attempt + 1}/{max_retries}): {db_error}")
                     if attempt < max_retries - 1:
@@ -8052,9 +8253,35 @@ class BookingRatingModal(discord.ui.Modal):
                     else:
                         raise db_error  # 最後一次嘗試失敗，拋出錯誤
                 
+            if error_message:
+                await interaction.response.send_message(error_message, ephemeral=True)
+                return
+            
+            if group_is_multiplayer is not None:
+                # ✅ 發送到管理員頻道：區分群組預約和多人陪玩
+                # ✅ 多人陪玩顧客對多人陪玩的評價是對的，但本身本來就不需要分別對每一位夥伴評價，所以管理員頻道不需要回饋顧客對每一位或夥伴的評價
+                if group_is_multiplayer:
+                    # ✅ 多人陪玩：使用「多人陪玩」類型，只發送一個整體評價回饋（不對每一位夥伴發送）
+                    await send_unified_rating_feedback(self.booking_id, "多人陪玩", self.rating, comment, interaction.user.name)
+                else:
+                    # 群組預約：使用「群組預約」類型
+                    await send_group_rating_to_admin(self.booking_id, self.rating, comment, interaction.user.name)
+                
+                # 標記用戶已提交評價
+                self.parent_view.submitted_users.add(interaction.user.id)
+                
+                # 確認收到評價
+                await interaction.response.send_message(
+                    f"✅ 感謝您的評價！\n"
+                    f"評分：{'⭐' * self.rating}\n"
+                    f"評論：{comment}",
+                    ephemeral=True
+                )
+                return
+            
             if result:
                 # 保存評價到資料庫 Review 表
-                try:
+                def save_booking_review():
                     with Session() as s:
                         # 根據提交評價的 Discord 用戶名，判斷是顧客還是夥伴
                         reviewer_discord_name = interaction.user.name
@@ -8064,7 +8291,7 @@ class BookingRatingModal(discord.ui.Modal):
                         reviewee_user_id = None
                         reviewer_name = None
                         reviewee_name = None
-                        
+                    
                         # 獲取 customer 和 partner 的 userId 和 Discord 名稱
                         user_result = s.execute(text("""
                             SELECT 
@@ -8078,17 +8305,17 @@ class BookingRatingModal(discord.ui.Modal):
                             JOIN "User" pu ON pu.id = p."userId"
                             WHERE b.id = :booking_id
                         """), {"booking_id": self.booking_id}).fetchone()
-                        
+                    
                         if user_result:
                             customer_user_id = user_result[0]
                             partner_user_id = user_result[1]
                             customer_discord = user_result[2]
                             partner_discord = user_result[3]
-                            
+                        
                             # 標準化資料庫中的 Discord 用戶名
                             customer_discord_normalized = normalize_discord_username(customer_discord) if customer_discord else ""
                             partner_discord_normalized = normalize_discord_username(partner_discord) if partner_discord else ""
-                            
+                        
                             # 判斷提交評價的用戶是顧客還是夥伴（使用標準化後的用戶名進行比較）
                             if customer_discord_normalized and reviewer_discord_name_normalized.lower() == customer_discord_normalized.lower():
                                 # 提交評價的是顧客，評價夥伴
@@ -8107,12 +8334,8 @@ class BookingRatingModal(discord.ui.Modal):
                                 print(f"❌ 用戶 {reviewer_discord_name} (標準化後: {reviewer_discord_name_normalized}) 不是此預約的顧客或夥伴，拒絕評價")
                                 print(f"   顧客 Discord: {customer_discord} (標準化後: {customer_discord_normalized})")
                                 print(f"   夥伴 Discord: {partner_discord} (標準化後: {partner_discord_normalized})")
-                                await interaction.response.send_message(
-                                    "❌ 您不是此預約的顧客或夥伴，無法提交評價。",
-                                    ephemeral=True
-                                )
-                                return
-                            
+                                return "❌ 您不是此預約的顧客或夥伴，無法提交評價。"
+                        
                             if reviewer_user_id and reviewee_user_id:
                                 # 檢查是否已經評價過
                                 existing_review = s.execute(text("""
@@ -8122,7 +8345,7 @@ class BookingRatingModal(discord.ui.Modal):
                                     "booking_id": self.booking_id,
                                     "reviewer_id": reviewer_user_id
                                 }).fetchone()
-                                
+                            
                                 if not existing_review:
                                     # 創建評價記錄
                                     review_id = f"rev_{int(time.time())}_{reviewer_user_id}"
@@ -8144,11 +8367,20 @@ class BookingRatingModal(discord.ui.Modal):
                                     print(f"⚠️ 評價已存在，跳過保存: {self.booking_id}")
                             else:
                                 print(f"❌ 無法確定評價者和被評價者: {self.booking_id}")
+                    return None
+                
+                rejection = None
+                try:
+                    rejection = await asyncio.to_thread(save_booking_review)
                 except Exception as db_error:
                     print(f"❌ 保存評價到資料庫失敗: {db_error}")
                     import traceback
                     traceback.print_exc()
                 
+                if rejection:
+                    await interaction.response.send_message(rejection, ephemeral=True)
+                    return
+                
                 # 標記用戶已提交評價
                 self.parent_view.submitted_users.add(interaction.user.id)
                 
@@ -8166,6 +8398,22 @@ class BookingRatingModal(discord.ui.Modal):
             await interaction.response.send_message("❌ 處理評價時發生錯誤，請稍後再試", ephemeral=True)
 
 
+def voice_channel_seconds_left(vc_data):
+    """活躍語音頻道的剩餘秒數：countdown 啟動後由截止時間即時計算，啟動前使用初始 remaining"""
+    if 'deadline' in vc_data:
+        return max(0, vc_data['deadline'] - time.monotonic())
+    return vc_data['remaining']
+
+def extend_voice_channel(vc_id, seconds):
+    """延長活躍語音頻道的時間，並喚醒正在等待截止時間的 countdown"""
+    vc_data = active_voice_channels[vc_id]
+    vc_data['extended'] += 1
+    if 'deadline' in vc_data:
+        vc_data['deadline'] += seconds
+        vc_data['extend_event'].set()
+    else:
+        vc_data['remaining'] += seconds
+
 class ExtendView(View):
     def __init__(self, vc_id):
         super().__init__(timeout=None)
@@ -8176,16 +8424,64 @@ class ExtendView(View):
         if self.vc_id not in active_voice_channels:
             await interaction.response.send_message("❗ 頻道資訊不存在或已刪除。", ephemeral=True)
             return
-        active_voice_channels[self.vc_id]['remaining'] += 300
-        active_voice_channels[self.vc_id]['extended'] += 1
+        extend_voice_channel(self.vc_id, 300)
         await interaction.response.send_message("⏳ 已延長 5 分鐘。", ephemeral=True)
 
+class CancelScheduledVCView(View):
+    """/createvc 排程訊息上的取消按鈕；只有建立排程的人可以取消，頻道開啟後按鈕自動失效"""
+    def __init__(self, schedule_id, owner_id, timeout):
+        super().__init__(timeout=timeout)
+        self.schedule_id = schedule_id
+        self.owner_id = owner_id
+
+    @discord.ui.button(label="❌ 取消排程", style=discord.ButtonStyle.danger)
+    async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("❗ 只有建立排程的人可以取消。", ephemeral=True)
+            return
+        handle = scheduled_vc_timers.pop(self.schedule_id, None)
+        if handle is None:
+            await interaction.response.send_message("❗ 頻道已開啟或排程已取消。", ephemeral=True)
+            return
+        handle.cancel()
+        self.stop()
+        await interaction.response.edit_message(content="🛑 已取消配對頻道排程。", view=None)
+
 # --- Bot 啟動 ---
+@bot.event
+async def setup_hook():
+    """連線前執行一次：設定有上限的預設線程池（asyncio.to_thread 的資料庫操作都在這裡執行）"""
+    # 線程數與連接池上限一致，避免線程排隊等待連接直到 pool_timeout
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=DB_POOL_SIZE + DB_MAX_OVERFLOW, thread_name_prefix="db")
+    )
+    # 佇列與號誌必須在 bot 的事件循環中建立；consumer 只啟動一次（on_ready 會在重新連線時重複觸發）
+    global admin_notification_queue, voice_move_semaphore, check_bookings_lock
+    admin_notification_queue = asyncio.Queue(maxsize=ADMIN_QUEUE_MAXSIZE)
+    voice_move_semaphore = asyncio.Semaphore(MOVE_CONCURRENCY)
+    check_bookings_lock = asyncio.Lock()
+    create_background_task(admin_notification_worker())
+
+synced_command_signature = None  # 上次同步到 Discord 的指令樹簽章
+
+def command_tree_signature(guild):
+    """計算指令樹的簽章（名稱、描述、參數），用來判斷是否需要重新同步"""
+    commands_spec = sorted(
+        (
+            cmd.qualified_name,
+            cmd.description,
+            [(p.name, p.description, p.required, str(p.type)) for p in getattr(cmd, 'parameters', [])]
+        )
+        for cmd in bot.tree.get_commands(guild=guild)
+    )
+    return hashlib.sha1(repr(commands_spec).encode()).hexdigest()
+
+
 @bot.event
 async def cleanup_duplicate_channels():
     """清理重複的頻道"""
     try:
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             return
         
@@ -8220,15 +8516,40 @@ async def cleanup_duplicate_channels():
 
 @bot.event
 async def on_ready():
+    global cached_admin_channel, cached_main_guild, cached_notification_channel, cached_channel_creation_channel
+    global synced_command_signature, pairing_sessions_resumed, pairing_sessions_enabled
     print(f"✅ Bot 已上線：{bot.user}")
+    # 重新連線後伺服器與頻道物件可能被替換，每次 on_ready 重新解析
+    cached_main_guild = bot.get_guild(GUILD_ID)
+    cached_admin_channel = bot.get_channel(ADMIN_CHANNEL_ID) if ADMIN_CHANNEL_ID else None
+    cached_notification_channel = bot.get_channel(BOOKING_NOTIFICATION_CHANNEL_ID)
+    cached_channel_creation_channel = bot.get_channel(CHANNEL_CREATION_CHANNEL_ID)
+    if cached_main_guild:
+        build_member_index(cached_main_guild)
     try:
-        guild = discord.Object(id=GUILD_ID)
-        synced = await bot.tree.sync(guild=guild)
-        print(f"✅ 已同步 {len(synced)} 個指令")
+        guild = GUILD_OBJ
+        # on_ready 在每次重新連線都會觸發；指令樹沒有變更時跳過同步（sync 是有速率限制的 API 呼叫）
+        signature = command_tree_signature(guild)
+        if signature != synced_command_signature:
+            synced = await bot.tree.sync(guild=guild)
+            synced_command_signature = signature
+            print(f"✅ 已同步 {len(synced)} 個指令")
         
         # 清理重複頻道
         await cleanup_duplicate_channels()
         
+        # 恢復重啟前進行中的配對倒數（重新連線時不重複執行）
+        if not pairing_sessions_resumed:
+            pairing_sessions_resumed = True
+            try:
+                pairing_sessions_enabled = await asyncio.to_thread(pairing_record_has_session_columns)
+            except Exception as e:
+                print(f"⚠️ 檢查配對記錄欄位失敗: {e}")
+            if pairing_sessions_enabled:
+                await resume_pairing_sessions()
+            else:
+                print("⚠️ PairingRecord 缺少 endTime/voiceChannelId/textChannelId 欄位（請執行 add_pairing_record_session_columns.sql），重啟後將不恢復配對倒數")
+        
         # 啟動自動檢查任務（檢查是否已在運行，避免重複啟動）
         if not check_group_and_multiplayer_text_channels.is_running():
             check_group_and_multiplayer_text_channels.start()
@@ -8257,16 +8578,48 @@ async def on_ready():
     except Exception as e:
         print(f"❌ 啟動錯誤: {e}")
 
+# --- 成員名稱索引維護 ---
+@bot.event
+async def on_member_join(member):
+    index_member(member)
+
+@bot.event
+async def on_member_remove(member):
+    unindex_member(member)
+
 @bot.event
-async def on_message(message):
-    if message.author == bot.user:
+async def on_member_update(before, after):
+    # 暱稱變更會改變顯示名稱
+    if before.display_name != after.display_name:
+        unindex_member(before)
+        index_member(after)
+
+@bot.event
+async def on_user_update(before, after):
+    # 使用者名稱 / 全域顯示名稱變更：更新所在伺服器的索引
+    if before.name == after.name and before.display_name == after.display_name:
         return
-    
-    # 評價系統現在使用按鈕和模態對話框，不需要處理文字訊息
-    
-    if message.content == "!ping":
-        await message.channel.send("Pong!")
-    await bot.process_commands(message)
+    guild = get_main_guild()
+    member = guild.get_member(after.id) if guild else None
+    if member:
+        unindex_member(before, guild)
+        index_member(member)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    # 快取的通知頻道被刪除時清除快取，下次使用時重新查詢（分類快取由 find_category 自行驗證）
+    global cached_admin_channel, cached_notification_channel, cached_channel_creation_channel
+    if cached_admin_channel is not None and cached_admin_channel.id == channel.id:
+        cached_admin_channel = None
+    if cached_notification_channel is not None and cached_notification_channel.id == channel.id:
+        cached_notification_channel = None
+    if cached_channel_creation_channel is not None and cached_channel_creation_channel.id == channel.id:
+        cached_channel_creation_channel = None
+
+# 評價系統使用按鈕和模態對話框，不需要處理文字訊息
+@bot.tree.command(name="ping", description="檢查 bot 是否在線", guild=GUILD_OBJ)
+async def ping(interaction: discord.Interaction):
+    await interaction.response.send_message("Pong!")
 
 @bot.event
 async def on_voice_state_update(member, before, after):
@@ -8282,9 +8635,7 @@ async def on_voice_state_update(member, before, after):
             # 獲取或創建分類
             category = after.channel.category
             if not category:
-                category = discord.utils.get(guild.categories, name="語音頻道")
-            if not category:
-                category = discord.utils.get(guild.categories, name="Voice Channels")
+                category = find_category(guild, ("語音頻道", "Voice Channels"), fallback_first=False)
             
             # 創建臨時語音頻道
             channel_name = f"{member.display_name} 的頻道"
@@ -8305,7 +8656,7 @@ async def on_voice_state_update(member, before, after):
             
             # 移動用戶到新創建的頻道
             try:
-                await member.move_to(new_channel)
+                await move_member(member, new_channel)
                 print(f"✅ 已為 {member.display_name} 創建臨時語音頻道: {channel_name}")
             except Exception as e:
                 print(f"⚠️ 移動用戶到新頻道失敗: {e}")
@@ -8320,52 +8671,56 @@ async def on_voice_state_update(member, before, after):
 # --- 倒數邏輯 ---
 async def countdown_with_rating(vc_id, channel_name, text_channel, vc, mentioned, members, record_id, booking_id):
     """倒數計時函數，包含評價系統（與群組預約邏輯一致）"""
-    try:
-        # 🔥 如果 text_channel 為 None，從資料庫讀取文字頻道 ID
-        if not text_channel:
-            with Session() as s:
-                result = s.execute(text("""
-                    SELECT "discordTextChannelId" 
-                    FROM "Booking" 
-                    WHERE id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
-                
-                if result and result[0]:
-                    guild = bot.get_guild(GUILD_ID)
-                    if guild:
-                        text_channel = guild.get_channel(int(result[0]))
-                        if text_channel:
-                            print(f"✅ 從資料庫讀取文字頻道: {text_channel.name} (預約 {booking_id})")
-                        else:
-                            print(f"⚠️ 無法找到文字頻道 ID {result[0]} (預約 {booking_id})")
-                else:
-                    print(f"⚠️ 預約 {booking_id} 沒有文字頻道 ID，無法啟動倒數計時")
-                    return
-        
-        # 計算預約結束時間
-        now = datetime.now(timezone.utc)
-        
-        # 從資料庫獲取預約開始和結束時間（用於計算總時長）
+    def query_channel_ids():
         with Session() as s:
-            result = s.execute(text("""
+            return s.execute(text("""
+                SELECT "discordTextChannelId", "discordVoiceChannelId" 
+                FROM "Booking" 
+                WHERE id = :booking_id
+            """), {"booking_id": booking_id}).fetchone()
+    
+    def query_booking_times():
+        with Session() as s:
+            return s.execute(text("""
                 SELECT s."startTime", s."endTime" 
                 FROM "Booking" b
                 JOIN "Schedule" s ON s.id = b."scheduleId"
                 WHERE b.id = :booking_id
             """), {"booking_id": booking_id}).fetchone()
-            
-            if not result:
-                print(f"❌ 找不到預約 {booking_id} 的結束時間")
+    
+    try:
+        # 🔥 如果 text_channel 為 None，從資料庫讀取文字頻道 ID
+        if not text_channel:
+            result = await asyncio.to_thread(query_channel_ids)
+            if result and result[0]:
+                guild = get_main_guild()
+                if guild:
+                    text_channel = guild.get_channel(int(result[0]))
+                    if text_channel:
+                        print(f"✅ 從資料庫讀取文字頻道: {text_channel.name} (預約 {booking_id})")
+                    else:
+                        print(f"⚠️ 無法找到文字頻道 ID {result[0]} (預約 {booking_id})")
+            else:
+                print(f"⚠️ 預約 {booking_id} 沒有文字頻道 ID，無法啟動倒數計時")
                 return
-                
-            start_time = result[0]
-            end_time = result[1]
-            
-            # 處理時區：確保時間有時區信息
-            if start_time.tzinfo is None:
-                start_time = start_time.replace(tzinfo=timezone.utc)
-            if end_time.tzinfo is None:
-                end_time = end_time.replace(tzinfo=timezone.utc)
+        
+        # 計算預約結束時間
+        now = datetime.now(timezone.utc)
+        
+        # 從資料庫獲取預約開始和結束時間（用於計算總時長）
+        result = await asyncio.to_thread(query_booking_times)
+        if not result:
+            print(f"❌ 找不到預約 {booking_id} 的結束時間")
+            return
+        
+        start_time = result[0]
+        end_time = result[1]
+        
+        # 處理時區：確保時間有時區信息
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        if end_time.tzinfo is None:
+            end_time = end_time.replace(tzinfo=timezone.utc)
         
         # 計算預約總時長（秒）
         total_duration_seconds = int((end_time - start_time).total_seconds())
@@ -8377,11 +8732,11 @@ async def countdown_with_rating(vc_id, channel_name, text_channel, vc, mentioned
         # 🔥 只在第一次啟動時輸出日誌，避免重複輸出
         # 使用函數屬性來追蹤已啟動的倒計時
         if not hasattr(countdown_with_rating, '_started_bookings'):
-            countdown_with_rating._started_bookings = set()
+            countdown_with_rating._started_bookings = BoundedSet()
         
         if booking_id not in countdown_with_rating._started_bookings:
             countdown_with_rating._started_bookings.add(booking_id)
-            print(f"🔍 預約倒數計時開始: {booking_id} (總時長: {total_duration_minutes:.1f} 分鐘, 剩餘: {remaining_seconds / 60:.1f} 分鐘)")
+            logger.debug("🔍 預約倒數計時開始: %s (總時長: %.1f 分鐘, 剩餘: %.1f 分鐘)", booking_id, total_duration_minutes, remaining_seconds / 60)
         
         if remaining_seconds <= 0:
             print(f"⏰ 預約 {booking_id} 已結束")
@@ -8402,8 +8757,8 @@ async def countdown_with_rating(vc_id, channel_name, text_channel, vc, mentioned
                 await text_channel.send(embed=embed)
                 print(f"✅ 已發送預約10分鐘提醒: {booking_id}")
                 
-                # 等待剩餘的10分鐘
-                remaining_seconds = 600
+                # 以結束時間重新計算剩餘秒數（扣除發送訊息耗費的時間，避免誤差累積）
+                remaining_seconds = int((end_time - datetime.now(timezone.utc)).total_seconds())
             
             # 5分鐘提醒：只有在總時長超過5分鐘，且剩餘時間超過5分鐘時才發送
             if total_duration_seconds > 300 and remaining_seconds > 300:  # 總時長和剩餘時間都超過5分鐘
@@ -8414,8 +8769,7 @@ async def countdown_with_rating(vc_id, channel_name, text_channel, vc, mentioned
                 await send_5min_reminder(text_channel, booking_id, vc, channel_name)
                 print(f"✅ 已發送預約5分鐘提醒: {booking_id}")
                 
-                # 等待剩餘的5分鐘
-                remaining_seconds = 300
+                remaining_seconds = int((end_time - datetime.now(timezone.utc)).total_seconds())
             
             # 1分鐘提醒：只有在總時長超過1分鐘，且剩餘時間超過1分鐘時才發送
             if total_duration_seconds > 60 and remaining_seconds > 60:  # 總時長和剩餘時間都超過1分鐘
@@ -8426,8 +8780,7 @@ async def countdown_with_rating(vc_id, channel_name, text_channel, vc, mentioned
                 await text_channel.send("⏰ 預約還有 1 分鐘結束！")
                 print(f"✅ 已發送預約1分鐘提醒: {booking_id}")
                 
-                # 等待剩餘的1分鐘
-                remaining_seconds = 60
+                remaining_seconds = int((end_time - datetime.now(timezone.utc)).total_seconds())
             
             # 等待到結束時間
             if remaining_seconds > 0:
@@ -8436,17 +8789,11 @@ async def countdown_with_rating(vc_id, channel_name, text_channel, vc, mentioned
         # 預約時間結束，關閉語音頻道
         # 🔥 如果語音頻道尚未創建（vc 為 None），從資料庫讀取
         if not vc:
-            with Session() as s:
-                result = s.execute(text("""
-                    SELECT "discordVoiceChannelId" 
-                    FROM "Booking" 
-                    WHERE id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
-                
-                if result and result[0]:
-                    guild = bot.get_guild(GUILD_ID)
-                    if guild:
-                        vc = guild.get_channel(int(result[0]))
+            result = await asyncio.to_thread(query_channel_ids)
+            if result and result[1]:
+                guild = get_main_guild()
+                if guild:
+                    vc = guild.get_channel(int(result[1]))
         
         try:
             if vc:
@@ -8520,52 +8867,16 @@ async def send_5min_reminder(text_channel, booking_id, vc, channel_name):
 
 async def submit_auto_rating(booking_id: str, text_channel):
     """10分鐘後自動提交未完成的評價（使用統一格式）"""
-    try:
-        # 檢查是否已經發送過評價回饋（確保每個預約只發送一條）
-        with Session() as s_check:
-            booking_check = s_check.execute(text("""
-                SELECT "ratingCompleted" FROM "Booking" WHERE id = :booking_id
-            """), {"booking_id": booking_id}).fetchone()
-            
-            if booking_check and booking_check[0]:
-                print(f"⚠️ 預約 {booking_id} 已發送過評價回饋，跳過")
-                return
-        
-        # 確定預約類型
+    def query_booking_info():
         with Session() as s:
             # ✅ 修復：isInstantBooking 欄位不存在，應該從 paymentInfo JSON 中獲取
-            booking_info = s.execute(text("""
-                SELECT b."serviceType", b."paymentInfo"->>'isInstantBooking' as is_instant_booking, b."multiPlayerBookingId"
+            return s.execute(text("""
+                SELECT b."ratingCompleted", b."serviceType", b."paymentInfo"->>'isInstantBooking' as is_instant_booking, b."multiPlayerBookingId"
                 FROM "Booking" b
                 WHERE b.id = :booking_id
             """), {"booking_id": booking_id}).fetchone()
-            
-            if not booking_info:
-                print(f"❌ 找不到預約 {booking_id} 的記錄")
-                return
-            
-            service_type = booking_info[0]
-            is_instant = booking_info[1] == 'true' or booking_info[1] is True
-            multi_player_id = booking_info[2]
-            
-            # 確定預約類型和實際的預約ID
-            if multi_player_id:
-                booking_type = "多人陪玩"
-                actual_booking_id = multi_player_id  # 使用 MultiPlayerBooking 的 ID
-            elif service_type == "CHAT_ONLY":
-                booking_type = "純聊天"
-                actual_booking_id = booking_id
-            elif is_instant:
-                booking_type = "即時預約"
-                actual_booking_id = booking_id
-            else:
-                booking_type = "一般預約"
-                actual_booking_id = booking_id
-        
-        # 使用統一格式發送評價回饋
-        await send_unified_rating_feedback(actual_booking_id, booking_type)
-        
-        # 標記已發送評價回饋
+    
+    def mark_rating_completed():
         with Session() as s_update:
             s_update.execute(text("""
                 UPDATE "Booking" 
@@ -8573,6 +8884,42 @@ async def submit_auto_rating(booking_id: str, text_channel):
                 WHERE id = :booking_id
             """), {"booking_id": booking_id})
             s_update.commit()
+    
+    try:
+        booking_info = await asyncio.to_thread(query_booking_info)
+        if not booking_info:
+            print(f"❌ 找不到預約 {booking_id} 的記錄")
+            return
+        
+        # 檢查是否已經發送過評價回饋（確保每個預約只發送一條）
+        if booking_info[0]:
+            print(f"⚠️ 預約 {booking_id} 已發送過評價回饋，跳過")
+            return
+        
+        # 確定預約類型
+        service_type = booking_info[1]
+        is_instant = booking_info[2] == 'true' or booking_info[2] is True
+        multi_player_id = booking_info[3]
+        
+        # 確定預約類型和實際的預約ID
+        if multi_player_id:
+            booking_type = "多人陪玩"
+            actual_booking_id = multi_player_id  # 使用 MultiPlayerBooking 的 ID
+        elif service_type == "CHAT_ONLY":
+            booking_type = "純聊天"
+            actual_booking_id = booking_id
+        elif is_instant:
+            booking_type = "即時預約"
+            actual_booking_id = booking_id
+        else:
+            booking_type = "一般預約"
+            actual_booking_id = booking_id
+        
+        # 使用統一格式發送評價回饋
+        await send_unified_rating_feedback(actual_booking_id, booking_type)
+        
+        # 標記已發送評價回饋
+        await asyncio.to_thread(mark_rating_completed)
         
         # 在文字頻道發送通知
         await text_channel.send(
@@ -8587,9 +8934,35 @@ async def submit_auto_rating(booking_id: str, text_channel):
 
 async def countdown_with_rating_extended(vc_id, channel_name, text_channel, vc, mentioned, members, record_id, booking_id):
     """延長後的倒數計時函數，包含評價系統"""
+    def query_booking_kind_and_end_time():
+        """判斷預約類型（多人陪玩 / 群組預約 / 單人預約）並取得延長後的結束時間"""
+        with Session() as s:
+            # 首先檢查是否是多人陪玩
+            multi_player_result = s.execute(text("""
+                SELECT "endTime" FROM "MultiPlayerBooking" WHERE id = :booking_id
+            """), {"booking_id": booking_id}).fetchone()
+            if multi_player_result:
+                return "multi_player", multi_player_result[0]
+            
+            # 檢查是否是群組預約
+            group_booking_result = s.execute(text("""
+                SELECT "endTime" FROM "GroupBooking" WHERE id = :booking_id
+            """), {"booking_id": booking_id}).fetchone()
+            if group_booking_result:
+                return "group", group_booking_result[0]
+            
+            # 單人預約：從 Booking 和 Schedule 表查詢
+            result = s.execute(text("""
+                SELECT s."endTime" 
+                FROM "Booking" b
+                JOIN "Schedule" s ON s.id = b."scheduleId"
+                WHERE b.id = :booking_id
+            """), {"booking_id": booking_id}).fetchone()
+            return "single", result[0] if result else None
+    
     try:
         # 獲取 guild 對象
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         if not guild:
             print(f"❌ 找不到 Guild ID: {GUILD_ID}")
             return
@@ -8598,39 +8971,13 @@ async def countdown_with_rating_extended(vc_id, channel_name, text_channel, vc,
         now = datetime.now(timezone.utc)
         
         # 從資料庫獲取延長後的預約結束時間
-        with Session() as s:
-            # 首先檢查是否是多人陪玩
-            multi_player_result = s.execute(text("""
-                SELECT "endTime" FROM "MultiPlayerBooking" WHERE id = :booking_id
-            """), {"booking_id": booking_id}).fetchone()
-            
-            if multi_player_result:
-                end_time = multi_player_result[0]
-            else:
-                # 檢查是否是群組預約
-                group_booking_result = s.execute(text("""
-                    SELECT "endTime" FROM "GroupBooking" WHERE id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
-                
-                if group_booking_result:
-                    end_time = group_booking_result[0]
-                else:
-                    # 單人預約：從 Booking 和 Schedule 表查詢
-                    result = s.execute(text("""
-                        SELECT s."endTime" 
-                        FROM "Booking" b
-                        JOIN "Schedule" s ON s.id = b."scheduleId"
-                        WHERE b.id = :booking_id
-                    """), {"booking_id": booking_id}).fetchone()
-                    
-                    if not result:
-                        print(f"❌ 找不到預約 {booking_id} 的結束時間")
-                        return
-                    
-                    end_time = result[0]
-            
-            if end_time.tzinfo is None:
-                end_time = end_time.replace(tzinfo=timezone.utc)
+        booking_kind, end_time = await asyncio.to_thread(query_booking_kind_and_end_time)
+        if end_time is None:
+            print(f"❌ 找不到預約 {booking_id} 的結束時間")
+            return
+        
+        if end_time.tzinfo is None:
+            end_time = end_time.replace(tzinfo=timezone.utc)
         
         # 計算等待時間（延長後的時間）
         wait_seconds = (end_time - now).total_seconds()
@@ -8648,111 +8995,99 @@ async def countdown_with_rating_extended(vc_id, channel_name, text_channel, vc,
         
         # 檢查是否已經發送過評價系統
         if booking_id not in rating_sent_bookings:
-            # 判斷預約類型並使用對應的評價系統
-            with Session() as s:
-                # 檢查是否是多人陪玩
-                multi_player_check = s.execute(text("""
-                    SELECT id FROM "MultiPlayerBooking" WHERE id = :booking_id
-                """), {"booking_id": booking_id}).fetchone()
+            # 依預約類型使用對應的評價系統
+            if booking_kind == "multi_player":
+                # 多人陪玩：使用群組評價系統
+                # 獲取參與者列表
+                def get_multi_player_members(mpb_id):
+                    with Session() as s_members:
+                        result = s_members.execute(text("""
+                            SELECT DISTINCT
+                                cu.discord as customer_discord,
+                                pu.discord as partner_discord
+                            FROM "MultiPlayerBooking" mpb
+                            JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
+                            JOIN "Customer" c ON c.id = b."customerId"
+                            JOIN "User" cu ON cu.id = c."userId"
+                            JOIN "Schedule" s ON s.id = b."scheduleId"
+                            JOIN "Partner" p ON p.id = s."partnerId"
+                            JOIN "User" pu ON pu.id = p."userId"
+                            WHERE mpb.id = :mpb_id
+                            AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')
+                        """), {"mpb_id": mpb_id}).fetchall()
+                        
+                        members = []
+                        for row in result:
+                            if row.customer_discord:
+                                members.append(row.customer_discord)
+                            if row.partner_discord:
+                                members.append(row.partner_discord)
+                        return list(set(members))
                 
-                if multi_player_check:
-                    # 多人陪玩：使用群組評價系統
-                    # 獲取參與者列表
-                    def get_multi_player_members(mpb_id):
-                        with Session() as s_members:
-                            result = s_members.execute(text("""
-                                SELECT DISTINCT
-                                    cu.discord as customer_discord,
-                                    pu.discord as partner_discord
-                                FROM "MultiPlayerBooking" mpb
-                                JOIN "Booking" b ON b."multiPlayerBookingId" = mpb.id
-                                JOIN "Customer" c ON c.id = b."customerId"
-                                JOIN "User" cu ON cu.id = c."userId"
-                                JOIN "Schedule" s ON s.id = b."scheduleId"
-                                JOIN "Partner" p ON p.id = s."partnerId"
-                                JOIN "User" pu ON pu.id = p."userId"
-                                WHERE mpb.id = :mpb_id
-                                AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED')
-                            """), {"mpb_id": mpb_id}).fetchall()
-                            
-                            members = []
-                            for row in result:
-                                if row.customer_discord:
-                                    members.append(row.customer_discord)
-                                if row.partner_discord:
-                                    members.append(row.partner_discord)
-                            return list(set(members))
-                    
-                    members = await asyncio.to_thread(get_multi_player_members, booking_id)
-                    await show_group_rating_system(text_channel, booking_id, members, is_multiplayer=True)
-                    rating_sent_bookings.add(booking_id)
-                    print(f"✅ 已發送多人陪玩評價系統: {booking_id}, 參與人數: {len(members)}")
-                else:
-                    # 檢查是否是群組預約
-                    group_booking_check = s.execute(text("""
-                        SELECT id FROM "GroupBooking" WHERE id = :booking_id
-                    """), {"booking_id": booking_id}).fetchone()
-                    
-                    if group_booking_check:
-                        # 群組預約：使用群組評價系統
-                        # 獲取參與者列表
-                        def get_group_booking_members(gb_id):
-                            with Session() as s_members:
-                                # 查詢所有有 Booking 記錄的顧客（有付費的人）
-                                customer_result = s_members.execute(text("""
-                                    SELECT DISTINCT cu.discord as customer_discord
-                                    FROM "GroupBooking" gb
-                                    JOIN "Booking" b ON b."groupBookingId" = gb.id
-                                    JOIN "Customer" c ON c.id = b."customerId"
-                                    JOIN "User" cu ON cu.id = c."userId"
-                                    WHERE gb.id = :gb_id
-                                    AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED', 'PAID_WAITING_PARTNER_CONFIRMATION', 'COMPLETED')
-                                    AND cu.discord IS NOT NULL
-                                """), {"gb_id": gb_id}).fetchall()
-                                
-                                # 查詢所有夥伴
-                                partner_result = s_members.execute(text("""
-                                    SELECT DISTINCT pu.discord as partner_discord
-                                    FROM "GroupBooking" gb
-                                    JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
-                                    JOIN "Partner" p ON p.id = gbp."partnerId"
-                                    JOIN "User" pu ON pu.id = p."userId"
-                                    WHERE gb.id = :gb_id
-                                    AND gbp.status = 'ACTIVE'
-                                    AND pu.discord IS NOT NULL
-                                """), {"gb_id": gb_id}).fetchall()
-                                
-                                # 合併所有參與者
-                                members = []
-                                for row in customer_result:
-                                    if row.customer_discord:
-                                        members.append(row.customer_discord)
-                                for row in partner_result:
-                                    if row.partner_discord:
-                                        members.append(row.partner_discord)
-                                return list(set(members))
+                members = await asyncio.to_thread(get_multi_player_members, booking_id)
+                await show_group_rating_system(text_channel, booking_id, members, is_multiplayer=True)
+                rating_sent_bookings.add(booking_id)
+                print(f"✅ 已發送多人陪玩評價系統: {booking_id}, 參與人數: {len(members)}")
+            elif booking_kind == "group":
+                # 群組預約：使用群組評價系統
+                # 獲取參與者列表
+                def get_group_booking_members(gb_id):
+                    with Session() as s_members:
+                        # 查詢所有有 Booking 記錄的顧客（有付費的人）
+                        customer_result = s_members.execute(text("""
+                            SELECT DISTINCT cu.discord as customer_discord
+                            FROM "GroupBooking" gb
+                            JOIN "Booking" b ON b."groupBookingId" = gb.id
+                            JOIN "Customer" c ON c.id = b."customerId"
+                            JOIN "User" cu ON cu.id = c."userId"
+                            WHERE gb.id = :gb_id
+                            AND b.status IN ('CONFIRMED', 'PARTNER_ACCEPTED', 'PAID_WAITING_PARTNER_CONFIRMATION', 'COMPLETED')
+                            AND cu.discord IS NOT NULL
+                        """), {"gb_id": gb_id}).fetchall()
                         
-                        # 🔥 使用與一般預約相同的評價系統
-                        view = BookingRatingView(booking_id)
-                        await text_channel.send(
-                            "🎉 預約時間結束！\n"
-                            "請為您的遊戲夥伴評分：\n\n"
-                            "點擊下方按鈕選擇星等，系統會彈出評價表單讓您填寫評論。",
-                            view=view
-                        )
-                        rating_sent_bookings.add(booking_id)
-                        print(f"✅ 已發送群組預約評價系統: {booking_id}")
-                    else:
-                        # 單人預約：使用單人評價系統
-                        view = BookingRatingView(booking_id)
-                        await text_channel.send(
-                            "🎉 預約時間結束！\n"
-                            "請為您的遊戲夥伴評分：\n\n"
-                            "點擊下方按鈕選擇星等，系統會彈出評價表單讓您填寫評論。",
-                            view=view
-                        )
-                        rating_sent_bookings.add(booking_id)
-                        print(f"✅ 已發送單人預約評價系統: {booking_id}")
+                        # 查詢所有夥伴
+                        partner_result = s_members.execute(text("""
+                            SELECT DISTINCT pu.discord as partner_discord
+                            FROM "GroupBooking" gb
+                            JOIN "GroupBookingParticipant" gbp ON gbp."groupBookingId" = gb.id
+                            JOIN "Partner" p ON p.id = gbp."partnerId"
+                            JOIN "User" pu ON pu.id = p."userId"
+                            WHERE gb.id = :gb_id
+                            AND gbp.status = 'ACTIVE'
+                            AND pu.discord IS NOT NULL
+                        """), {"gb_id": gb_id}).fetchall()
+                        
+                        # 合併所有參與者
+                        members = []
+                        for row in customer_result:
+                            if row.customer_discord:
+                                members.append(row.customer_discord)
+                        for row in partner_result:
+                            if row.partner_discord:
+                                members.append(row.partner_discord)
+                        return list(set(members))
+                
+                # 🔥 使用與一般預約相同的評價系統
+                view = BookingRatingView(booking_id)
+                await text_channel.send(
+                    "🎉 預約時間結束！\n"
+                    "請為您的遊戲夥伴評分：\n\n"
+                    "點擊下方按鈕選擇星等，系統會彈出評價表單讓您填寫評論。",
+                    view=view
+                )
+                rating_sent_bookings.add(booking_id)
+                print(f"✅ 已發送群組預約評價系統: {booking_id}")
+            else:
+                # 單人預約：使用單人評價系統
+                view = BookingRatingView(booking_id)
+                await text_channel.send(
+                    "🎉 預約時間結束！\n"
+                    "請為您的遊戲夥伴評分：\n\n"
+                    "點擊下方按鈕選擇星等，系統會彈出評價表單讓您填寫評論。",
+                    view=view
+                )
+                rating_sent_bookings.add(booking_id)
+                print(f"✅ 已發送單人預約評價系統: {booking_id}")
         else:
             print(f"⚠️ 預約 {booking_id} 已發送過評價系統，跳過")
         
@@ -8761,18 +9096,9 @@ async def countdown_with_rating_extended(vc_id, channel_name, text_channel, vc,
         
         # 10 分鐘後自動提交未完成的評價（僅適用於單人預約）
         # 多人陪玩和群組預約的評價由 GroupRatingModal 處理
-        with Session() as s:
-            multi_player_check = s.execute(text("""
-                SELECT id FROM "MultiPlayerBooking" WHERE id = :booking_id
-            """), {"booking_id": booking_id}).fetchone()
-            
-            group_booking_check = s.execute(text("""
-                SELECT id FROM "GroupBooking" WHERE id = :booking_id
-            """), {"booking_id": booking_id}).fetchone()
-            
-            # 只有單人預約才需要自動提交評價回饋
-            if not multi_player_check and not group_booking_check:
-                await submit_auto_rating(booking_id, text_channel)
+        # 只有單人預約才需要自動提交評價回饋
+        if booking_kind == "single":
+            await submit_auto_rating(booking_id, text_channel)
         
         # 關閉文字頻道
         try:
@@ -8786,26 +9112,58 @@ async def countdown_with_rating_extended(vc_id, channel_name, text_channel, vc,
 
 async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, mentioned, record_id):
     try:
-        print(f"🔍 開始倒數計時: vc_id={vc_id}, record_id={record_id}")
+        logger.debug("🔍 開始倒數計時: vc_id=%s, record_id=%s", vc_id, record_id)
         
         # 檢查 record_id 是否有效
         if not record_id:
             print(f"❌ 警告: record_id 為 None，評價系統可能無法正常工作")
         
         # 移動用戶到語音頻道（如果是自動創建的，mentioned 已經包含用戶）
+        # 同時送出所有移動請求；單一用戶移動失敗不影響其他人
         if mentioned:
-            for user in mentioned:
-                if user.voice and user.voice.channel:
-                    await user.move_to(vc)
+            await asyncio.gather(
+                *(move_member(user, vc) for user in mentioned if user.voice and user.voice.channel),
+                return_exceptions=True
+            )
 
         # 注意：延長按鈕已在調用此函數之前發送，這裡不再重複發送
 
-        while active_voice_channels[vc_id]['remaining'] > 0:
-            remaining = active_voice_channels[vc_id]['remaining']
-            if remaining == 60:
-                await text_channel.send("⏰ 剩餘 1 分鐘。")
-            await asyncio.sleep(1)
-            active_voice_channels[vc_id]['remaining'] -= 1
+        # 以截止時間 + 事件等待取代每秒輪詢：只在「剩 1 分鐘」、「時間到」或「被延長」時才喚醒
+        vc_data = active_voice_channels[vc_id]
+        extend_event = vc_data.setdefault('extend_event', asyncio.Event())
+        vc_data['deadline'] = time.monotonic() + vc_data['remaining']
+        
+        async def persist_session():
+            # 把結束時間與頻道寫入配對記錄，bot 重啟後由 resume_pairing_sessions 恢復倒數
+            if not record_id or not pairing_sessions_enabled:
+                return
+            end_time = datetime.utcnow() + timedelta(seconds=vc_data['deadline'] - time.monotonic())
+            try:
+                await asyncio.to_thread(
+                    save_pairing_session, record_id, end_time, vc_data['extended'],
+                    vc.id, text_channel.id if text_channel else None
+                )
+            except Exception as e:
+                print(f"⚠️ 保存配對頻道狀態失敗: {e}")
+        
+        await persist_session()
+        while True:
+            left = vc_data['deadline'] - time.monotonic()
+            if left <= 0:
+                break
+            # 以是否已發送判斷，而不是只看剩餘時間：計時器提早喚醒時 left 仍可能略大於 60 秒
+            warning_key = (vc_id, vc_data['deadline'])
+            warn_due = left > 60 and warning_key not in one_minute_warnings
+            try:
+                await asyncio.wait_for(extend_event.wait(), timeout=left - 60 if warn_due else left)
+                # 被延長：清除事件後重新計算截止時間
+                extend_event.clear()
+                await persist_session()
+            except asyncio.TimeoutError:
+                if warn_due:
+                    one_minute_warnings.add(warning_key)
+                    if text_channel:
+                        await text_channel.send("⏰ 剩餘 1 分鐘。")
 
         await vc.delete()
         print(f"🎯 語音頻道已刪除，開始評價流程: record_id={record_id}")
@@ -8827,21 +9185,23 @@ async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, m
                 return
             
             # 獲取配對記錄以取得用戶ID
+            def query_record_users():
+                with Session() as s:
+                    record = s.get(PairingRecord, record_id)
+                    return (record.user1Id, record.user2Id, record.bookingId) if record else None
+            
             user1_id = None
             user2_id = None
-            with Session() as s:
-                record = s.get(PairingRecord, record_id)
-                if record:
-                    user1_id = record.user1Id
-                    user2_id = record.user2Id
-                    booking_id = record.bookingId
-                    print(f"🔍 從資料庫獲取用戶ID: record_id={record_id}, user1_id={user1_id}, user2_id={user2_id}, booking_id={booking_id}")
-                    
-                    # 驗證用戶ID格式（應該是 Discord ID，通常是 17-19 位數字）
-                    if not user1_id or not user2_id:
-                        print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID為空")
-                    elif not user1_id.isdigit() or not user2_id.isdigit():
-                        print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID格式可能錯誤: user1_id={user1_id}, user2_id={user2_id}")
+            record_users = await asyncio.to_thread(query_record_users)
+            if record_users:
+                user1_id, user2_id, booking_id = record_users
+                logger.debug("🔍 從資料庫獲取用戶ID: record_id=%s, user1_id=%s, user2_id=%s, booking_id=%s", record_id, user1_id, user2_id, booking_id)
+                
+                # 驗證用戶ID格式（應該是 Discord ID，通常是 17-19 位數字）
+                if not user1_id or not user2_id:
+                    print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID為空")
+                elif not user1_id.isdigit() or not user2_id.isdigit():
+                    print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID格式可能錯誤: user1_id={user1_id}, user2_id={user2_id}")
             
             if not user1_id or not user2_id:
                 print(f"⚠️ 無法獲取用戶ID (user1_id={user1_id}, user2_id={user2_id})，使用預設值")
@@ -8849,7 +9209,7 @@ async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, m
                 if mentioned and len(mentioned) >= 2:
                     user1_id = str(mentioned[0].id)
                     user2_id = str(mentioned[1].id)
-                    print(f"🔍 從 mentioned 獲取用戶ID: user1_id={user1_id}, user2_id={user2_id}")
+                    logger.debug("🔍 從 mentioned 獲取用戶ID: user1_id=%s, user2_id=%s", user1_id, user2_id)
                 else:
                     print(f"❌ 無法獲取用戶ID，評價系統可能無法正常工作")
                     # 即使無法獲取用戶ID，也發送評價系統（但可能無法正確識別身份）
@@ -8873,106 +9233,10 @@ async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, m
             print(f"✅ 評價提示訊息已發送到文字頻道")
             
             # 創建評價 View（包含星星按鈕和身份選擇）
-            # 確保使用正確的 RatingView 類別（手動創建頻道用）
-            # 創建一個局部類別來避免類別衝突
-            class ManualRatingView(View):
-                def __init__(self, record_id, user1_id, user2_id):
-                    super().__init__(timeout=600)  # 10分鐘超時
-                    self.record_id = record_id
-                    self.user1_id = user1_id  # 顧客 ID
-                    self.user2_id = user2_id  # 夥伴 ID
-                    self.selected_rating = 0
-                    self.submitted = False
-                
-                def get_user_role(self, user_id: str) -> str:
-                    """根據用戶ID自動判斷身份"""
-                    if str(user_id) == str(self.user1_id):
-                        return 'customer'  # 顧客
-                    elif str(user_id) == str(self.user2_id):
-                        return 'partner'  # 夥伴
-                    else:
-                        return None
-                
-                @discord.ui.button(label="☆ 1星", style=discord.ButtonStyle.secondary, row=0)
-                async def star1(self, interaction: discord.Interaction, button: Button):
-                    await self.select_rating(interaction, 1)
-                
-                @discord.ui.button(label="☆ 2星", style=discord.ButtonStyle.secondary, row=0)
-                async def star2(self, interaction: discord.Interaction, button: Button):
-                    await self.select_rating(interaction, 2)
-                
-                @discord.ui.button(label="☆ 3星", style=discord.ButtonStyle.secondary, row=0)
-                async def star3(self, interaction: discord.Interaction, button: Button):
-                    await self.select_rating(interaction, 3)
-                
-                @discord.ui.button(label="☆ 4星", style=discord.ButtonStyle.secondary, row=0)
-                async def star4(self, interaction: discord.Interaction, button: Button):
-                    await self.select_rating(interaction, 4)
-                
-                @discord.ui.button(label="☆ 5星", style=discord.ButtonStyle.secondary, row=0)
-                async def star5(self, interaction: discord.Interaction, button: Button):
-                    await self.select_rating(interaction, 5)
-                
-                @discord.ui.button(label="提交評價", style=discord.ButtonStyle.success, row=1)
-                async def submit_rating(self, interaction: discord.Interaction, button: Button):
-                    try:
-                        if self.submitted:
-                            if not interaction.response.is_done():
-                                await interaction.response.send_message("❗ 已提交過評價。", ephemeral=True)
-                            return
-                        
-                        if self.selected_rating == 0:
-                            if not interaction.response.is_done():
-                                await interaction.response.send_message("❗ 請先選擇評分（點擊星星）", ephemeral=True)
-                            return
-                        
-                        # 根據用戶ID自動判斷身份
-                        user_role = self.get_user_role(str(interaction.user.id))
-                        if not user_role:
-                            if not interaction.response.is_done():
-                                await interaction.response.send_message("❗ 您不是此配對的參與者，無法提交評價", ephemeral=True)
-                            return
-                        
-                        if not interaction.response.is_done():
-                            await interaction.response.send_modal(RatingCommentModal(self.record_id, self.selected_rating, user_role, self.user1_id, self.user2_id))
-                        self.submitted = True
-                    except Exception as e:
-                        print(f"❌ 提交評價按鈕錯誤: {e}")
-                
-                async def select_rating(self, interaction: discord.Interaction, rating: int):
-                    try:
-                        self.selected_rating = rating
-                        stars = [
-                            (self.star1, "1"),
-                            (self.star2, "2"),
-                            (self.star3, "3"),
-                            (self.star4, "4"),
-                            (self.star5, "5")
-                        ]
-                        
-                        for i, (star_button, num) in enumerate(stars, 1):
-                            if i <= rating:
-                                star_button.style = discord.ButtonStyle.success
-                                # 更新 label，使用 ⭐ 表示已選擇
-                                star_button.label = f"⭐ {num}星"
-                            else:
-                                star_button.style = discord.ButtonStyle.secondary
-                                # 更新 label，使用 ☆ 表示未選擇
-                                star_button.label = f"☆ {num}星"
-                        
-                        if not interaction.response.is_done():
-                            await interaction.response.edit_message(view=self)
-                            await interaction.followup.send(f"✅ 已選擇 {rating} 星評分", ephemeral=True)
-                    except Exception as e:
-                        print(f"❌ 選擇評分錯誤: {e}")
-                        import traceback
-                        traceback.print_exc()
-                
-            
             view = ManualRatingView(record_id, user1_id, user2_id)
-            print(f"🔍 創建評價 View: record_id={record_id}, user1_id={user1_id}, user2_id={user2_id}")
-            print(f"🔍 View 類型: {type(view).__name__}")
-            print(f"🔍 View 按鈕數量: {len(view.children)}")
+            logger.debug("🔍 創建評價 View: record_id=%s, user1_id=%s, user2_id=%s", record_id, user1_id, user2_id)
+            logger.debug("🔍 View 類型: %s", type(view).__name__)
+            logger.debug("🔍 View 按鈕數量: %s", len(view.children))
             
             # 確保文字頻道存在且可發送訊息
             if text_channel:
@@ -9002,35 +9266,53 @@ async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, m
             import traceback
             traceback.print_exc()
 
-        # 使用新的 session 來更新記錄
-        with Session() as s:
-            record = s.get(PairingRecord, record_id)
-            if record:
-                record.extendedTimes = active_voice_channels[vc_id]['extended']
-                record.duration += record.extendedTimes * 600
+        # 延長次數在頻道存續期間只記在 active_voice_channels，結束時以單一 UPDATE 寫回
+        def finalize_pairing_record(record_id, extended_times):
+            with Session() as s:
+                row = s.execute(
+                    update(PairingRecord)
+                    .where(PairingRecord.id == record_id)
+                    .values(
+                        extendedTimes=extended_times,
+                        duration=PairingRecord.duration + extended_times * 600
+                    )
+                    .returning(
+                        PairingRecord.user1Id, PairingRecord.user2Id, PairingRecord.duration,
+                        PairingRecord.extendedTimes, PairingRecord.bookingId
+                    )
+                ).first()
                 s.commit()
-                
-                # 獲取更新後的記錄資訊
-                user1_id = record.user1Id
-                user2_id = record.user2Id
-                duration = record.duration
-                extended_times = record.extendedTimes
-                booking_id = record.bookingId
-                
-                print(f"🔍 PairingRecord 資訊: record_id={record_id}, user1_id={user1_id}, user2_id={user2_id}, booking_id={booking_id}")
-                
-                # 驗證用戶ID格式（應該是 Discord ID，通常是 17-19 位數字）
-                if not user1_id or not user2_id:
-                    print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID為空")
-                elif not user1_id.isdigit() or not user2_id.isdigit():
-                    print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID格式可能錯誤: user1_id={user1_id}, user2_id={user2_id}")
+                return row
+        
+        row = await asyncio.to_thread(finalize_pairing_record, record_id, active_voice_channels[vc_id]['extended'])
+        # 語音頻道已刪除，重啟後不需要再恢復
+        if pairing_sessions_enabled:
+            try:
+                await asyncio.to_thread(clear_pairing_session, record_id)
+            except Exception as e:
+                print(f"⚠️ 清除配對頻道狀態失敗: {e}")
+        if row:
+            # 獲取更新後的記錄資訊
+            user1_id, user2_id, duration, extended_times, booking_id = row
+            invalidate_pairing_stats(user1_id, user2_id)
+            
+            logger.debug("🔍 PairingRecord 資訊: record_id=%s, user1_id=%s, user2_id=%s, booking_id=%s", record_id, user1_id, user2_id, booking_id)
+            
+            # 驗證用戶ID格式（應該是 Discord ID，通常是 17-19 位數字）
+            if not user1_id or not user2_id:
+                print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID為空")
+            elif not user1_id.isdigit() or not user2_id.isdigit():
+                print(f"⚠️ 警告：PairingRecord {record_id} 中的用戶ID格式可能錯誤: user1_id={user1_id}, user2_id={user2_id}")
 
         # 延遲發送管理員摘要訊息（等待評價視圖超時，10分鐘後）
         async def send_admin_summary_after_timeout():
             """在評價視圖超時後發送摘要訊息"""
             await asyncio.sleep(600)  # 等待10分鐘（評價視圖超時時間）
+            # 評價視圖已超時，不會再有新的提交；先取出暫存評價，無論後續推送成功與否都不會殘留
+            ratings = pending_ratings.pop(record_id, None)
+            rating_submitted_users.pop(record_id, None)
             
-            admin = bot.get_channel(ADMIN_CHANNEL_ID)
+            admin = get_admin_channel()
             if admin:
                 try:
                     # 如果有 bookingId，從 Booking 獲取正確的 customer 和 partner Discord ID
@@ -9043,110 +9325,83 @@ async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, m
                             print(f"ℹ️ 這是手動配對記錄 (booking_id={booking_id})，直接使用 PairingRecord 中的用戶ID")
                             print(f"✅ 使用 PairingRecord 中的用戶ID: user1_id={user1_id}, user2_id={user2_id}")
                         else:
-                            print(f"🔍 嘗試從 Booking 獲取用戶資訊: booking_id={booking_id}")
+                            logger.debug("🔍 嘗試從 Booking 獲取用戶資訊: booking_id=%s", booking_id)
                             
-                            with Session() as s:
-                                booking_result = s.execute(text("""
-                                    SELECT 
-                                        c."userId" as customer_user_id,
-                                        p."userId" as partner_user_id
-                                    FROM "Booking" b
-                                    JOIN "Customer" c ON b."customerId" = c.id
-                                    JOIN "Schedule" s ON b."scheduleId" = s.id
-                                    JOIN "Partner" p ON s."partnerId" = p.id
-                                    WHERE b.id = :booking_id
-                                """), {"booking_id": booking_id}).fetchone()
+                            def query_booking_discords(booking_id):
+                                # 一次 JOIN 取得顧客與夥伴的 Discord ID
+                                with Session() as s:
+                                    return s.execute(text("""
+                                        SELECT 
+                                            cu.discord as customer_discord,
+                                            pu.discord as partner_discord
+                                        FROM "Booking" b
+                                        JOIN "Customer" c ON b."customerId" = c.id
+                                        JOIN "User" cu ON cu.id = c."userId"
+                                        JOIN "Schedule" s ON b."scheduleId" = s.id
+                                        JOIN "Partner" p ON s."partnerId" = p.id
+                                        JOIN "User" pu ON pu.id = p."userId"
+                                        WHERE b.id = :booking_id
+                                    """), {"booking_id": booking_id}).fetchone()
+                            
+                            # 將同步資料庫操作移到線程池，避免阻塞事件循環
+                            booking_result = await asyncio.to_thread(query_booking_discords, booking_id)
+                            
+                            if booking_result:
+                                if booking_result.customer_discord:
+                                    final_user1_id = booking_result.customer_discord
+                                    print(f"✅ 更新 user1_id 為: {final_user1_id}")
+                                else:
+                                    print(f"⚠️ 找不到 customer 的 Discord ID: booking_id={booking_id}")
                                 
-                                if booking_result:
-                                    customer_user_id = booking_result[0]
-                                    partner_user_id = booking_result[1]
-                                    print(f"✅ 找到 Booking: customer_user_id={customer_user_id}, partner_user_id={partner_user_id}")
-                                    
-                                    # 從 User 表獲取 Discord ID
-                                    customer_discord_result = s.execute(text("""
-                                        SELECT discord FROM "User" WHERE id = :user_id
-                                    """), {"user_id": customer_user_id}).fetchone()
-                                    
-                                    partner_discord_result = s.execute(text("""
-                                        SELECT discord FROM "User" WHERE id = :user_id
-                                    """), {"user_id": partner_user_id}).fetchone()
-                                    
-                                    if customer_discord_result and customer_discord_result[0]:
-                                        final_user1_id = customer_discord_result[0]
-                                        print(f"✅ 更新 user1_id 為: {final_user1_id}")
-                                    else:
-                                        print(f"⚠️ 找不到 customer 的 Discord ID: customer_user_id={customer_user_id}")
-                                    
-                                    if partner_discord_result and partner_discord_result[0]:
-                                        final_user2_id = partner_discord_result[0]
-                                        print(f"✅ 更新 user2_id 為: {final_user2_id}")
-                                    else:
-                                        print(f"⚠️ 找不到 partner 的 Discord ID: partner_user_id={partner_user_id}")
-                                    
-                                    print(f"🔍 最終 Discord ID: user1_id={final_user1_id}, user2_id={final_user2_id}")
+                                if booking_result.partner_discord:
+                                    final_user2_id = booking_result.partner_discord
+                                    print(f"✅ 更新 user2_id 為: {final_user2_id}")
                                 else:
-                                    print(f"⚠️ 找不到 Booking 記錄 (booking_id={booking_id})，使用 PairingRecord 中的用戶ID")
-                                    print(f"⚠️ PairingRecord 中的用戶ID: user1_id={user1_id}, user2_id={user2_id}")
-                    
-                    # 嘗試獲取用戶資訊，如果失敗則使用用戶 ID
-                    # final_user1_id 是顧客，final_user2_id 是夥伴
-                    try:
-                        customer_user = await bot.fetch_user(int(final_user1_id))
-                        customer_display = customer_user.mention
-                    except:
-                        customer_display = f"<@{final_user1_id}>"
-                    
-                    try:
-                        partner_user = await bot.fetch_user(int(final_user2_id))
-                        partner_display = partner_user.mention
-                    except:
-                        partner_display = f"<@{final_user2_id}>"
+                                    print(f"⚠️ 找不到 partner 的 Discord ID: booking_id={booking_id}")
+                                
+                                logger.debug("🔍 最終 Discord ID: user1_id=%s, user2_id=%s", final_user1_id, final_user2_id)
+                            else:
+                                print(f"⚠️ 找不到 Booking 記錄 (booking_id={booking_id})，使用 PairingRecord 中的用戶ID")
+                                print(f"⚠️ PairingRecord 中的用戶ID: user1_id={user1_id}, user2_id={user2_id}")
                     
-                    header = f"📋 配對紀錄\n👤 顧客：{customer_display}\n👥 夥伴：{partner_display}\n⏰ 時長：{duration//60} 分鐘 | 延長 {extended_times} 次"
+                    # 管理區只顯示 mention，直接以用戶 ID 格式化，不需逐一呼叫 fetch_user
+                    # final_user1_id 是顧客，final_user2_id 是夥伴
+                    header = f"📋 配對紀錄\n👤 顧客：<@{final_user1_id}>\n👥 夥伴：<@{final_user2_id}>\n⏰ 時長：{duration//60} 分鐘 | 延長 {extended_times} 次"
                     
                     if booking_id:
                         header += f"\n🆔 預約ID: {booking_id}"
 
                     # 檢查 pending_ratings 和資料庫中的評價
                     has_ratings = False
-                    feedback = "\n⭐ 評價回饋："
+                    feedback = [header, "\n⭐ 評價回饋："]  # 收集片段，最後一次 join
                     
                     # 檢查 pending_ratings
-                    if record_id in pending_ratings and pending_ratings[record_id]:
+                    if ratings:
                         has_ratings = True
-                        for r in pending_ratings[record_id]:
-                            try:
-                                from_user = await bot.fetch_user(int(r['user1']))
-                                from_user_display = from_user.mention
-                            except:
-                                from_user_display = f"<@{r['user1']}>"
-                            
-                            try:
-                                to_user = await bot.fetch_user(int(r['user2']))
-                                to_user_display = to_user.mention
-                            except:
-                                to_user_display = f"<@{r['user2']}>"
-                            
-                            feedback += f"\n- 「{from_user_display} → {to_user_display}」：{r['rating']} ⭐"
+                        for r in ratings:
+                            feedback.append(f"\n- 「<@{r['user1']}> → <@{r['user2']}>」：{r['rating']} ⭐")
                             if r.get('comment'):
-                                feedback += f"\n  💬 {r['comment']}"
-                        del pending_ratings[record_id]
+                                feedback.append(f"\n  💬 {r['comment']}")
                     
                     # 檢查資料庫中的評價
-                    with Session() as s:
-                        record = s.get(PairingRecord, record_id)
-                        if record and record.rating:
-                            has_ratings = True
-                            # 如果資料庫有評價但 pending_ratings 沒有，也顯示
-                            if record_id not in pending_ratings or not pending_ratings.get(record_id):
-                                feedback += f"\n- 評價：{record.rating} ⭐"
-                                if record.comment:
-                                    feedback += f"\n  💬 {record.comment}"
+                    def query_record_rating():
+                        with Session() as s:
+                            record = s.get(PairingRecord, record_id)
+                            return (record.rating, record.comment) if record else (None, None)
+                    
+                    record_rating, record_comment = await asyncio.to_thread(query_record_rating)
+                    if record_rating:
+                        has_ratings = True
+                        # 如果資料庫有評價但 pending_ratings 沒有，也顯示
+                        if not ratings:
+                            feedback.append(f"\n- 評價：{record_rating} ⭐")
+                            if record_comment:
+                                feedback.append(f"\n  💬 {record_comment}")
                     
                     if has_ratings:
-                        await admin.send(f"{header}{feedback}")
+                        notify_admin("".join(feedback))
                     else:
-                        await admin.send(f"{header}\n⭐ 沒有收到任何評價。")
+                        notify_admin(f"{header}\n⭐ 沒有收到任何評價。")
                 except Exception as e:
                     print(f"推送管理區評價失敗：{e}")
                     import traceback
@@ -9156,41 +9411,57 @@ async def countdown(vc_id, animal_channel_name, text_channel, vc, interaction, m
                         basic_header = f"📋 配對紀錄\n👤 顧客：<@{final_user1_id}>\n👥 夥伴：<@{final_user2_id}>\n⏰ 時長：{duration//60} 分鐘 | 延長 {extended_times} 次"
                         if booking_id:
                             basic_header += f"\n🆔 預約ID: {booking_id}"
-                        await admin.send(f"{basic_header}\n⭐ 沒有收到任何評價。")
+                        notify_admin(f"{basic_header}\n⭐ 沒有收到任何評價。")
                     except:
                         pass
         
         # 啟動背景任務，在10分鐘後發送摘要
-        asyncio.create_task(send_admin_summary_after_timeout())
+        create_background_task(send_admin_summary_after_timeout())
 
         active_voice_channels.pop(vc_id, None)
     except Exception as e:
         print(f"❌ 倒數錯誤: {e}")
 
+def query_blocked_ids(blocker_id, candidate_ids=None):
+    """查詢某用戶封鎖的用戶 ID（同步函數，請以 asyncio.to_thread 呼叫）
+    
+    傳入 candidate_ids 時只檢查這些用戶（走 uq_block 索引，只回傳命中的少數幾筆）
+    """
+    query = select(BlockRecord.blocked_id).where(BlockRecord.blocker_id == blocker_id)
+    if candidate_ids is not None:
+        if not candidate_ids:
+            return []
+        query = query.where(BlockRecord.blocked_id.in_(candidate_ids))
+    with Session() as s:
+        return list(s.execute(query).scalars())
+
 # --- 指令：/createvc ---
-@bot.tree.command(name="createvc", description="建立匿名語音頻道（指定開始時間）", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="createvc", description="建立匿名語音頻道（指定開始時間）", guild=GUILD_OBJ)
 @app_commands.describe(members="標註的成員們", minutes="存在時間（分鐘）", start_time="幾點幾分後啟動 (格式: HH:MM, 24hr)", limit="人數上限")
 async def createvc(interaction: discord.Interaction, members: str, minutes: int, start_time: str, limit: int = 2):
     await interaction.response.defer()
-    try:
-        hour, minute = map(int, start_time.split(":"))
-        now = datetime.now(TW_TZ)
-        start_dt = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if start_dt < now:
-            start_dt += timedelta(days=1)
-        start_dt_utc = start_dt.astimezone(timezone.utc)
-    except:
+    start_dt_utc = parse_tw_start_time(start_time)
+    if start_dt_utc is None:
         await interaction.followup.send("❗ 時間格式錯誤，請使用 HH:MM 24 小時制。")
         return
 
-    blocked_ids = []
+    # 只解析一次標註字串，再以 ID 直接從成員快取取得（保留標註順序、去除重複）
+    mention_ids = list(dict.fromkeys(MENTION_RE.findall(members)))
+    blocked_ids = set()
     try:
-        with Session() as s:
-            blocked_ids = [b.blocked_id for b in s.query(BlockRecord).filter(BlockRecord.blocker_id == str(interaction.user.id)).all()]
+        # 只查詢被標註的人是否被封鎖，不載入整份封鎖名單
+        blocked_ids = set(await asyncio.to_thread(query_blocked_ids, str(interaction.user.id), mention_ids))
     except Exception:
         # 如果 block_records 表不存在，跳過封鎖檢查
         pass
-    mentioned = [m for m in interaction.guild.members if f"<@{m.id}>" in members and str(m.id) not in blocked_ids]
+    mention_ids = [i for i in mention_ids if i not in blocked_ids]
+    resolved = [(i, interaction.guild.get_member(int(i))) for i in mention_ids]
+    missing = [i for i, m in resolved if m is None]
+    if missing:
+        # 一次列出所有找不到的成員，而不是只回報第一個
+        await interaction.followup.send(f"❗ 找不到成員：{', '.join(f'<@{i}>' for i in missing)}")
+        return
+    mentioned = [m for _, m in resolved]
     if not mentioned:
         await interaction.followup.send("❗請標註至少一位成員。")
         return
@@ -9201,13 +9472,9 @@ async def createvc(interaction: discord.Interaction, members: str, minutes: int,
         await interaction.followup.send("❗請標註其他成員，不能與自己配對。")
         return
 
-    animal = random.choice(CUTE_ITEMS)
-    animal_channel_name = f"{animal}頻道"
-    await interaction.followup.send(f"✅ 已排程配對頻道：{animal_channel_name} 將於 <t:{int(start_dt_utc.timestamp())}:t> 開啟")
-
-    async def countdown_wrapper():
-        await asyncio.sleep((start_dt_utc - datetime.now(timezone.utc)).total_seconds())
+    animal, animal_channel_name = pick_cute_channel()
 
+    async def open_scheduled_channel():
         overwrites = {
             interaction.guild.default_role: discord.PermissionOverwrite(view_channel=False),
             interaction.user: discord.PermissionOverwrite(view_channel=True, connect=True),
@@ -9215,50 +9482,165 @@ async def createvc(interaction: discord.Interaction, members: str, minutes: int,
         for m in mentioned:
             overwrites[m] = discord.PermissionOverwrite(view_channel=True, connect=True)
 
-        category = discord.utils.get(interaction.guild.categories, name="語音頻道")
-        vc = await interaction.guild.create_voice_channel(name=animal_channel_name, overwrites=overwrites, user_limit=limit, category=category)
-        text_channel = await safe_create_text_channel(interaction.guild, "🔒匿名文字區", overwrites=overwrites, category=category)
-
-        with Session() as s:
-            # 確保記錄兩個不同的用戶
-            user1_id = str(interaction.user.id)
-            user2_id = str(mentioned[0].id)
-            
-            # 添加調試信息
-            print(f"🔍 創建配對記錄: {user1_id} × {user2_id}")
-            
-            import uuid
-            record_id = str(uuid.uuid4())
-            record = PairingRecord(
-                id=record_id,
-                user1Id=user1_id,
-                user2Id=user2_id,
-                duration=minutes * 60,
-                animalName=animal,
-                bookingId=f"manual_{record_id}"  # 手動創建的記錄使用 manual_ 前綴
+        category = find_category(interaction.guild, ("語音頻道",), fallback_first=False)
+        # 語音與文字頻道互不相依，同時創建；任一失敗時刪除另一個並通知排程者
+        try:
+            vc, text_channel = await create_channels_together(
+                interaction.guild.create_voice_channel(name=animal_channel_name, overwrites=overwrites, user_limit=limit, category=category),
+                safe_create_text_channel(interaction.guild, "🔒匿名文字區", overwrites=overwrites, category=category)
             )
-            s.add(record)
-            s.commit()
-            created_at = record.createdAt
+        except Exception as e:
+            print(f"❌ 排程創建配對頻道失敗: {e}")
+            try:
+                await interaction.channel.send(f"❌ {interaction.user.mention} 排程的配對頻道 {animal_channel_name} 創建失敗，請稍後再試。")
+            except Exception:
+                pass
+            return
 
-        active_voice_channels[vc.id] = {
-            'text_channel': text_channel,
-            'remaining': minutes * 60,
-            'extended': 0,
-            'record_id': record_id,  # 使用保存的 ID
-            'vc': vc
-        }
+        # 確保記錄兩個不同的用戶
+        user1_id = str(interaction.user.id)
+        user2_id = str(mentioned[0].id)
+        
+        # 添加調試信息
+        logger.debug("🔍 創建配對記錄: %s × %s", user1_id, user2_id)
+        
+        record_id = await asyncio.to_thread(create_manual_pairing_record, user1_id, user2_id, minutes * 60, animal)
 
-        # 發送歡迎訊息和延長按鈕
+        # 先登記頻道並啟動倒數，再發送延長按鈕
+        start_pairing_session(vc, text_channel, animal_channel_name, minutes * 60, record_id, interaction, mentioned)
         view = ExtendView(vc.id)
         await text_channel.send(f"🎉 語音頻道 {vc.name} 已開啟！\n⏳ 可延長5分鐘 ( 為了您有更好的遊戲體驗，請到最後需要時再點選 ) 。", view=view)
 
-        await countdown(vc.id, animal_channel_name, text_channel, vc, interaction, mentioned, record_id)
+    def on_start_time():
+        scheduled_vc_timers.pop(interaction.id, None)
+        create_background_task(open_scheduled_channel())
+
+    # 等待期間只保留一個 TimerHandle，不讓掛起的協程長時間佔用記憶體
+    # 只在這裡換算一次等待秒數；call_later 以事件循環的 monotonic 時鐘計時，不受系統時間調整影響
+    # 之後的倒數（含延長）由 countdown 以 monotonic 截止時間追蹤
+    delay = max(0, (start_dt_utc - discord.utils.utcnow()).total_seconds())
+    scheduled_vc_timers[interaction.id] = asyncio.get_running_loop().call_later(delay, on_start_time)
+    await interaction.followup.send(
+        f"✅ 已排程配對頻道：{animal_channel_name} 將於 <t:{int(start_dt_utc.timestamp())}:t> 開啟",
+        view=CancelScheduledVCView(interaction.id, interaction.user.id, timeout=max(delay, 1))
+    )
+
+async def move_members_to(vc, members):
+    """同時移動多位成員到語音頻道，返回 (已移動, 不在語音中, 其他失敗) 的 mention 列表"""
+    in_voice = [m for m in members if m.voice]
+    results = await asyncio.gather(*(move_member(m, vc) for m in in_voice), return_exceptions=True)
+    
+    moved, not_in_vc, failed = [], [m.mention for m in members if not m.voice], []
+    for member, result in zip(in_voice, results):
+        if not isinstance(result, BaseException):
+            moved.append(member.mention)
+            continue
+        if isinstance(result, discord.HTTPException) and result.code == 40032:  # User not connected to voice
+            not_in_vc.append(member.mention)
+        else:
+            failed.append(member.mention)
+        print(f"⚠️ 移動 {member.display_name} 失敗: {result}")
+    return moved, not_in_vc, failed
+
+def create_manual_pairing_record(user1_id, user2_id, duration_seconds, animal):
+    """建立手動配對記錄並返回 record_id；session 只在寫入期間開啟，不會跨越 await 持有連線"""
+    record_id = str(uuid.uuid4())
+    with Session() as s:
+        s.add(PairingRecord(
+            id=record_id,
+            user1Id=user1_id,
+            user2Id=user2_id,
+            duration=duration_seconds,
+            animalName=animal,
+            bookingId=f"manual_{record_id}"  # 手動創建的記錄使用 manual_ 前綴
+        ))
+        s.commit()
+    return record_id
+
+def start_pairing_session(vc, text_channel, channel_name, seconds, record_id, interaction=None, mentioned=(), extended=0):
+    """登記進行中的配對頻道並啟動倒數（/createvc、/createvc-now 與重啟恢復共用）"""
+    active_voice_channels[vc.id] = {
+        'text_channel': text_channel,
+        'remaining': seconds,
+        'extended': extended,
+        'record_id': record_id,
+        'vc': vc
+    }
+    return create_background_task(countdown(vc.id, channel_name, text_channel, vc, interaction, list(mentioned), record_id))
+
+def pairing_record_has_session_columns():
+    """檢查 PairingRecord 是否已有進行中頻道欄位（add_pairing_record_session_columns.sql）"""
+    with Session() as s:
+        columns = set(s.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'PairingRecord'
+            AND column_name IN ('endTime', 'voiceChannelId', 'textChannelId')
+        """)).scalars())
+    return len(columns) == 3
+
+def save_pairing_session(record_id, end_time, extended_times, vc_id, text_channel_id):
+    """記錄進行中配對的結束時間、延長次數與頻道 ID"""
+    with Session() as s:
+        s.execute(
+            update(pairing_session_table)
+            .where(pairing_session_table.c.id == record_id)
+            .values(
+                endTime=end_time,
+                extendedTimes=extended_times,
+                voiceChannelId=str(vc_id),
+                textChannelId=str(text_channel_id) if text_channel_id else None
+            )
+        )
+        s.commit()
+
+def clear_pairing_session(record_id):
+    """清除配對記錄上的進行中頻道（頻道已不存在時使用）"""
+    with Session() as s:
+        s.execute(update(pairing_session_table).where(pairing_session_table.c.id == record_id).values(voiceChannelId=None))
+        s.commit()
+
+pairing_sessions_resumed = False  # 只在啟動後第一次 on_ready 恢復倒數
+pairing_sessions_enabled = False  # 啟動時確認 PairingRecord 有進行中頻道欄位後才保存/恢復倒數狀態
 
-    bot.loop.create_task(countdown_wrapper())
+async def resume_pairing_sessions():
+    """bot 重啟後恢復進行中配對的倒數計時；語音頻道已被刪除的記錄直接清除"""
+    def query_active_sessions():
+        with Session() as s:
+            return s.execute(
+                select(pairing_session_table).where(pairing_session_table.c.voiceChannelId.isnot(None))
+            ).all()
+    
+    guild = get_main_guild()
+    if not guild:
+        return
+    try:
+        rows = await asyncio.to_thread(query_active_sessions)
+    except Exception as e:
+        print(f"❌ 查詢進行中的配對失敗: {e}")
+        return
+    for row in rows:
+        try:
+            vc = guild.get_channel(int(row.voiceChannelId))
+            if vc is None:
+                await asyncio.to_thread(clear_pairing_session, row.id)
+                continue
+            if vc.id in active_voice_channels:
+                continue
+            
+            text_channel = guild.get_channel(int(row.textChannelId)) if row.textChannelId else None
+            # endTime 以 naive UTC 存放，補上時區後與 aware 的目前時間相減
+            remaining = max(0, (row.endTime.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()) if row.endTime else 0
+            if text_channel:
+                # 重啟前的延長按鈕已失效，重新發送一個
+                await text_channel.send("🔄 Bot 已重新啟動，倒數計時已恢復。", view=ExtendView(vc.id))
+            start_pairing_session(vc, text_channel, vc.name, remaining, row.id, extended=row.extendedTimes or 0)
+            print(f"🔄 已恢復配對倒數: record_id={row.id}, 剩餘 {int(remaining)} 秒")
+        except Exception as e:
+            print(f"❌ 恢復配對倒數失敗: record_id={row.id}, {e}")
 
 # --- 指令：/createvc-now ---
-@bot.tree.command(name="createvc-now", description="立即建立匿名語音頻道（可在私人頻道使用）", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="createvc-now", description="立即建立匿名語音頻道（可在私人頻道使用）", guild=GUILD_OBJ)
 @app_commands.describe(
     customer="顧客（用戶ID、用戶名或用戶標註）", 
     partner="夥伴（用戶ID、用戶名或用戶標註）", 
@@ -9293,7 +9675,7 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
         return
     
     # 獲取 guild（語音頻道必須在 guild 中創建）
-    guild = bot.get_guild(GUILD_ID)
+    guild = get_main_guild()
     if not guild:
         error_msg = (
             "❌ **無法創建語音頻道**\n"
@@ -9335,21 +9717,11 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
     
     try:
         # 解析被標註的成員
-        blocked_ids = []
-        try:
-            with Session() as s:
-                blocked_ids = [b.blocked_id for b in s.query(BlockRecord).filter(BlockRecord.blocker_id == str(interaction.user.id)).all()]
-        except Exception:
-            # 如果 block_records 表不存在，跳過封鎖檢查
-            pass
-        
         # 輔助函數：解析單個用戶
         def parse_user(user_input: str, role_name: str):
             """解析單個用戶輸入，返回 member 對象或 None"""
-            import re
-            
             # 1. 先解析 Discord 標註格式 <@123456789> 或 <@!123456789>
-            discord_mentions = re.findall(r'<@!?(\d+)>', user_input)
+            discord_mentions = MENTION_RE.findall(user_input)
             if discord_mentions:
                 user_id = int(discord_mentions[0])
                 member = guild.get_member(user_id)
@@ -9357,7 +9729,7 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
                     return member
             
             # 2. 移除已解析的 Discord 標註格式，處理剩餘文本
-            remaining_text = re.sub(r'<@!?\d+>', '', user_input).strip()
+            remaining_text = MENTION_RE.sub('', user_input).strip()
             
             # 3. 檢查是否為純數字（用戶ID）
             if remaining_text.isdigit():
@@ -9372,24 +9744,16 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
                 return None
             
             # 5. 嘗試從 guild 成員中查找匹配的用戶
-            # 方法1：使用 Discord 的 utils.get 方法
-            try:
-                member = discord.utils.get(guild.members, name=part)
-                if not member:
-                    member = discord.utils.get(guild.members, display_name=part)
-                if not member:
-                    member = discord.utils.find(lambda m: m.global_name and m.global_name.lower() == part.lower(), guild.members)
-                if member:
-                    return member
-            except:
-                pass
+            # 方法1：名稱 / 顯示名稱直接查成員名稱索引（大小寫不敏感）
+            index = member_name_index.get(guild.id)
+            if index is None:
+                index = build_member_index(guild)
+            member = index.get(part.lower())
+            if member:
+                return member
             
-            # 方法2：手動遍歷所有成員
+            # 方法2：手動遍歷所有成員（全域名稱、舊式 name#1234）
             for member in guild.members:
-                if member.name.lower() == part.lower():
-                    return member
-                if member.display_name and member.display_name.lower() == part.lower():
-                    return member
                 if member.global_name and member.global_name.lower() == part.lower():
                     return member
                 if member.discriminator and member.discriminator != '0':
@@ -9434,7 +9798,15 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
             await interaction.followup.send("❌ **無法創建頻道**\n📋 **原因**：不能邀請自己\n💡 **提示**：請指定其他成員作為顧客和夥伴")
             return
         
-        # 檢查是否被封鎖
+        # 檢查是否被封鎖（只查詢這兩位成員）
+        blocked_ids = set()
+        try:
+            blocked_ids = set(await asyncio.to_thread(
+                query_blocked_ids, str(interaction.user.id), [str(customer_member.id), str(partner_member.id)]
+            ))
+        except Exception:
+            # 如果 block_records 表不存在，跳過封鎖檢查
+            pass
         blocked_users = []
         if str(customer_member.id) in blocked_ids:
             blocked_users.append(f"顧客：{customer_member.display_name}")
@@ -9457,29 +9829,9 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
         delay_seconds = 0
         start_dt_utc = None
         if start_time:
-            try:
-                hour, minute = map(int, start_time.split(":"))
-                now_tw = datetime.now(TW_TZ)
-                start_dt_tw = now_tw.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                
-                # 如果時間已過，設定為明天
-                if start_dt_tw < now_tw:
-                    start_dt_tw += timedelta(days=1)
-                
-                # 轉換為 UTC
-                start_dt_utc = start_dt_tw.astimezone(timezone.utc)
-                delay_seconds = (start_dt_utc - datetime.now(timezone.utc)).total_seconds()
-                
-                if delay_seconds < 0:
-                    error_msg = (
-                        "❌ **時間格式錯誤**\n"
-                        "📋 **原因**：開始時間必須是未來時間\n"
-                        "💡 **提示**：請使用 HH:MM 格式（24小時制，台灣時間）\n"
-                        "**範例**：`14:30` 表示下午2點30分"
-                    )
-                    await interaction.followup.send(error_msg)
-                    return
-            except ValueError:
+            # 時間已過會自動設定為明天，因此只需要檢查格式
+            start_dt_utc = parse_tw_start_time(start_time)
+            if start_dt_utc is None:
                 error_msg = (
                     "❌ **時間格式錯誤**\n"
                     "📋 **原因**：時間格式不正確\n"
@@ -9488,10 +9840,10 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
                 )
                 await interaction.followup.send(error_msg)
                 return
+            delay_seconds = max(0, (start_dt_utc - datetime.now(timezone.utc)).total_seconds())
         
         # 生成頻道名稱
-        animal = random.choice(CUTE_ITEMS)
-        animal_channel_name = f"{animal}頻道"
+        animal, animal_channel_name = pick_cute_channel()
         
         # 設置權限
         overwrites = {
@@ -9502,11 +9854,7 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
             overwrites[m] = discord.PermissionOverwrite(view_channel=True, connect=True)
         
         # 獲取或創建分類
-        category = discord.utils.get(guild.categories, name="語音頻道")
-        if not category:
-            category = discord.utils.get(guild.categories, name="Voice Channels")
-        if not category:
-            category = discord.utils.get(guild.categories, name="語音")
+        category = find_category(guild, ("語音頻道", "Voice Channels", "語音"), fallback_first=False)
         
         # 檢查 Bot 權限
         bot_member = guild.get_member(bot.user.id)
@@ -9544,22 +9892,21 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
         # 定義創建頻道的函數
         async def create_channels():
             try:
-                # 創建語音頻道
-                vc = await guild.create_voice_channel(
-                    name=animal_channel_name, 
-                    overwrites=overwrites, 
-                    user_limit=limit, 
-                    category=category
-                )
-                
-                # 創建文字頻道（429 安全）
-                text_channel = await safe_create_text_channel(
-                    guild,
-                    name="🔒匿名文字區",
-                    overwrites=overwrites,
-                    category=category
+                # 同時創建語音頻道與文字頻道（文字頻道 429 安全）；任一失敗時刪除另一個已創建的頻道
+                vc, text_channel = await create_channels_together(
+                    guild.create_voice_channel(
+                        name=animal_channel_name, 
+                        overwrites=overwrites, 
+                        user_limit=limit, 
+                        category=category
+                    ),
+                    safe_create_text_channel(
+                        guild,
+                        name="🔒匿名文字區",
+                        overwrites=overwrites,
+                        category=category
+                    )
                 )
-                
                 return vc, text_channel
             except discord.Forbidden:
                 return None, None
@@ -9567,6 +9914,31 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
                 print(f"❌ 創建頻道錯誤: {e}")
                 return None, None
         
+        async def start_session(vc, text_channel):
+            """頻道創建後：發送歡迎訊息、建立配對記錄並啟動倒數（立即與排程兩種路徑共用）"""
+            # 只顯示被邀請的成員，不包含互動發起者
+            mention_list = [m.mention for m in mentioned]
+            welcome_msg = f"👥 **邀請成員**：{' '.join(mention_list)}\n\n" if mention_list else ""
+            welcome_msg += (
+                "⏳ **可延長5分鐘** ( 為了您有更好的遊戲體驗，請到最後需要時再點選 )\n"
+                f"⏰ **頻道將在 {minutes} 分鐘後自動刪除**"
+            )
+            await text_channel.send(welcome_msg, view=ExtendView(vc.id))
+            
+            # 創建配對記錄（明確指定顧客和夥伴：user1Id 是顧客，user2Id 是夥伴）
+            customer_id = str(customer_member.id)
+            partner_id = str(partner_member.id)
+            try:
+                record_id = await asyncio.to_thread(create_manual_pairing_record, customer_id, partner_id, minutes * 60, animal)
+                print(f"✅ 配對記錄已創建: record_id={record_id}, customer_id={customer_id}, partner_id={partner_id}")
+            except Exception as e:
+                print(f"⚠️ 創建配對記錄失敗: {e}")
+                import traceback
+                traceback.print_exc()
+                record_id = "temp_" + str(int(time.time()))
+            
+            start_pairing_session(vc, text_channel, animal_channel_name, minutes * 60, record_id, interaction, mentioned)
+        
         # 如果有開始時間，先發送確認訊息，然後延遲創建
         if start_time and delay_seconds > 0:
             # 發送排程確認訊息
@@ -9594,25 +9966,7 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
                     return
                 
                 # 移動用戶到語音頻道
-                moved_users = []
-                failed_users_not_in_vc = []
-                
-                if caller_member.voice:
-                    try:
-                        await caller_member.move_to(vc)
-                        moved_users.append(caller_member.mention)
-                    except:
-                        failed_users_not_in_vc.append(caller_member.mention)
-                
-                for member in mentioned:
-                    if member.voice:
-                        try:
-                            await member.move_to(vc)
-                            moved_users.append(member.mention)
-                        except:
-                            failed_users_not_in_vc.append(member.mention)
-                    else:
-                        failed_users_not_in_vc.append(member.mention)
+                moved_users, _, _ = await move_members_to(vc, [caller_member] + mentioned)
                 
                 # 發送通知
                 notify_msg = f"✅ **語音頻道已開啟：{animal_channel_name}**\n"
@@ -9622,65 +9976,9 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
                 
                 await text_channel.send(notify_msg)
                 
-                # 在文字頻道發送歡迎訊息並 @ 提及用戶
-                view = ExtendView(vc.id)
-                # 只顯示被邀請的成員，不包含互動發起者
-                mention_list = [m.mention for m in mentioned]
-                
-                mention_text = ' '.join(mention_list) if mention_list else ""
-                
-                welcome_msg = ""
-                
-                if mention_list:
-                    welcome_msg += f"👥 **邀請成員**：{mention_text}\n\n"
-                
-                welcome_msg += (
-                    "⏳ **可延長5分鐘** ( 為了您有更好的遊戲體驗，請到最後需要時再點選 )\n"
-                    f"⏰ **頻道將在 {minutes} 分鐘後自動刪除**"
-                )
-                
-                await text_channel.send(welcome_msg, view=view)
-                
-                # 創建配對記錄（明確指定顧客和夥伴）
-                record_id = None
-                try:
-                    with Session() as s:
-                        customer_id = str(customer_member.id)
-                        partner_id = str(partner_member.id)
-                        
-                        import uuid
-                        record_id = str(uuid.uuid4())
-                        record = PairingRecord(
-                            id=record_id,
-                            user1Id=customer_id,  # user1Id 是顧客
-                            user2Id=partner_id,   # user2Id 是夥伴
-                            duration=minutes * 60,
-                            animalName=animal,
-                            bookingId=f"manual_{record_id}"  # 手動創建的記錄使用 manual_ 前綴
-                        )
-                        s.add(record)
-                        s.commit()
-                        created_at = record.createdAt
-                        print(f"✅ 配對記錄已創建: record_id={record_id}, customer_id={customer_id}, partner_id={partner_id}")
-                except Exception as e:
-                    print(f"⚠️ 創建配對記錄失敗: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    record_id = "temp_" + str(int(time.time()))
-                
-                # 啟動倒數計時
-                active_voice_channels[vc.id] = {
-                    'text_channel': text_channel,
-                    'remaining': minutes * 60,
-                    'extended': 0,
-                    'record_id': record_id,
-                    'vc': vc
-                }
-                
-                # 啟動倒數任務
-                bot.loop.create_task(countdown(vc.id, animal_channel_name, text_channel, vc, interaction, mentioned, record_id))
+                await start_session(vc, text_channel)
             
-            bot.loop.create_task(delayed_create())
+            create_background_task(delayed_create())
             return
         
         # 立即創建頻道
@@ -9695,39 +9993,8 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
             await interaction.followup.send(error_msg)
             return
         
-        # 移動用戶到語音頻道
-        moved_users = []
-        failed_users_not_in_vc = []
-        failed_users_permission = []
-        
-        # 移動發起者
-        if caller_member.voice:
-            try:
-                await caller_member.move_to(vc)
-                moved_users.append(caller_member.mention)
-            except discord.HTTPException as e:
-                if e.code == 40032:  # User not connected to voice
-                    failed_users_not_in_vc.append(caller_member.mention)
-                else:
-                    failed_users_permission.append(caller_member.mention)
-                print(f"⚠️ 移動 {caller_member.display_name} 失敗: {e}")
-        else:
-            failed_users_not_in_vc.append(caller_member.mention)
-        
-        # 移動被標註的成員
-        for member in mentioned:
-            if member.voice:
-                try:
-                    await member.move_to(vc)
-                    moved_users.append(member.mention)
-                except discord.HTTPException as e:
-                    if e.code == 40032:  # User not connected to voice
-                        failed_users_not_in_vc.append(member.mention)
-                    else:
-                        failed_users_permission.append(member.mention)
-                    print(f"⚠️ 移動 {member.display_name} 失敗: {e}")
-            else:
-                failed_users_not_in_vc.append(member.mention)
+        # 移動發起者與被標註的成員到語音頻道
+        moved_users, failed_users_not_in_vc, failed_users_permission = await move_members_to(vc, [caller_member] + mentioned)
         
         # 構建詳細的成功訊息
         success_msg = f"✅ **已創建語音頻道：{animal_channel_name}**\n"
@@ -9749,64 +10016,7 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
         
         await interaction.followup.send(success_msg)
         
-        # 在文字頻道發送歡迎訊息並 @ 提及用戶
-        view = ExtendView(vc.id)
-        
-        # 構建 @ 提及的用戶列表（只顯示被邀請的成員，不包含互動發起者）
-        mention_list = [m.mention for m in mentioned]
-        
-        mention_text = ' '.join(mention_list) if mention_list else ""
-        
-        welcome_msg = ""
-        
-        if mention_list:
-            welcome_msg += f"👥 **邀請成員**：{mention_text}\n\n"
-        
-        welcome_msg += (
-            "⏳ **可延長5分鐘** ( 為了您有更好的遊戲體驗，請到最後需要時再點選 )\n"
-            f"⏰ **頻道將在 {minutes} 分鐘後自動刪除**"
-        )
-        
-        await text_channel.send(welcome_msg, view=view)
-        
-        # 創建配對記錄（明確指定顧客和夥伴）
-        record_id = None
-        try:
-            with Session() as s:
-                customer_id = str(customer_member.id)
-                partner_id = str(partner_member.id)
-                
-                import uuid
-                record_id = str(uuid.uuid4())
-                record = PairingRecord(
-                    id=record_id,
-                    user1Id=customer_id,  # user1Id 是顧客
-                    user2Id=partner_id,   # user2Id 是夥伴
-                    duration=minutes * 60,
-                    animalName=animal,
-                    bookingId=f"manual_{record_id}"  # 手動創建的記錄使用 manual_ 前綴
-                )
-                s.add(record)
-                s.commit()
-                created_at = record.createdAt
-                print(f"✅ 配對記錄已創建: record_id={record_id}, customer_id={customer_id}, partner_id={partner_id}")
-        except Exception as e:
-            print(f"⚠️ 創建配對記錄失敗: {e}")
-            import traceback
-            traceback.print_exc()
-            record_id = "temp_" + str(int(time.time()))
-        
-        # 啟動倒數計時
-        active_voice_channels[vc.id] = {
-            'text_channel': text_channel,
-            'remaining': minutes * 60,
-            'extended': 0,
-            'record_id': record_id,
-            'vc': vc
-        }
-        
-        # 啟動倒數任務
-        bot.loop.create_task(countdown(vc.id, animal_channel_name, text_channel, vc, interaction, mentioned, record_id))
+        await start_session(vc, text_channel)
         
     except Exception as e:
         error_msg = (
@@ -9820,98 +10030,233 @@ async def createvc_now(interaction: discord.Interaction, customer: str, partner:
         traceback.print_exc()
 
 # --- 其他 Slash 指令 ---
-@bot.tree.command(name="viewblocklist", description="查看你封鎖的使用者", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="viewblocklist", description="查看你封鎖的使用者", guild=GUILD_OBJ)
 async def view_blocklist(interaction: discord.Interaction):
     try:
-        with Session() as s:
-            blocks = s.query(BlockRecord).filter(BlockRecord.blocker_id == str(interaction.user.id)).all()
-            if not blocks:
-                await interaction.response.send_message("📭 你尚未封鎖任何人。", ephemeral=True)
-                return
-            blocked_mentions = [f"<@{b.blocked_id}>" for b in blocks]
-            await interaction.response.send_message(f"🔒 你封鎖的使用者：\n" + "\n".join(blocked_mentions), ephemeral=True)
+        # 將同步資料庫操作移到線程池，避免阻塞事件循環
+        blocked_ids = await asyncio.to_thread(query_blocked_ids, str(interaction.user.id))
+        if not blocked_ids:
+            await interaction.response.send_message("📭 你尚未封鎖任何人。", ephemeral=True)
+            return
+        blocked_mentions = [f"<@{blocked_id}>" for blocked_id in blocked_ids]
+        await interaction.response.send_message(f"🔒 你封鎖的使用者：\n" + "\n".join(blocked_mentions), ephemeral=True)
     except Exception:
         await interaction.response.send_message("📭 你尚未封鎖任何人。", ephemeral=True)
 
-@bot.tree.command(name="unblock", description="解除你封鎖的某人", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="unblock", description="解除你封鎖的某人", guild=GUILD_OBJ)
 @app_commands.describe(member="要解除封鎖的使用者")
 async def unblock(interaction: discord.Interaction, member: discord.Member):
-    try:
+    def delete_block(blocker_id, blocked_id):
+        # 單一 DELETE ... RETURNING，不需先 SELECT 再刪除
         with Session() as s:
-            block = s.query(BlockRecord).filter_by(blocker_id=str(interaction.user.id), blocked_id=str(member.id)).first()
-            if block:
-                s.delete(block)
-                s.commit()
-                await interaction.response.send_message(f"✅ 已解除對 <@{member.id}> 的封鎖。", ephemeral=True)
-            else:
-                await interaction.response.send_message("❗ 你沒有封鎖這位使用者。", ephemeral=True)
+            row = s.execute(
+                delete(BlockRecord)
+                .where(BlockRecord.blocker_id == blocker_id, BlockRecord.blocked_id == blocked_id)
+                .returning(BlockRecord.id)
+            ).first()
+            s.commit()
+            return row is not None
+    
+    try:
+        # 將同步資料庫操作移到線程池，避免阻塞事件循環
+        deleted = await asyncio.to_thread(delete_block, str(interaction.user.id), str(member.id))
+        if deleted:
+            await interaction.response.send_message(f"✅ 已解除對 <@{member.id}> 的封鎖。", ephemeral=True)
+        else:
+            await interaction.response.send_message("❗ 你沒有封鎖這位使用者。", ephemeral=True)
     except Exception:
         await interaction.response.send_message("❗ 封鎖功能暫時無法使用。", ephemeral=True)
 
-@bot.tree.command(name="report", description="舉報不當行為", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="report", description="舉報不當行為", guild=GUILD_OBJ)
 @app_commands.describe(member="被舉報的使用者", reason="舉報原因")
 async def report(interaction: discord.Interaction, member: discord.Member, reason: str):
-    admin = bot.get_channel(ADMIN_CHANNEL_ID)
+    admin = get_admin_channel()
     await interaction.response.send_message("✅ 舉報已提交，感謝你的協助。", ephemeral=True)
     if admin:
-        await admin.send(f"🚨 舉報通知：<@{interaction.user.id}> 舉報 <@{member.id}>\n📄 理由：{reason}")
+        notify_admin(f"🚨 舉報通知：<@{interaction.user.id}> 舉報 <@{member.id}>\n📄 理由：{reason}")
 
-@bot.tree.command(name="mystats", description="查詢自己的配對統計", guild=discord.Object(id=GUILD_ID))
-async def mystats(interaction: discord.Interaction):
+def query_pairing_stats(user_id):
+    """查詢用戶的配對統計，返回 (配對次數, 平均評分, 留言數)"""
+    # 直接在資料庫端聚合，只回傳一行結果，不把所有紀錄載入 Python
+    # NULLIF 讓 0 分與空留言不列入計算（與原本 Python 端的判斷一致）
     with Session() as s:
-        records = s.query(PairingRecord).filter((PairingRecord.user1Id==str(interaction.user.id)) | (PairingRecord.user2Id==str(interaction.user.id))).all()
-    count = len(records)
-    ratings = [r.rating for r in records if r.rating]
-    comments = [r.comment for r in records if r.comment]
-    avg_rating = round(sum(ratings)/len(ratings), 1) if ratings else "無"
-    await interaction.response.send_message(f"📊 你的配對紀錄：\n- 配對次數：{count} 次\n- 平均評分：{avg_rating} ⭐\n- 收到留言：{len(comments)} 則", ephemeral=True)
-
-@bot.tree.command(name="stats", description="查詢他人配對統計 (限管理員)", guild=discord.Object(id=GUILD_ID))
+        count, avg, comment_count = s.query(
+            func.count(PairingRecord.id),
+            func.avg(func.nullif(PairingRecord.rating, 0)),
+            func.count(func.nullif(PairingRecord.comment, ''))
+        ).filter(or_(PairingRecord.user1Id == user_id, PairingRecord.user2Id == user_id)).one()
+    avg_rating = round(float(avg), 1) if avg is not None else "無"
+    return count, avg_rating, comment_count
+
+STATS_CACHE_TTL = 30  # 配對統計快取秒數
+STATS_CACHE_SIZE = 1024  # 最多快取的用戶數
+pairing_stats_cache = OrderedDict()  # {user_id: (到期時間, (配對次數, 平均評分, 留言數))}
+
+async def get_pairing_stats(user_id):
+    """取得用戶的配對統計；短時間內重複查詢直接使用快取，不再打資料庫"""
+    now = time.monotonic()
+    cached = pairing_stats_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    # 將同步資料庫操作移到線程池，避免阻塞事件循環
+    stats = await asyncio.to_thread(query_pairing_stats, user_id)
+    pairing_stats_cache[user_id] = (now + STATS_CACHE_TTL, stats)
+    pairing_stats_cache.move_to_end(user_id)
+    while len(pairing_stats_cache) > STATS_CACHE_SIZE:
+        pairing_stats_cache.popitem(last=False)
+    return stats
+
+def invalidate_pairing_stats(*user_ids):
+    """配對記錄或評價有變動時清除相關用戶的統計快取"""
+    for user_id in user_ids:
+        pairing_stats_cache.pop(str(user_id), None)
+
+@bot.tree.command(name="mystats", description="查詢自己的配對統計", guild=GUILD_OBJ)
+async def mystats(interaction: discord.Interaction):
+    count, avg_rating, comment_count = await get_pairing_stats(str(interaction.user.id))
+    await interaction.response.send_message(f"📊 你的配對紀錄：\n- 配對次數：{count} 次\n- 平均評分：{avg_rating} ⭐\n- 收到留言：{comment_count} 則", ephemeral=True)
+
+@bot.tree.command(name="stats", description="查詢他人配對統計 (限管理員)", guild=GUILD_OBJ)
 @app_commands.describe(member="要查詢的使用者")
 async def stats(interaction: discord.Interaction, member: discord.Member):
     if not interaction.user.guild_permissions.administrator:
         await interaction.response.send_message("❌ 僅限管理員查詢。", ephemeral=True)
         return
-    with Session() as s:
-        records = s.query(PairingRecord).filter((PairingRecord.user1Id==str(member.id)) | (PairingRecord.user2Id==str(member.id))).all()
-    count = len(records)
-    ratings = [r.rating for r in records if r.rating]
-    comments = [r.comment for r in records if r.comment]
-    avg_rating = round(sum(ratings)/len(ratings), 1) if ratings else "無"
-    await interaction.response.send_message(f"📊 <@{member.id}> 的配對紀錄：\n- 配對次數：{count} 次\n- 平均評分：{avg_rating} ⭐\n- 收到留言：{len(comments)} 則", ephemeral=True)
+    count, avg_rating, comment_count = await get_pairing_stats(str(member.id))
+    await interaction.response.send_message(f"📊 <@{member.id}> 的配對紀錄：\n- 配對次數：{count} 次\n- 平均評分：{avg_rating} ⭐\n- 收到留言：{comment_count} 則", ephemeral=True)
 
 # --- Flask API ---
 app = Flask(__name__)
 
+def parse_api_datetime(value):
+    """解析 API 傳入的 ISO 時間字串，一律返回帶時區（UTC）的 datetime；沒有時區資訊時視為 UTC"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+# Flask 跑在獨立線程，Discord 操作必須交回 bot 的事件循環執行
+# （bot.loop.create_task 不是 thread-safe；另開 event loop 則無法使用 bot 的連線）
+FLASK_DISCORD_TIMEOUT = 120  # 等待 Discord 操作完成的秒數
+
+def run_on_bot_loop(coro):
+    """從 Flask 線程把 coroutine 排入 bot 事件循環，返回 concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, bot.loop)
+
+# API 防護：每個 IP 固定視窗限流 + Idempotency-Key 重放（避免重送的請求重複創建頻道與資料）
+API_RATE_LIMIT = int(os.getenv("API_RATE_LIMIT", "120"))  # 每個 IP 每分鐘允許的請求數（網站後端通常共用同一個 IP）
+API_IDEMPOTENCY_CACHE_SIZE = 1024  # 保留最近幾個 Idempotency-Key 的回應
+api_guard_lock = threading.Lock()  # waitress 以多線程處理請求
+api_request_counts = OrderedDict()  # {(ip, 分鐘): 請求數}
+api_idempotent_responses = OrderedDict()  # {(路徑, key): (回應內容, 狀態碼)}；處理中為 None
+
+def api_guard(view):
+    """為 API 端點加上限流與冪等處理"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        now = time.time()
+        minute = int(now // 60)
+        ip = request.remote_addr or "unknown"
+        key = request.headers.get("Idempotency-Key") or (request.get_json(silent=True) or {}).get("idempotencyKey")
+        cache_key = (request.path, key) if key else None
+        
+        with api_guard_lock:
+            # 依插入順序丟棄已過期的視窗
+            while api_request_counts and next(iter(api_request_counts))[1] < minute:
+                api_request_counts.popitem(last=False)
+            count = api_request_counts.get((ip, minute), 0) + 1
+            api_request_counts[(ip, minute)] = count
+            if count > API_RATE_LIMIT:
+                retry_after = str(60 - int(now) % 60)
+                return jsonify({"error": "請求過於頻繁，請稍後再試"}), 429, {"Retry-After": retry_after}
+            
+            if cache_key:
+                if cache_key in api_idempotent_responses:
+                    cached = api_idempotent_responses[cache_key]
+                    if cached is None:
+                        return jsonify({"error": "相同的請求正在處理中"}), 409
+                    api_idempotent_responses.move_to_end(cache_key)
+                    return app.response_class(cached[0], status=cached[1], mimetype="application/json")
+                api_idempotent_responses[cache_key] = None
+        
+        response = None
+        try:
+            response = app.make_response(view(*args, **kwargs))
+            return response
+        finally:
+            if cache_key:
+                with api_guard_lock:
+                    # 伺服器錯誤不快取，讓客戶端可以用同一個 key 重試
+                    if response is not None and response.status_code < 500:
+                        api_idempotent_responses[cache_key] = (response.get_data(), response.status_code)
+                        while len(api_idempotent_responses) > API_IDEMPOTENCY_CACHE_SIZE:
+                            api_idempotent_responses.popitem(last=False)
+                    else:
+                        api_idempotent_responses.pop(cache_key, None)
+    return wrapper
+
+@app.route("/schedule_booking", methods=["POST"])
+@api_guard
+def schedule_booking():
+    """網站建立或確認預約後通知 bot，於開始前排程一次預約檢查（定期輪詢仍保留作為備援）"""
+    data = request.get_json(silent=True) or {}
+    booking_id = data.get("booking_id")
+    try:
+        start_dt = parse_api_datetime(data["start_time"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "start_time 格式錯誤"}), 400
+    if not booking_id:
+        return jsonify({"error": "缺少 booking_id"}), 400
+
+    async def arm():
+        schedule_booking_check(str(booking_id), start_dt)
+
+    run_on_bot_loop(arm())
+    return jsonify({"status": "ok"})
+
 @app.route("/move_user", methods=["POST"])
+@api_guard
 def move_user():
-    data = request.get_json()
-    discord_id = int(data.get("discord_id"))
-    vc_id = int(data.get("vc_id"))
+    # 在排入事件循環之前先驗證參數，格式錯誤直接回傳 400（不讓錯誤在背景 coroutine 中被吞掉）
+    data = request.get_json(silent=True) or {}
+    try:
+        discord_id = int(data["discord_id"])
+        vc_id = int(data["vc_id"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "discord_id 與 vc_id 必須是數字"}), 400
 
     async def mover():
-        guild = bot.get_guild(GUILD_ID)
+        guild = get_main_guild()
         member = guild.get_member(discord_id)
         vc = guild.get_channel(vc_id)
         if member and vc:
-            await member.move_to(vc)
+            await move_member(member, vc)
 
-    bot.loop.create_task(mover())
+    run_on_bot_loop(mover())
     return jsonify({"status": "ok"})
 
 @app.route("/pair", methods=["POST"])
+@api_guard
 def pair_users():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     user1_discord_name = data.get("user1_id")  # 實際上是 Discord 名稱
     user2_discord_name = data.get("user2_id")  # 實際上是 Discord 名稱
-    minutes = data.get("minutes", 60)
     start_time = data.get("start_time")  # 可選的開始時間
+    if not user1_discord_name or not user2_discord_name:
+        return jsonify({"error": "缺少 user1_id 或 user2_id 參數"}), 400
+    try:
+        minutes = int(data.get("minutes", 60))
+        if start_time:
+            parse_api_datetime(start_time)
+    except (TypeError, ValueError):
+        return jsonify({"error": "minutes 或 start_time 格式錯誤"}), 400
 
-    print(f"🔍 收到配對請求: {user1_discord_name} × {user2_discord_name}, {minutes} 分鐘")
+    logger.debug("🔍 收到配對請求: %s × %s, %s 分鐘", user1_discord_name, user2_discord_name, minutes)
 
     async def create_pairing():
         try:
-            guild = bot.get_guild(GUILD_ID)
+            guild = get_main_guild()
             if not guild:
                 print("❌ 找不到伺服器")
                 return
@@ -9922,29 +10267,20 @@ def pair_users():
             
             if not user1 or not user2:
                 print(f"❌ 找不到用戶: {user1_discord_name}, {user2_discord_name}")
-                print(f"🔍 伺服器中的成員: {[m.name for m in guild.members]}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("🔍 伺服器中的成員: %s", [m.name for m in guild.members])
                 return
 
             print(f"✅ 找到用戶: {user1.name} ({user1.id}), {user2.name} ({user2.id})")
 
             # 生成可愛物品名稱
-            animal = random.choice(CUTE_ITEMS)
-            channel_name = f"{animal}頻道"
+            animal, channel_name = pick_cute_channel()
 
             # 創建語音頻道 - 嘗試多種分類名稱
-            category = discord.utils.get(guild.categories, name="Voice Channels")
-            if not category:
-                category = discord.utils.get(guild.categories, name="語音頻道")
-            if not category:
-                category = discord.utils.get(guild.categories, name="語音")
+            category = find_category(guild, VOICE_CATEGORY_NAMES)
             if not category:
-                # 嘗試使用第一個可用的分類
-                if guild.categories:
-                    category = guild.categories[0]
-                    print(f"⚠️ 使用現有分類: {category.name}")
-                else:
-                    print("❌ 找不到任何分類，請在 Discord 伺服器中創建分類")
-                    return
+                print("❌ 找不到任何分類，請在 Discord 伺服器中創建分類")
+                return
 
             # 設定權限
             overwrites = {
@@ -9953,32 +10289,27 @@ def pair_users():
                 user2: discord.PermissionOverwrite(view_channel=True, connect=True, speak=True),
             }
 
-            # 創建文字頻道（429 安全，立即創建）
-            text_channel = await safe_create_text_channel(
-                guild,
-                name=f"{animal}聊天",
-                category=category,
-                overwrites=overwrites
-            )
-
             # 如果有開始時間，則排程創建語音頻道
             if start_time:
+                # 創建文字頻道（429 安全，立即創建，用於發送提醒）
+                text_channel = await safe_create_text_channel(
+                    guild,
+                    name=f"{animal}聊天",
+                    category=category,
+                    overwrites=overwrites
+                )
                 try:
                     # 解析開始時間
-                    start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                    now = datetime.now(timezone.utc)
-                    delay_seconds = (start_dt - now).total_seconds()
+                    start_dt = parse_api_datetime(start_time)
+                    delay_seconds = (start_dt - datetime.now(timezone.utc)).total_seconds()
                     
                     if delay_seconds > 300:  # 如果超過5分鐘
                         # 發送5分鐘提醒
-                        reminder_time = start_dt - timedelta(minutes=5)
-                        reminder_delay = (reminder_time - now).total_seconds()
-                        
-                        if reminder_delay > 0:
-                            await asyncio.sleep(reminder_delay)
-                            await text_channel.send(f"⏰ **預約提醒**\n🎮 您的語音頻道將在 5 分鐘後開啟！\n👥 參與者：{user1.mention} 和 {user2.mention}\n⏰ 開始時間：<t:{int(start_dt.timestamp())}:t>")
+                        await asyncio.sleep(delay_seconds - 300)
+                        await text_channel.send(f"⏰ **預約提醒**\n🎮 您的語音頻道將在 5 分鐘後開啟！\n👥 參與者：{user1.mention} 和 {user2.mention}\n⏰ 開始時間：<t:{int(start_dt.timestamp())}:t>")
                     
-                    # 等待到開始時間
+                    # 等待到開始時間（提醒後重新計算，避免重複等待已經過的時間）
+                    delay_seconds = (start_dt - datetime.now(timezone.utc)).total_seconds()
                     if delay_seconds > 0:
                         await asyncio.sleep(delay_seconds)
                     
@@ -9991,10 +10322,7 @@ def pair_users():
                     )
                     
                     # 移動用戶到語音頻道
-                    if user1.voice:
-                        await user1.move_to(voice_channel)
-                    if user2.voice:
-                        await user2.move_to(voice_channel)
+                    await move_members_to(voice_channel, [user1, user2])
                     
                     # 發送歡迎訊息（與手動創建相同）
                     await text_channel.send(f"🎉 語音頻道 {channel_name} 已開啟！\n⏳ 可延長5分鐘 ( 為了您有更好的遊戲體驗，請到最後需要時再點選 ) 。")
@@ -10005,19 +10333,24 @@ def pair_users():
                     print(f"❌ 排程創建頻道失敗: {e}")
                     await text_channel.send("❌ 創建語音頻道時發生錯誤，請聯繫管理員。")
             else:
-                # 立即創建語音頻道
-                voice_channel = await guild.create_voice_channel(
-                    name=channel_name,
-                    category=category,
-                    user_limit=2,
-                    overwrites=overwrites
+                # 立即開啟：文字與語音頻道互不相依，同時創建；任一失敗時刪除另一個，不留下孤兒頻道
+                text_channel, voice_channel = await create_channels_together(
+                    safe_create_text_channel(
+                        guild,
+                        name=f"{animal}聊天",
+                        category=category,
+                        overwrites=overwrites
+                    ),
+                    guild.create_voice_channel(
+                        name=channel_name,
+                        category=category,
+                        user_limit=2,
+                        overwrites=overwrites
+                    )
                 )
                 
                 # 移動用戶到語音頻道
-                if user1.voice:
-                    await user1.move_to(voice_channel)
-                if user2.voice:
-                    await user2.move_to(voice_channel)
+                await move_members_to(voice_channel, [user1, user2])
                 
                 # 發送歡迎訊息
                 await text_channel.send(f"🎮 歡迎 {user1.mention} 和 {user2.mention} 來到 {channel_name}！\n⏰ 時長：{minutes} 分鐘")
@@ -10029,10 +10362,11 @@ def pair_users():
             import traceback
             traceback.print_exc()
 
-    bot.loop.create_task(create_pairing())
+    run_on_bot_loop(create_pairing())
     return jsonify({"status": "ok", "message": "配對請求已處理"})
 
 @app.route('/create-group-text-channel', methods=['POST'])
+@api_guard
 def create_group_text_channel():
     """創建群組文字頻道"""
     try:
@@ -10055,22 +10389,16 @@ def create_group_text_channel():
             """), {'group_id': group_id}).fetchone()
             
             if existing and existing[0]:
-                # 檢查頻道是否真的存在
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    guild = bot.get_guild(GUILD_ID)
-                    if guild:
-                        existing_channel = guild.get_channel(int(existing[0]))
-                        if existing_channel:
-                            print(f"⚠️ 群組文字頻道已存在: {existing_channel.name} (ID: {existing_channel.id})")
-                            loop.close()
-                            return jsonify({
-                                'success': True,
-                                'channelId': str(existing_channel.id)
-                            })
-                finally:
-                    loop.close()
+                # 檢查頻道是否真的存在（get_channel 只讀取快取，不需要事件循環）
+                guild = get_main_guild()
+                if guild:
+                    existing_channel = guild.get_channel(int(existing[0]))
+                    if existing_channel:
+                        print(f"⚠️ 群組文字頻道已存在: {existing_channel.name} (ID: {existing_channel.id})")
+                        return jsonify({
+                            'success': True,
+                            'channelId': str(existing_channel.id)
+                        })
         
         # 解析參與者，分離顧客和夥伴（通過 Booking 表判斷）
         customer_discords = []
@@ -10115,27 +10443,12 @@ def create_group_text_channel():
             return jsonify({'error': '找不到顧客 Discord ID（有付費記錄）'}), 400
         
         # 解析時間
-        if isinstance(start_time, str):
-            if start_time.endswith('Z'):
-                start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            else:
-                start_dt = datetime.fromisoformat(start_time)
-        else:
-            start_dt = start_time
+        start_dt = parse_api_datetime(start_time)
+        end_dt = parse_api_datetime(end_time)
         
-        if isinstance(end_time, str):
-            if end_time.endswith('Z'):
-                end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            else:
-                end_dt = datetime.fromisoformat(end_time)
-        else:
-            end_dt = end_time
-        
-        # 使用 asyncio 運行 Discord 操作
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # 在 bot 的事件循環運行 Discord 操作
         try:
-            text_channel = loop.run_until_complete(
+            text_channel = run_on_bot_loop(
                 create_group_booking_text_channel(
                     group_id, 
                     customer_discords,  # 所有有付費記錄的顧客
@@ -10143,8 +10456,7 @@ def create_group_text_channel():
                     start_dt, 
                     end_dt
                 )
-            )
-            loop.close()
+            ).result(timeout=FLASK_DISCORD_TIMEOUT)
             
             if text_channel:
                 # 更新資料庫
@@ -10166,7 +10478,6 @@ def create_group_text_channel():
             else:
                 return jsonify({'error': '創建文字頻道失敗'}), 500
         except Exception as e:
-            loop.close()
             print(f"❌ 創建群組文字頻道時發生錯誤: {e}")
             import traceback
             traceback.print_exc()
@@ -10179,6 +10490,7 @@ def create_group_text_channel():
         return jsonify({'error': f'創建頻道失敗: {str(e)}'}), 500
 
 @app.route('/create-group-voice-channel', methods=['POST'])
+@api_guard
 def create_group_voice_channel():
     """創建群組語音頻道"""
     try:
@@ -10201,22 +10513,16 @@ def create_group_voice_channel():
             """), {'group_id': group_id}).fetchone()
             
             if existing and existing[0]:
-                # 檢查頻道是否真的存在
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    guild = bot.get_guild(GUILD_ID)
-                    if guild:
-                        existing_channel = guild.get_channel(int(existing[0]))
-                        if existing_channel:
-                            print(f"⚠️ 群組語音頻道已存在: {existing_channel.name} (ID: {existing_channel.id})")
-                            loop.close()
-                            return jsonify({
-                                'success': True,
-                                'channelId': str(existing_channel.id)
-                            })
-                finally:
-                    loop.close()
+                # 檢查頻道是否真的存在（get_channel 只讀取快取，不需要事件循環）
+                guild = get_main_guild()
+                if guild:
+                    existing_channel = guild.get_channel(int(existing[0]))
+                    if existing_channel:
+                        print(f"⚠️ 群組語音頻道已存在: {existing_channel.name} (ID: {existing_channel.id})")
+                        return jsonify({
+                            'success': True,
+                            'channelId': str(existing_channel.id)
+                        })
         
         # 解析參與者，分離顧客和夥伴
         customer_discord = None
@@ -10256,27 +10562,12 @@ def create_group_voice_channel():
             return jsonify({'error': '找不到顧客 Discord ID'}), 400
         
         # 解析時間
-        if isinstance(start_time, str):
-            if start_time.endswith('Z'):
-                start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            else:
-                start_dt = datetime.fromisoformat(start_time)
-        else:
-            start_dt = start_time
-        
-        if isinstance(end_time, str):
-            if end_time.endswith('Z'):
-                end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            else:
-                end_dt = datetime.fromisoformat(end_time)
-        else:
-            end_dt = end_time
+        start_dt = parse_api_datetime(start_time)
+        end_dt = parse_api_datetime(end_time)
         
-        # 使用 asyncio 運行 Discord 操作
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # 在 bot 的事件循環運行 Discord 操作
         try:
-            voice_channel = loop.run_until_complete(
+            voice_channel = run_on_bot_loop(
                 create_group_booking_voice_channel(
                     group_id, 
                     customer_discord, 
@@ -10284,8 +10575,7 @@ def create_group_voice_channel():
                     start_dt, 
                     end_dt
                 )
-            )
-            loop.close()
+            ).result(timeout=FLASK_DISCORD_TIMEOUT)
             
             if voice_channel:
                 # 更新資料庫
@@ -10307,7 +10597,6 @@ def create_group_voice_channel():
             else:
                 return jsonify({'error': '創建語音頻道失敗'}), 500
         except Exception as e:
-            loop.close()
             print(f"❌ 創建群組語音頻道時發生錯誤: {e}")
             import traceback
             traceback.print_exc()
@@ -10320,6 +10609,7 @@ def create_group_voice_channel():
         return jsonify({'error': f'創建頻道失敗: {str(e)}'}), 500
 
 @app.route('/delete', methods=['POST'])
+@api_guard
 def delete_booking():
     """刪除預約相關的 Discord 頻道"""
     try:
@@ -10329,28 +10619,26 @@ def delete_booking():
         if not booking_id:
             return jsonify({'error': '缺少預約 ID'}), 400
         
-        # 使用 asyncio 運行 Discord 操作
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # 在 bot 的事件循環運行 Discord 操作
         try:
-            result = loop.run_until_complete(
+            result = run_on_bot_loop(
                 delete_booking_channels(booking_id)
-            )
-            loop.close()
+            ).result(timeout=FLASK_DISCORD_TIMEOUT)
             
             if result:
                 return jsonify({'success': True, 'message': '頻道已成功刪除'})
             else:
                 return jsonify({'error': '刪除頻道失敗'}), 500
         except Exception as e:
-            loop.close()
             return jsonify({'error': f'Discord 操作失敗: {str(e)}'}), 500
             
     except Exception as e:
         return jsonify({'error': f'刪除預約失敗: {str(e)}'}), 500
 
 def run_flask():
-    app.run(host="0.0.0.0", port=5001)
+    # 使用 waitress（正式環境 WSGI 伺服器）取代 Flask 內建的開發伺服器
+    serve(app, host="0.0.0.0", port=5001, threads=4)
 
 threading.Thread(target=run_flask, daemon=True).start()
-bot.run(TOKEN) 
\ No newline at end of file
+# log_handler=None：discord.py 的日誌只經由根 logger 的 QueueHandler 輸出，不再另外同步寫一份到 stdout
+bot.run(TOKEN, log_handler=None) 
\ No newline at end of file
@@ -3,6 +3,7 @@ import os
 import discord
 import asyncio
 from dotenv import load_dotenv
+from waitress import serve
 
 load_dotenv()
 
@@ -33,11 +34,13 @@ def move_user():
         else:
             print("❌ 找不到成員或語音頻道")
 
-    bot.loop.create_task(mover())
+    # Flask 在獨立線程執行，必須用 thread-safe 的方式把 coroutine 交給 bot 的事件循環
+    asyncio.run_coroutine_threadsafe(mover(), bot.loop)
     return jsonify({"status": "ok"})
 
 def start_flask():
-    app.run(host="0.0.0.0", port=5000)
+    # 使用 waitress（正式環境 WSGI 伺服器）取代 Flask 內建的開發伺服器
+    serve(app, host="0.0.0.0", port=5000, threads=4)
 
 if __name__ == "__main__":
     import threading